@@ -0,0 +1,153 @@
+import unicodedata
+
+# Leading words dropped from multi-word answers and guesses ("The Beatles" == "beatles")
+ARTICLES = frozenset({"the", "a", "an"})
+
+# Most typos allowed in one word of an answer (see default_tolerance)
+MAX_TOLERANCE = 2
+
+
+def normalize_answer(text):
+    """
+    Canonical form used for both answers and guesses: NFKC-normalised,
+    casefolded, punctuation removed, words separated by single spaces and a
+    leading article stripped. "The New-Delhi!" becomes "new delhi".
+    """
+    text = unicodedata.normalize("NFKC", text).casefold()
+    words = "".join(ch if ch.isalnum() else " " for ch in text).split()
+    if len(words) > 1 and words[0] in ARTICLES:
+        words = words[1:]
+    return " ".join(words)
+
+
+def compact(form):
+    """A normalised form without its spaces, so "new delhi" and "newdelhi" compare equal."""
+    return form.replace(" ", "")
+
+
+def default_tolerance(word):
+    """
+    Typos allowed in one word: none below 5 characters or in numbers (a wrong
+    year must not pass), one up to 8 characters, two beyond that.
+    """
+    if len(word) < 5 or any(ch.isdigit() for ch in word):
+        return 0
+    if len(word) < 9:
+        return 1
+    return 2
+
+
+def within_distance(a, b, max_distance):
+    """
+    True if the Levenshtein distance between a and b is at most max_distance.
+    Only a diagonal band of width 2*max_distance+1 is computed and the scan
+    stops as soon as every cell in a row exceeds the bound, so the cost is
+    O(len(a) * max_distance) rather than O(len(a) * len(b)).
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return False
+    if max_distance == 0:
+        return a == b
+
+    too_far = max_distance + 1
+    previous = [j if j <= max_distance else too_far for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        low = max(1, i - max_distance)
+        high = min(len(b), i + max_distance)
+        current = [too_far] * (len(b) + 1)
+        if i <= max_distance:
+            current[0] = i
+        row_min = current[0]
+        ch = a[i - 1]
+        for j in range(low, high + 1):
+            cost = 0 if ch == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            current[j] = value if value < too_far else too_far
+            if value < row_min:
+                row_min = value
+        if row_min > max_distance:
+            return False
+        previous = current
+    return previous[len(b)] <= max_distance
+
+
+class AnswerMatcher:
+    """
+    An answer compiled once when the question is loaded: the set of accepted
+    normalised forms (the answer plus any aliases, spaces removed) and an
+    optional bounded edit-distance check for typos. matches() expects a guess
+    that has already been through normalize_answer, which the MessageRouter
+    does once per message.
+
+    Typos are checked word by word: the guess must have as many words as the
+    form, each word must start with the right letter and be within its own
+    default_tolerance(), so "south america" is never a typo of "north america".
+    max_distance caps every word's tolerance (None leaves default_tolerance()
+    alone); 0 disables fuzzy matching entirely.
+
+    `bank` holds the accepted forms of every answer in the same question bank
+    (see share_bank); a guess that is one of them is never taken for a typo.
+    """
+    __slots__ = ("answer", "accepted", "bank", "_fuzzy", "_words", "_min_len", "_max_len")
+
+    def __init__(self, answer, aliases=(), max_distance=None):
+        forms = {normalize_answer(form) for form in (answer, *aliases)}
+        forms.discard("")
+        cap = MAX_TOLERANCE if max_distance is None else max_distance
+        self._compile(answer, {compact(form) for form in forms}, [(form, cap) for form in forms if cap])
+
+    @classmethod
+    def compiled(cls, answer, accepted, fuzzy, bank=frozenset()):
+        """
+        Rebuilds a matcher from forms that were normalised ahead of time (see
+        ContentPack): `accepted` is the set of compacted forms and `fuzzy`
+        the (form, cap) pairs. Nothing is normalised again.
+        """
+        matcher = cls.__new__(cls)
+        matcher._compile(answer, accepted, fuzzy)
+        matcher.bank = bank
+        return matcher
+
+    def _compile(self, answer, accepted, fuzzy):
+        self.answer = answer
+        self.accepted = frozenset(accepted)
+        self.bank = frozenset()
+        self._fuzzy = tuple(sorted(fuzzy))
+        words = []
+        for form, cap in self._fuzzy:
+            rule = tuple((word, min(cap, default_tolerance(word))) for word in form.split(" "))
+            if any(k for _, k in rule):
+                words.append(rule)
+        self._words = tuple(words)
+        # Guesses outside this length window cannot be within any form's tolerance
+        self._min_len = min((sum(len(word) - k for word, k in rule) + len(rule) - 1 for rule in words), default=0)
+        self._max_len = max((sum(len(word) + k for word, k in rule) + len(rule) - 1 for rule in words), default=0)
+
+    def matches(self, guess):
+        if compact(guess) in self.accepted:
+            return True
+        if not self._words or not self._min_len <= len(guess) <= self._max_len:
+            return False
+        guessed = guess.split(" ")
+        return any(
+            len(rule) == len(guessed) and all(
+                typed[:1] == word[:1] and within_distance(typed, word, k)
+                for typed, (word, k) in zip(guessed, rule)
+            )
+            for rule in self._words
+        ) and compact(guess) not in self.bank
+
+    def __repr__(self):
+        return f"AnswerMatcher({self.answer!r}, accepted={sorted(self.accepted)})"
+
+
+def share_bank(matchers):
+    """
+    Gives every matcher of one question bank the accepted forms of all of
+    them, so a real answer to another question is never taken for a typo.
+    Returns the matchers.
+    """
+    bank = frozenset().union(*(matcher.accepted for matcher in matchers))
+    for matcher in matchers:
+        matcher.bank = bank
+    return matchers
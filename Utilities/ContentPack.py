@@ -0,0 +1,241 @@
+"""
+Compiled content packs for large question banks.
+
+A pack holds the records of one JSON bank with every answer already
+normalised, so the bot can memory-map it at startup instead of parsing the
+JSON, and decode a record only when a game draws it. Build packs with:
+
+    python -m Utilities.ContentPack [dataset ...]
+
+which writes a .pack next to each JSON source. A pack records the
+size and mtime of the JSON it was built from; once the JSON is edited the
+pack is stale and the store falls back to the JSON until it is rebuilt.
+
+Layout (little-endian):
+    header      magic, version, source mtime_ns, source size, records, columns, forms
+    columns     per column: type byte ('s' string, 'l' list of strings), name
+    offsets     records * (columns + 3) + forms + 1 u32 offsets into the string table
+    strings     UTF-8 string table
+
+Each record stores its columns followed by three matcher fields: the
+answer, the accepted normalised forms and the (form, tolerance cap) pairs.
+The records are followed by every accepted form in the bank, sorted, which
+the matchers search to tell a typo from another answer (see share_bank).
+"""
+import mmap
+import os
+import struct
+import sys
+from types import MappingProxyType
+from Utilities.AnswerMatcher import AnswerMatcher
+
+MAGIC = b"FTXPACK\x00"
+VERSION = 3
+HEADER = struct.Struct("<8sIqqIII")
+COLUMN = struct.Struct("<cH")
+OFFSET = struct.Struct("<I")
+OFFSET_PAIR = struct.Struct("<II")
+# Joins list items and fuzzy pairs inside one string; never appears in content
+SEP = "\x1f"
+PAIR_SEP = "\x1e"
+# Matcher fields stored after the record's own columns
+MATCHER_FIELDS = 3
+
+
+def pack_path(source_path):
+    return os.path.splitext(source_path)[0] + ".pack"
+
+
+def build(items, source_path, path=None):
+    """
+    Writes a pack for `items`, the parsed bank of `source_path` (records with
+    a "matcher" as produced by the ContentStore parsers). Returns the path.
+    """
+    path = path or pack_path(source_path)
+    columns = {}
+    for item in items:
+        for key, value in item.items():
+            if key == "matcher":
+                continue
+            kind = b"l" if isinstance(value, (list, tuple)) else b"s"
+            if kind == b"s" and not isinstance(value, str):
+                raise ValueError(f"{source_path}: field {key!r} is not a string or list of strings")
+            columns.setdefault(key, kind)
+
+    strings = []
+    for item in items:
+        for key, kind in columns.items():
+            value = item.get(key, "")
+            strings.append(SEP.join(value) if kind == b"l" else value)
+        matcher = item["matcher"]
+        strings.append(matcher.answer)
+        strings.append(SEP.join(sorted(matcher.accepted)))
+        strings.append(SEP.join(f"{form}{PAIR_SEP}{k}" for form, k in matcher._fuzzy))
+    forms = sorted(frozenset().union(*(item["matcher"].accepted for item in items)))
+    strings.extend(forms)
+
+    offsets = [0]
+    blobs = []
+    for value in strings:
+        encoded = value.encode("utf-8")
+        blobs.append(encoded)
+        offsets.append(offsets[-1] + len(encoded))
+    if offsets[-1] > 0xFFFFFFFF:
+        raise ValueError(f"{source_path}: string table exceeds 4 GiB")
+
+    stat = os.stat(source_path)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, stat.st_mtime_ns, stat.st_size, len(items), len(columns), len(forms)))
+        for key, kind in columns.items():
+            name = key.encode("utf-8")
+            f.write(COLUMN.pack(kind, len(name)))
+            f.write(name)
+        f.write(struct.pack(f"<{len(offsets)}I", *offsets))
+        f.writelines(blobs)
+    os.replace(tmp_path, path)
+    return path
+
+
+class PackedBank:
+    """
+    A read-only sequence over a memory-mapped pack. Indexing decodes that one
+    record into the same shape the JSON parsers produce, so games and Decks
+    cannot tell the difference.
+    """
+    __slots__ = ("path", "_map", "_count", "_columns", "_width", "_offsets", "_strings", "_forms")
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        _, _, _, _, self._count, column_count, form_count = HEADER.unpack_from(self._map, 0)
+        pos = HEADER.size
+        columns = []
+        for _ in range(column_count):
+            kind, length = COLUMN.unpack_from(self._map, pos)
+            pos += COLUMN.size
+            columns.append((self._map[pos:pos + length].decode("utf-8"), kind == b"l"))
+            pos += length
+        self._columns = tuple(columns)
+        self._width = column_count + MATCHER_FIELDS
+        self._offsets = pos
+        self._strings = pos + (self._count * self._width + form_count + 1) * OFFSET.size
+        self._forms = PackedForms(self, self._count * self._width, form_count)
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        for index in range(self._count):
+            yield self[index]
+
+    def column(self, name):
+        """Yields one field of every record without decoding the rest ("" where absent)."""
+        for position, (column, _) in enumerate(self._columns):
+            if column == name:
+                break
+        else:
+            yield from ("" for _ in range(self._count))
+            return
+        for index in range(self._count):
+            yield self._string(index * self._width + position)
+
+    def _string(self, slot):
+        start, end = OFFSET_PAIR.unpack_from(self._map, self._offsets + slot * OFFSET.size)
+        return self._map[self._strings + start:self._strings + end].decode("utf-8")
+
+    def __getitem__(self, index):
+        if not 0 <= index < self._count:
+            raise IndexError("pack index out of range")
+        slot = index * self._width
+
+        record = {}
+        for name, is_list in self._columns:
+            value = self._string(slot)
+            slot += 1
+            if value:
+                record[name] = value.split(SEP) if is_list else value
+
+        answer = self._string(slot)
+        accepted = self._string(slot + 1)
+        fuzzy = self._string(slot + 2)
+        record["matcher"] = AnswerMatcher.compiled(
+            answer,
+            accepted.split(SEP) if accepted else (),
+            [(form, int(k)) for form, k in (pair.split(PAIR_SEP) for pair in fuzzy.split(SEP))] if fuzzy else (),
+            self._forms
+        )
+        return MappingProxyType(record)
+
+
+class PackedForms:
+    """
+    The sorted accepted forms stored after a pack's records, as a read-only
+    set: membership is a binary search over the mapped string table, so
+    nothing is decoded up front.
+    """
+    __slots__ = ("_bank", "_start", "_count")
+
+    def __init__(self, bank, start, count):
+        self._bank = bank
+        self._start = start
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, form):
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            value = self._bank._string(self._start + middle)
+            if value == form:
+                return True
+            if value < form:
+                low = middle + 1
+            else:
+                high = middle
+        return False
+
+
+def open_pack(source_path):
+    """
+    Returns a PackedBank for source_path if its pack exists and was built from
+    the current version of the file, otherwise None.
+    """
+    path = pack_path(source_path)
+    try:
+        source = os.stat(source_path)
+        with open(path, "rb") as f:
+            header = f.read(HEADER.size)
+    except OSError:
+        return None
+    if len(header) < HEADER.size:
+        return None
+
+    magic, version, mtime_ns, size, _, _, _ = HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION:
+        return None
+    if mtime_ns != source.st_mtime_ns or size != source.st_size:
+        print(f"{path} is stale; using {source_path}. Rebuild it with `python -m Utilities.ContentPack`.")
+        return None
+    return PackedBank(path)
+
+
+def main(names):
+    import json
+    from Utilities.ContentStore import DATASETS, TRIVIA_SHARD_DIR, discover_shards, parse_answers
+
+    datasets = {**DATASETS, **discover_shards(TRIVIA_SHARD_DIR, "trivia", parse_answers)}
+    for name in names or datasets:
+        source_path, parse = datasets[name]
+        with open(source_path, "r", encoding="utf-8") as f:
+            items = parse(json.load(f))
+        path = build(items, source_path)
+        print(f"Built {path}: {len(items)} records, {os.path.getsize(path)} bytes.")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,311 @@
+import asyncio
+import functools
+import json
+import os
+from types import MappingProxyType
+from dotenv import load_dotenv
+from Utilities.AnswerMatcher import AnswerMatcher, share_bank
+from Utilities.ContentPack import open_pack
+load_dotenv()
+
+# Data files are checked for changes every CONTENT_POLL_INTERVAL seconds and
+# changed banks are re-read in the background. 0 disables the watcher;
+# /reloadcontent still works.
+CONTENT_POLL_INTERVAL = float(os.getenv('CONTENT_POLL_INTERVAL', 30))
+
+# Trivia categories: each Data/trivia/<category>.json becomes the dataset
+# "trivia:<category>", loaded on first use and dropped when no game uses it.
+# The files are built from the main bank by `python -m Utilities.TriviaShards`.
+TRIVIA_SHARD_DIR = os.path.join("Data", "trivia")
+
+
+def parse_answers(raw):
+    """
+    Question/answer records (trivia, emoji clues, lyric lines). Each answer and
+    its optional "aliases" are compiled into an AnswerMatcher here, once per
+    load; a guess that is another answer in the bank is never taken for a
+    typo. Every record is made read-only because it is shared by all games.
+    """
+    matchers = share_bank([AnswerMatcher(item["answer"], item.get("aliases", ())) for item in raw])
+    return tuple(
+        MappingProxyType({**item, "matcher": matcher})
+        for item, matcher in zip(raw, matchers)
+    )
+
+
+def parse_words(raw):
+    """Scramble words. Exact matching only: a typo allowance could accept the scramble itself."""
+    return tuple(
+        MappingProxyType({"word": word, "matcher": AnswerMatcher(word, max_distance=0)})
+        for word in raw
+    )
+
+
+# Every question bank the games use: name -> (file, parser)
+DATASETS = {
+    "trivia": ("Data/trivia_questions.json", parse_answers),
+    "scramble": ("Data/scramble_words.json", parse_words),
+    "emoji": ("Data/emoji_clues.json", parse_answers),
+    "lyrics_india": ("Data/lyrics_India.json", parse_answers),
+    "lyrics_pakistan": ("Data/lyrics_Pakistan.json", parse_answers),
+    "lyrics_nigeria": ("Data/lyrics_Nigeria.json", parse_answers),
+    "lyrics_global": ("Data/lyrics_global.json", parse_answers),
+}
+
+
+def discover_shards(directory, prefix, parse):
+    """Returns {"<prefix>:<stem>": (path, parse)} for every JSON file in directory."""
+    try:
+        files = sorted(name for name in os.listdir(directory) if name.endswith(".json"))
+    except FileNotFoundError:
+        return {}
+    return {
+        f"{prefix}:{os.path.splitext(name)[0].lower()}": (os.path.join(directory, name), parse)
+        for name in files
+    }
+
+
+class Dataset:
+    """One question bank: where it comes from and the currently loaded items."""
+    __slots__ = ("name", "path", "parse", "lazy", "items", "mtime", "loaded", "users", "indexes")
+
+    def __init__(self, name, path, parse, lazy=False):
+        self.name = name
+        self.path = path
+        self.parse = parse
+        # Lazy banks are not preloaded and are unloaded once no game uses them
+        self.lazy = lazy
+        self.items = ()
+        self.mtime = None
+        self.loaded = False
+        self.users = 0
+        # field -> {value: tuple of indexes}, built on demand for the current items
+        self.indexes = {}
+
+    def replace(self, items, mtime):
+        self.items = items
+        self.mtime = mtime
+        self.indexes = {}
+
+
+class BankView:
+    """A read-only subset of a bank, given by a tuple of indexes into it."""
+    __slots__ = ("bank", "indexes")
+
+    def __init__(self, bank, indexes):
+        self.bank = bank
+        self.indexes = indexes
+
+    def __len__(self):
+        return len(self.indexes)
+
+    def __getitem__(self, position):
+        return self.bank[self.indexes[position]]
+
+    def __iter__(self):
+        for index in self.indexes:
+            yield self.bank[index]
+
+
+class ContentStore:
+    """
+    Loads each question bank once, off the event loop, and shares it with
+    every game in every guild. Banks are tuples of read-only records, so games
+    hold references to them instead of copies: starting a game costs no file
+    I/O and no extra memory however many games are running.
+
+    A bank with an up-to-date compiled pack (see ContentPack) is memory-mapped
+    instead of parsed, and its records are decoded only when drawn.
+
+    Games draw from a bank through source(name), which a Deck calls at the
+    start of each pass. Edited data files are re-read in the background and
+    the new bank replaces the old one in a single assignment: rounds already
+    running keep their item and decks switch over at their next reshuffle.
+    """
+
+    def __init__(self, datasets=DATASETS, poll_interval=CONTENT_POLL_INTERVAL, shard_dir=TRIVIA_SHARD_DIR):
+        self._datasets = {name: Dataset(name, path, parse) for name, (path, parse) in datasets.items()}
+        self.shard_dir = shard_dir
+        self._add_shards()
+        # name -> task of a load in progress, so concurrent callers share one read
+        self._loading = {}
+        self.poll_interval = poll_interval
+        self._watch_task = None
+        self._reload_lock = asyncio.Lock()
+
+    def _add_shards(self):
+        """Registers category shard files not seen before. Returns their names."""
+        added = []
+        for name, (path, parse) in discover_shards(self.shard_dir, "trivia", parse_answers).items():
+            if name not in self._datasets:
+                self._datasets[name] = Dataset(name, path, parse, lazy=True)
+                added.append(name)
+        return added
+
+    def __contains__(self, name):
+        return name in self._datasets
+
+    def path(self, name):
+        return self._datasets[name].path
+
+    def categories(self, prefix):
+        """Category names of the sharded datasets "<prefix>:<category>"."""
+        start = prefix + ":"
+        return [name[len(start):] for name in self._datasets if name.startswith(start)]
+
+    def get(self, name):
+        """Returns the loaded bank for name, or () if it has not been loaded yet."""
+        return self._datasets[name].items
+
+    def source(self, name, field=None, value=None):
+        """
+        A zero-argument callable returning the current bank, for Deck. With a
+        field, it returns only the records whose field equals value.
+        """
+        if field is None:
+            return functools.partial(self.get, name)
+        return functools.partial(self.select, name, field, value)
+
+    def select(self, name, field, value):
+        """A BankView of the records in name whose field equals value (case-insensitive)."""
+        dataset = self._datasets[name]
+        index = dataset.indexes.get(field)
+        if index is None:
+            index = self._build_index(dataset.items, field)
+            dataset.indexes[field] = index
+        return BankView(dataset.items, index.get(str(value).lower(), ()))
+
+    @staticmethod
+    def _build_index(bank, field):
+        # Packed banks can decode a single column without building whole records
+        values = bank.column(field) if hasattr(bank, "column") else (item.get(field) for item in bank)
+        index = {}
+        for position, value in enumerate(values):
+            if value:
+                index.setdefault(value.lower(), []).append(position)
+        return {value: tuple(positions) for value, positions in index.items()}
+
+    async def acquire(self, name):
+        """Loads name if needed and marks it in use by one more game. Pair with release()."""
+        dataset = self._datasets[name]
+        dataset.users += 1
+        try:
+            return await self.load(name)
+        except BaseException:
+            dataset.users -= 1
+            raise
+
+    def release(self, name):
+        """Marks one game as done with name; a lazy bank nobody uses is unloaded."""
+        dataset = self._datasets[name]
+        dataset.users = max(0, dataset.users - 1)
+        if dataset.lazy and dataset.users == 0 and dataset.loaded and name not in self._loading:
+            dataset.replace((), None)
+            dataset.loaded = False
+            print(f"Unloaded '{name}'; no running game uses it.")
+
+    async def load(self, name):
+        """Returns the bank for name, reading it on first use. Concurrent calls share one read."""
+        dataset = self._datasets[name]
+        if dataset.loaded:
+            return dataset.items
+
+        task = self._loading.get(name)
+        if task is None:
+            task = asyncio.ensure_future(self._load(dataset))
+            self._loading[name] = task
+            task.add_done_callback(lambda _: self._loading.pop(name, None))
+        return await asyncio.shield(task)
+
+    async def preload(self, *names):
+        """Loads the given banks (all non-lazy ones by default) concurrently."""
+        names = names or [name for name, dataset in self._datasets.items() if not dataset.lazy]
+        await asyncio.gather(*(self.load(name) for name in names))
+
+    async def reload(self, names=None, force=True):
+        """
+        Re-reads the given loaded banks (all by default) and swaps in the new
+        items. With force=False only files whose mtime changed are re-read.
+        A file that fails to load, or now holds no items, keeps its previous bank.
+        Returns {name: item count} for the banks that were replaced.
+        A forced reload also picks up category shard files added since startup.
+        """
+        async with self._reload_lock:
+            if force:
+                for name in self._add_shards():
+                    print(f"Found new trivia category '{name}'.")
+            datasets = [
+                self._datasets[name] for name in (names or self._datasets)
+                if self._datasets[name].loaded
+            ]
+            if not force:
+                mtimes = await asyncio.to_thread(self._stat_all, [d.path for d in datasets])
+                datasets = [d for d in datasets if mtimes[d.path] is not None and mtimes[d.path] != d.mtime]
+
+            replaced = {}
+            for dataset in datasets:
+                items, mtime = await asyncio.to_thread(self._read, dataset)
+                # An emptied file would leave running games nothing to draw
+                if mtime is None or (not items and dataset.items):
+                    print(f"Keeping the previous '{dataset.name}' bank ({len(dataset.items)} items).")
+                    if not force:
+                        # Don't retry a broken file on every poll, only after its next edit
+                        dataset.mtime = mtimes[dataset.path]
+                    continue
+                dataset.replace(items, mtime)
+                replaced[dataset.name] = len(items)
+                print(f"Reloaded {len(items)} items for '{dataset.name}' from {dataset.path}.")
+            return replaced
+
+    def start_watching(self):
+        """Starts polling data files for changes, if enabled."""
+        if self.poll_interval > 0 and self._watch_task is None:
+            self._watch_task = asyncio.ensure_future(self._watch())
+
+    def close(self):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            self._watch_task = None
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self.reload(force=False)
+            except Exception as e:
+                print(f"Error while checking data files for changes: {e}")
+
+    @staticmethod
+    def _stat_all(paths):
+        mtimes = {}
+        for path in paths:
+            try:
+                mtimes[path] = os.stat(path).st_mtime_ns
+            except OSError:
+                mtimes[path] = None
+        return mtimes
+
+    async def _load(self, dataset):
+        items, mtime = await asyncio.to_thread(self._read, dataset)
+        dataset.replace(items, mtime)
+        dataset.loaded = True
+        print(f"Loaded {len(items)} items for '{dataset.name}' from {dataset.path}.")
+        return items
+
+    @staticmethod
+    def _read(dataset):
+        """Reads and parses a bank. Runs in a worker thread. Returns (items, mtime)."""
+        try:
+            mtime = os.stat(dataset.path).st_mtime_ns
+            packed = open_pack(dataset.path)
+            if packed is not None:
+                return packed, mtime
+            with open(dataset.path, "r", encoding="utf-8") as f:
+                return dataset.parse(json.load(f)), mtime
+        except FileNotFoundError:
+            print(f"Error: {dataset.path} not found!")
+        except json.JSONDecodeError:
+            print(f"Error: {dataset.path} is corrupted or empty.")
+        except Exception as e:
+            print(f"An unexpected error occurred while loading {dataset.path}: {e}")
+        return (), None
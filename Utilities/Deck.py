@@ -0,0 +1,70 @@
+import random
+import sys
+
+
+class Deck:
+    """
+    Draws items from a bank in a random order without repeats, reshuffling
+    once every item has been drawn.
+
+    The shuffle is a lazy Fisher-Yates over integer indexes: only positions
+    that have been swapped are stored, so a draw is O(1) and a pass over a
+    1M-item bank never builds a list of 1M indexes or compares item strings.
+
+    `source` is a callable returning the current bank (any sequence). It is
+    called at the start of each pass and the result is kept for the whole
+    pass, so a bank swapped in by a reload takes effect at the next reshuffle
+    without breaking the pass in progress.
+    """
+    __slots__ = ("source", "rng", "bank", "remaining", "passes", "_swapped")
+
+    def __init__(self, source, rng=random):
+        self.source = source
+        self.rng = rng
+        self.bank = None
+        self.remaining = 0
+        self.passes = 0
+        # position -> index currently at that position, for positions that differ from identity
+        self._swapped = {}
+
+    def __len__(self):
+        """Items left in the current pass."""
+        return self.remaining
+
+    def __sizeof__(self):
+        return object.__sizeof__(self) + sys.getsizeof(self._swapped)
+
+    @property
+    def exhausted(self):
+        """True once every item of the current pass has been drawn."""
+        return self.bank is not None and self.remaining == 0
+
+    def reshuffle(self):
+        """Starts a new pass over the bank currently returned by source()."""
+        self.bank = self.source()
+        self.remaining = len(self.bank)
+        self.passes += 1
+        self._swapped.clear()
+
+    def draw_index(self):
+        """Returns the next index into self.bank, or None if the bank is empty."""
+        if self.remaining == 0:
+            self.reshuffle()
+            if self.remaining == 0:
+                return None
+
+        swapped = self._swapped
+        last = self.remaining - 1
+        pick = self.rng.randrange(self.remaining)
+        index = swapped.get(pick, pick)
+        # Move the last undrawn index into the drawn slot and shrink the range
+        if pick != last:
+            swapped[pick] = swapped.get(last, last)
+        swapped.pop(last, None)
+        self.remaining = last
+        return index
+
+    def draw(self):
+        """Returns the next item, or None if the bank is empty."""
+        index = self.draw_index()
+        return None if index is None else self.bank[index]
@@ -0,0 +1,174 @@
+import asyncio
+import sys
+
+
+class GameSession:
+    """
+    State of one running game. Every game cog uses this one type instead of
+    its own set of parallel dicts, so creating, finding and ending a game are
+    each a single registry call and nothing is left behind when it ends.
+    Fields a game does not need simply stay at their defaults.
+    """
+    __slots__ = (
+        "game",        # registry name, e.g. "trivia"
+        "key",         # guild id or channel id, depending on the game
+        "guild_id",
+        "channel_id",
+        "host",        # member who started the game
+        "stop_event",
+        "task",        # main game task, cancelled when the session ends
+        "timers",      # pending Scheduler handles (hints, deadlines)
+        "wins",        # user_id -> wins in this game
+        "deck",        # Deck the next item is drawn from
+        "unanswered",  # consecutive unanswered rounds
+        "answer",      # current secret/answer (RPS choice, Guess the Number)
+        "players",     # user ids that joined (Guess the Number)
+        "winner_id",
+        "message_id",  # game message to edit (Guess the Number)
+        "options",     # per-game settings chosen at start (max number, duration...)
+    )
+
+    def __init__(self, game, key, guild_id, channel_id, host=None, answer=None, options=None):
+        self.game = game
+        self.key = key
+        self.guild_id = guild_id
+        self.channel_id = channel_id
+        self.host = host
+        self.stop_event = asyncio.Event()
+        self.task = None
+        self.timers = []
+        self.wins = {}
+        self.deck = None
+        self.unanswered = 0
+        self.answer = answer
+        self.players = set()
+        self.winner_id = None
+        self.message_id = None
+        self.options = options or {}
+
+    @property
+    def running(self):
+        return not self.stop_event.is_set()
+
+    def footprint(self):
+        """
+        Approximate bytes held by this session: the object itself plus its
+        containers and their contents. Shared objects (the question bank, the
+        host member) are counted by reference only.
+        """
+        size = sys.getsizeof(self)
+        for name in ("wins", "players", "options"):
+            container = getattr(self, name)
+            size += sys.getsizeof(container)
+            if isinstance(container, dict):
+                size += sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in container.items())
+            else:
+                size += sum(sys.getsizeof(v) for v in container)
+        size += sys.getsizeof(self.stop_event) + sys.getsizeof(self.answer) + sys.getsizeof(self.deck)
+        return size
+
+    def snapshot(self):
+        """
+        The state needed to resume this game in another process, as plain
+        JSON-able values. The deck, task and timers are rebuilt on resume.
+        """
+        return {
+            "game": self.game,
+            "key": self.key,
+            "guild_id": self.guild_id,
+            "channel_id": self.channel_id,
+            "host_id": self.host.id if self.host is not None else None,
+            "wins": dict(self.wins),
+            "unanswered": self.unanswered,
+            "answer": self.answer,
+            "players": sorted(self.players),
+            "winner_id": self.winner_id,
+            "message_id": self.message_id,
+            "options": dict(self.options),
+        }
+
+
+class SessionRegistry:
+    """
+    Bot-wide index of running games keyed by (game, guild_id or channel_id).
+    With a store (see GameStateStore), checkpoint() saves a session so it can
+    be resumed after a restart, and end() drops its checkpoint.
+    """
+
+    def __init__(self, store=None):
+        self._sessions = {}
+        self.store = store
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def create(self, game, key, **fields):
+        """Registers a new session, or returns None if one is already running for key."""
+        if (game, key) in self._sessions:
+            return None
+        session = GameSession(game, key, **fields)
+        self._sessions[(game, key)] = session
+        return session
+
+    def restore(self, state, host):
+        """
+        Registers a session from a snapshot() taken by an earlier process.
+        Returns None if a session is already running for its key.
+        """
+        session = self.create(
+            state["game"], state["key"], guild_id=state["guild_id"], channel_id=state["channel_id"],
+            host=host, answer=state["answer"], options=state["options"]
+        )
+        if session is None:
+            return None
+        session.wins = dict(state["wins"])
+        session.unanswered = state["unanswered"]
+        session.players = set(state["players"])
+        session.winner_id = state["winner_id"]
+        session.message_id = state["message_id"]
+        return session
+
+    def get(self, game, key):
+        return self._sessions.get((game, key))
+
+    def checkpoint(self, session):
+        """Saves the session's state in the background. Call at round boundaries."""
+        if self.store is not None and self._sessions.get((session.game, session.key)) is session:
+            self.store.checkpoint(session)
+
+    def end(self, session):
+        """
+        Stops a session and removes it. Its timers are cancelled, and so is its
+        task unless called from inside it. Ending a session that was already replaced is a no-op
+        for the registry.
+        """
+        session.stop_event.set()
+        if self._sessions.get((session.game, session.key)) is session:
+            del self._sessions[(session.game, session.key)]
+            if self.store is not None:
+                self.store.discard(session)
+
+        for timer in session.timers:
+            timer.cancel()
+        session.timers.clear()
+
+        task = session.task
+        if task is not None and task is not asyncio.current_task() and not task.done():
+            task.cancel()
+
+    def sessions(self, game=None):
+        return [s for s in self._sessions.values() if game is None or s.game == game]
+
+    def memory_report(self):
+        """
+        Per-game session counts and footprint, for sizing a node for N
+        concurrent games: {game: {"sessions", "total_bytes", "avg_bytes"}}.
+        """
+        report = {}
+        for session in self._sessions.values():
+            entry = report.setdefault(session.game, {"sessions": 0, "total_bytes": 0})
+            entry["sessions"] += 1
+            entry["total_bytes"] += session.footprint()
+        for entry in report.values():
+            entry["avg_bytes"] = entry["total_bytes"] // entry["sessions"]
+        return report
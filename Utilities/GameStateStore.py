@@ -0,0 +1,136 @@
+import asyncio
+import os
+from dotenv import load_dotenv
+load_dotenv()
+
+# Where running games are checkpointed: 'database' (the bot's database, so
+# games survive a restart or crash) or 'memory' (nothing survives the process).
+GAME_STATE_BACKEND = os.getenv('GAME_STATE_BACKEND', 'database').lower()
+
+
+class MemoryGameStateStore:
+    """
+    Keeps checkpoints in process memory. Games are not resumed after a
+    restart; use this where no database is worth writing to.
+    """
+
+    def __init__(self):
+        self._states = {}
+        self._restored = set()
+
+    def checkpoint(self, session):
+        self._states[(session.game, session.key)] = session.snapshot()
+
+    def discard(self, session):
+        self._states.pop((session.game, session.key), None)
+
+    async def restore(self, game):
+        """Returns the checkpoints of `game` to resume, once per process."""
+        if game in self._restored:
+            return []
+        self._restored.add(game)
+        return [state for (name, _), state in self._states.items() if name == game]
+
+    def forget(self, game, key):
+        """Drops a checkpoint that cannot be resumed."""
+        self._states.pop((game, key), None)
+
+    async def close(self):
+        pass
+
+
+class DatabaseGameStateStore:
+    """
+    Checkpoints running games in the game_sessions table so they can be
+    resumed after a restart. checkpoint() and discard() only record the
+    change; a background task writes pending changes in one transaction, and
+    changes made while a write is in flight are batched into the next one.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        # (game, key) -> snapshot to save, or None to delete
+        self._pending = {}
+        self._flush_task = None
+        self._restored = set()
+        # Keys with a row in the table, so ending a game never checkpointed costs no write
+        self._stored = set()
+
+    def checkpoint(self, session):
+        key = (session.game, session.key)
+        self._stored.add(key)
+        self._queue(key, session.snapshot())
+
+    def discard(self, session):
+        key = (session.game, session.key)
+        if key in self._stored:
+            self._stored.discard(key)
+            self._queue(key, None)
+
+    def forget(self, game, key):
+        """Drops a checkpoint that cannot be resumed."""
+        self._stored.discard((game, key))
+        self._queue((game, key), None)
+
+    def _queue(self, key, state):
+        self._pending[key] = state
+        if self._flush_task is None:
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush())
+
+    async def _flush(self):
+        try:
+            while self._pending:
+                pending, self._pending = self._pending, {}
+                saved = [(game, key, state) for (game, key), state in pending.items() if state is not None]
+                deleted = [(game, key) for (game, key), state in pending.items() if state is None]
+                if not await self.db.save_game_sessions(saved, deleted):
+                    # Retry with the next change; newer states win
+                    self._pending = {**pending, **self._pending}
+                    break
+        finally:
+            self._flush_task = None
+
+    async def restore(self, game):
+        """Returns the checkpoints of `game` left by an earlier process, once per process."""
+        if game in self._restored:
+            return []
+        self._restored.add(game)
+        states = await self.db.get_game_sessions(game) or []
+        self._stored.update((game, state["key"]) for state in states)
+        return states
+
+    async def close(self):
+        """Writes whatever is still pending."""
+        if self._flush_task is not None:
+            await self._flush_task
+        if self._pending:
+            await self._flush()
+
+
+def create_game_state_store(db):
+    """Builds the store selected by GAME_STATE_BACKEND ('database' or 'memory')."""
+    if GAME_STATE_BACKEND == 'memory':
+        return MemoryGameStateStore()
+    if GAME_STATE_BACKEND != 'database':
+        print(f"Unknown GAME_STATE_BACKEND '{GAME_STATE_BACKEND}', falling back to database.")
+    return DatabaseGameStateStore(db)
+
+
+async def resumable(bot, game):
+    """
+    Yields (state, channel, host) for each checkpoint of `game` this process
+    should resume. Checkpoints of guilds served by another shard cluster are
+    left alone; ones whose channel or host is gone are dropped.
+    """
+    store = bot.game_state
+    for state in await store.restore(game):
+        guild = bot.get_guild(state["guild_id"])
+        if guild is None:
+            continue
+        channel = guild.get_channel(state["channel_id"])
+        host = guild.get_member(state["host_id"]) if state["host_id"] is not None else None
+        if channel is None or host is None:
+            print(f"Not resuming {game} in guild {guild.id}: its channel or host is gone.")
+            store.forget(game, state["key"])
+            continue
+        yield state, channel, host
@@ -5,75 +5,340 @@ import discord
 from discord.ext import commands
 from dotenv import load_dotenv
 import asyncio
-
-# Import the new database manager
-from database import DatabaseManager
+import datetime
+import hashlib
+import time
+from collections import deque
 
 load_dotenv()
 
 LEADERBOARD_CHANNEL_ID = os.getenv('LEADERBOARD_CHANNEL_ID')
+# Pointers used to live in this file; it is imported into the
+# leaderboard_messages table on first start and renamed to *.imported
 LAST_MESSAGE_FILE = os.path.join("Data", "last_leaderboard_messages.json")
 MAX_LEADERBOARD_ENTRIES = 10
+# Refreshes of a channel's leaderboard requested within this many seconds of
+# the first one are collapsed into a single edit.
+LEADERBOARD_REFRESH_DELAY = float(os.getenv('LEADERBOARD_REFRESH_DELAY', 2))
+# Guilds refreshed at the same time by the startup warm-up. Each refresh is
+# at most one edit on its own channel, so this mostly bounds the global
+# request rate and the database reads for the winners.
+LEADERBOARD_WARMUP_CONCURRENCY = int(os.getenv('LEADERBOARD_WARMUP_CONCURRENCY', 5))
 
 # Create the Data directory if it doesn't exist
 os.makedirs("Data", exist_ok=True)
 
+
+def _read_legacy_messages():
+    """Reads LAST_MESSAGE_FILE, if it is still there. Runs in a worker thread."""
+    try:
+        with open(LAST_MESSAGE_FILE, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except json.JSONDecodeError:
+        print(f"Warning: {LAST_MESSAGE_FILE} is corrupted or empty. Starting with empty last messages.")
+        return {}
+
+
+class RecentWinners:
+    """
+    Ring buffer of a guild's last MAX_LEADERBOARD_ENTRIES winners, newest first,
+    with a per-user index so "is this user already on the board" is O(1).
+    """
+    __slots__ = ("entries", "_user_counts")
+
+    def __init__(self, winners=()):
+        self.entries = deque(maxlen=MAX_LEADERBOARD_ENTRIES)
+        self._user_counts = {}
+        # winners come from the database newest first
+        for entry in reversed(winners):
+            self.push(entry)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __contains__(self, user_id):
+        return str(user_id) in self._user_counts
+
+    def push(self, entry):
+        """Adds a winner at the front, dropping the oldest one if the buffer is full."""
+        if len(self.entries) == self.entries.maxlen:
+            self._forget(self.entries[-1]["user_id"])
+        self.entries.appendleft(entry)
+        user_id = str(entry["user_id"])
+        self._user_counts[user_id] = self._user_counts.get(user_id, 0) + 1
+
+    def _forget(self, user_id):
+        user_id = str(user_id)
+        remaining = self._user_counts.get(user_id, 0) - 1
+        if remaining > 0:
+            self._user_counts[user_id] = remaining
+        else:
+            self._user_counts.pop(user_id, None)
+
+    def clear(self):
+        self.entries.clear()
+        self._user_counts.clear()
+
+
 class Leaderboard(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.db = DatabaseManager()
-        self.last_leaderboard_messages = self._load_last_messages()
+        self.db = bot.db
+        # str(channel_id) -> message_id, loaded from the database in cog_load()
+        self.last_leaderboard_messages = {}
+        # str(channel_id) -> hash of the embed that message currently shows
+        self._rendered_hashes = {}
+        # Pointers not written to the database yet, see _flush_pointers()
+        self._pending_pointers = {}
+        self._pointer_flush = None
+        # guild_id -> RecentWinners, warmed from the database on first use
+        self.recent_winners = {}
+        # guild_id -> latest background write, see _write_through()
+        self._guild_writes = {}
+        # channel_id -> PartialMessage of its leaderboard, edited without a fetch
+        self._leaderboard_messages = {}
+        # channel_id -> scheduled refresh, see update_leaderboard_display()
+        self._pending_refreshes = {}
+        self._refresh_locks = {}
+        # on_ready fires again after every reconnect; warm up only once
+        self._warmed_up = False
 
-    def _load_last_messages(self):
-        """Loads the last sent leaderboard message IDs for each channel."""
-        if os.path.exists(LAST_MESSAGE_FILE):
-            try:
-                with open(LAST_MESSAGE_FILE, "r") as f:
-                    return json.load(f)
-            except json.JSONDecodeError:
-                print(f"Warning: {LAST_MESSAGE_FILE} is corrupted or empty. Starting with empty last messages.")
-                return {}
-        return {}
+    async def cog_load(self):
+        stored = await self.db.get_leaderboard_messages()
+        if stored is None:
+            print("Warning: could not load leaderboard message pointers; new leaderboard messages will be sent.")
+            stored = {}
+        if not stored:
+            stored = await self._import_legacy_messages()
+        # Pointers set while we were loading are newer
+        for channel_id, (message_id, content_hash) in stored.items():
+            self.last_leaderboard_messages.setdefault(channel_id, message_id)
+            self._rendered_hashes.setdefault(channel_id, content_hash)
+
+    async def _import_legacy_messages(self):
+        """One-time import of LAST_MESSAGE_FILE into the database."""
+        legacy = await asyncio.to_thread(_read_legacy_messages)
+        stored = {channel_id: (message_id, None) for channel_id, message_id in legacy.items()}
+        if stored and await self.db.set_leaderboard_messages([(c, m, h) for c, (m, h) in stored.items()]):
+            await asyncio.to_thread(os.replace, LAST_MESSAGE_FILE, LAST_MESSAGE_FILE + ".imported")
+            print(f"Imported {len(stored)} leaderboard message pointers from {LAST_MESSAGE_FILE}.")
+        return stored
 
-    def _save_last_messages(self):
-        """Saves the last sent leaderboard message IDs to a JSON file."""
-        with open(LAST_MESSAGE_FILE, "w") as f:
-            json.dump(self.last_leaderboard_messages, f, indent=4)
+    def set_last_leaderboard_message(self, channel_id, message_id, content_hash=None):
+        """
+        Stores the ID of the last leaderboard message sent in a channel and the
+        hash of the embed it shows (see _content_hash).
+        """
+        key = str(channel_id)
+        if self.last_leaderboard_messages.get(key) != message_id:
+            self._leaderboard_messages.pop(int(channel_id), None)
+        self.last_leaderboard_messages[key] = message_id
+        self._rendered_hashes[key] = content_hash
+        self._pending_pointers[key] = (message_id, content_hash)
+        if self._pointer_flush is None:
+            self._pointer_flush = asyncio.get_running_loop().create_task(self._flush_pointers())
 
-    def set_last_leaderboard_message(self, channel_id, message_id):
-        """Stores the ID of the last leaderboard message sent in a channel."""
-        self.last_leaderboard_messages[str(channel_id)] = message_id
-        self._save_last_messages()
+    async def _flush_pointers(self):
+        """
+        Writes pending pointers in the background. Pointers set while a write
+        is in flight are batched into the next one.
+        """
+        try:
+            while self._pending_pointers:
+                pending, self._pending_pointers = self._pending_pointers, {}
+                if not await self.db.set_leaderboard_messages([(c, m, h) for c, (m, h) in pending.items()]):
+                    # Retry with the next change; newer pointers win
+                    self._pending_pointers = {**pending, **self._pending_pointers}
+                    break
+        finally:
+            self._pointer_flush = None
 
     def get_last_leaderboard_message(self, channel_id):
         """Retrieves the ID of the last leaderboard message for a channel."""
         return self.last_leaderboard_messages.get(str(channel_id))
 
-    @commands.command(name='leaderboard', help=f'Displays the recent winners leaderboard for this server.')
-    async def display_leaderboard_command(self, ctx: commands.Context, channel: discord.TextChannel = None):
-        if not ctx.guild:
-            return await ctx.send("❌ This command can only be used in a server.")
+    async def get_guild_winners(self, guild_id):
+        """
+        Returns the guild's RecentWinners buffer. Only the first call per guild
+        queries the database; afterwards reads cost no I/O.
+        """
+        winners = self.recent_winners.get(guild_id)
+        if winners is None:
+            rows = await self.db.get_recent_winners_for_guild(guild_id, limit=MAX_LEADERBOARD_ENTRIES)
+            # Another caller may have warmed the guild while we were waiting
+            winners = self.recent_winners.setdefault(guild_id, RecentWinners(rows))
+        return winners
 
-        channel = channel or ctx.channel
-        
-        # Fetch the most recent winners for this guild from the database
-        winners = self.db.get_recent_winners_for_guild(ctx.guild.id, limit=MAX_LEADERBOARD_ENTRIES)
+    async def record_winner(self, user_id, username, game_name, host_id, host_name, guild_id):
+        """Stores a winner in the database and, if that succeeds, in the guild's buffer."""
+        # Warm the buffer first: loaded after the insert, it would already hold this winner
+        winners = await self.get_guild_winners(guild_id)
+        added = await self.db.add_winner(
+            user_id=user_id, username=username, game_name=game_name,
+            host_id=host_id, host_name=host_name, guild_id=guild_id
+        )
+        if added:
+            winners.push({
+                'user_id': str(user_id),
+                'username': username,
+                'game_name': game_name,
+                'host_id': str(host_id),
+                'host_name': host_name,
+                'timestamp': datetime.datetime.now().strftime("%b %d, %Y %I:%M %p")
+            })
+        return added
 
-        if not winners:
-            await channel.send("ℹ️ The leaderboard is currently empty for this server.")
+    async def clear_winners(self, guild_id):
+        """Clears the guild's winners from the database and empties its buffer."""
+        cleared = await self.db.clear_leaderboard_for_guild(guild_id)
+        if cleared:
+            self.recent_winners[guild_id] = RecentWinners()
+        else:
+            # Unknown state; re-read from the database next time
+            self.recent_winners.pop(guild_id, None)
+        return cleared
+
+    # --- Fast-path API for games that run many rounds (Lyrics, Emoji Decode) ---
+    # These never wait on I/O: they read and update the in-memory buffer and
+    # write through to the database in the background. Games should await
+    # get_guild_winners() once when they start so the buffer is warm.
+
+    def is_leaderboard_full(self, guild_id):
+        """True once the guild's board holds MAX_LEADERBOARD_ENTRIES winners."""
+        winners = self.recent_winners.get(guild_id)
+        return winners is not None and len(winners) >= MAX_LEADERBOARD_ENTRIES
+
+    def is_recent_winner(self, guild_id, user_id):
+        """O(1) check for whether a user is already on the guild's board."""
+        winners = self.recent_winners.get(guild_id)
+        return winners is not None and user_id in winners
+
+    def get_recent_winners(self, guild_id):
+        """Returns the guild's current winners, newest first."""
+        return list(self.recent_winners.get(guild_id, ()))
+
+    def add_recent_winner(self, guild_id, user_id, username, game_name, host_id, host_name):
+        """
+        Adds a winner to the guild's board unless they are already on it and
+        queues the database insert. Returns True if the winner was added.
+        """
+        winners = self.recent_winners.setdefault(guild_id, RecentWinners())
+        if user_id in winners:
+            return False
+
+        winners.push({
+            'user_id': str(user_id),
+            'username': username,
+            'game_name': game_name,
+            'host_id': str(host_id),
+            'host_name': host_name,
+            'timestamp': datetime.datetime.now().strftime("%b %d, %Y %I:%M %p")
+        })
+        self._write_through(guild_id, self.db.add_winner,
+                            user_id, username, game_name, host_id, host_name, guild_id)
+        return True
+
+    def reset_leaderboard(self, guild_id):
+        """Empties the guild's board now and clears the database in the background."""
+        self.recent_winners[guild_id] = RecentWinners()
+        self._write_through(guild_id, self.db.clear_leaderboard_for_guild, guild_id)
+
+    def _write_through(self, guild_id, func, *args, **kwargs):
+        """
+        Runs a database write in the background. Writes for the same guild are
+        chained so an insert can never land after a later clear.
+        """
+        previous = self._guild_writes.get(guild_id)
+
+        async def run():
+            if previous is not None:
+                await asyncio.wait([previous])
+            if not await func(*args, **kwargs):
+                print(f"Leaderboard write-through failed for guild {guild_id}: {func.__name__}")
+
+        task = asyncio.get_running_loop().create_task(run())
+        self._guild_writes[guild_id] = task
+
+        def forget(done):
+            if self._guild_writes.get(guild_id) is done:
+                del self._guild_writes[guild_id]
+        task.add_done_callback(forget)
+
+    async def cog_unload(self):
+        for handle in self._pending_refreshes.values():
+            handle.cancel()
+        self._pending_refreshes.clear()
+        if self._pointer_flush is not None:
+            await self._pointer_flush
+        if self._pending_pointers:
+            await self._flush_pointers()
+        # Let queued write-through tasks finish before the database closes
+        if self._guild_writes:
+            await asyncio.wait(list(self._guild_writes.values()))
+
+    async def _winners_role_logic(self, channel, bot, check, timeout=60):
+        """
+        Asks the host in `channel` which role the winners should get and returns
+        the role name, or None if nobody answered in time.
+        """
+        await channel.send(f"🏅 Type the name of the role to give this round's winners. You have {timeout} seconds.")
+        try:
+            msg = await bot.wait_for("message", timeout=timeout, check=check)
+        except asyncio.TimeoutError:
+            await channel.send("⌛ No role name received.")
+            return None
+        role_name = msg.content.strip()
+        return role_name or None
+
+    async def _giverole_logic(self, channel, role_name, guild_id=None):
+        """Gives `role_name` to every winner currently on the guild's board."""
+        guild = channel.guild
+        guild_id = guild_id or guild.id
+        role = discord.utils.get(guild.roles, name=role_name)
+        if role is None:
+            await channel.send(f"❌ Role `{role_name}` was not found in this server.")
             return
 
+        given, missing = 0, 0
+        for entry in self.get_recent_winners(guild_id):
+            member = guild.get_member(int(entry['user_id']))
+            if member is None:
+                missing += 1
+                continue
+            try:
+                await member.add_roles(role, reason="Game leaderboard winner")
+                given += 1
+            except discord.Forbidden:
+                await channel.send(f"❌ I don't have permission to assign `{role_name}`.")
+                return
+            except discord.HTTPException as e:
+                print(f"Error giving role {role_name} to {entry['username']}: {e}")
+                missing += 1
+
+        await channel.send(f"✅ Gave `{role_name}` to {given} winner(s)." + (f" {missing} could not be updated." if missing else ""))
+
+    def _build_leaderboard_embed(self, guild, winners):
+        """Builds the leaderboard embed for a guild's winners."""
         embed = discord.Embed(
             title="🏆 Recent Game Winners Leaderboard 🏆",
             description=f"Here are the last {len(winners)} players to win a game on this server!",
             color=discord.Color.gold()
         )
 
+        if not winners:
+            embed.description = "The leaderboard is currently empty for this server."
+            return embed
+
         for i, entry in enumerate(winners, 1):
             winner_display_name = entry['username']
-            
+
             # Use guild.get_member() to get the member object if they are still in the server
-            host_member = channel.guild.get_member(int(entry['host_id']))
+            host_member = guild.get_member(int(entry['host_id']))
             host_display_name = host_member.mention if host_member else entry['host_name']
 
             embed.add_field(
@@ -83,11 +348,29 @@ class Leaderboard(commands.Cog):
                        f"• When: {entry['timestamp']}"),
                 inline=False
             )
+        return embed
 
+    async def send_leaderboard(self, channel: discord.TextChannel):
+        """Sends a fresh leaderboard message to a channel."""
+        # Most recent winners for this guild, served from memory
+        winners = list(await self.get_guild_winners(channel.guild.id))
+
+        if not winners:
+            await channel.send("ℹ️ The leaderboard is currently empty for this server.")
+            return
+
+        embed = self._build_leaderboard_embed(channel.guild, winners)
         leaderboard_msg = await channel.send(embed=embed)
         # Only track the last message if it's in the designated leaderboard channel
         if channel.id == int(LEADERBOARD_CHANNEL_ID):
-            self.set_last_leaderboard_message(channel.id, leaderboard_msg.id)
+            self.set_last_leaderboard_message(channel.id, leaderboard_msg.id, self._content_hash(embed))
+
+    @commands.command(name='leaderboard', help=f'Displays the recent winners leaderboard for this server.')
+    async def display_leaderboard_command(self, ctx: commands.Context, channel: discord.TextChannel = None):
+        if not ctx.guild:
+            return await ctx.send("❌ This command can only be used in a server.")
+
+        await self.send_leaderboard(channel or ctx.channel)
 
     @commands.command(name='clearleaderboard', help='Resets the winners leaderboard for this server.')
     @commands.has_permissions(administrator=True)
@@ -96,7 +379,7 @@ class Leaderboard(commands.Cog):
             return await ctx.send("❌ This command can only be used in a server.")
 
         # Clear all winner records for the current guild from the database
-        cleared = self.db.clear_leaderboard_for_guild(ctx.guild.id)
+        cleared = await self.clear_winners(ctx.guild.id)
         
         if cleared:
             await ctx.send("✅ The recent winners leaderboard for this server has been cleared from the database.")
@@ -109,66 +392,104 @@ class Leaderboard(commands.Cog):
             await self.update_leaderboard_display(leaderboard_channel)
 
     async def update_leaderboard_display(self, channel: discord.TextChannel):
-        """Updates the leaderboard message in a specific channel."""
-        if not channel.guild:
+        """
+        Schedules a refresh of the leaderboard message in a channel. Requests
+        made while one is pending are absorbed by it, so a burst of wins costs
+        a single edit, rendered from the board as it is when the refresh runs.
+        """
+        if not channel.guild or channel.id in self._pending_refreshes:
             return
-
-        # Fetch winners from the database
-        winners = self.db.get_recent_winners_for_guild(channel.guild.id, limit=MAX_LEADERBOARD_ENTRIES)
-        last_message_id = self.get_last_leaderboard_message(channel.id)
-
-        embed = discord.Embed(
-            title="🏆 Recent Game Winners Leaderboard 🏆",
-            description=f"Here are the last {len(winners)} players to win a game on this server!",
-            color=discord.Color.gold()
+        self._pending_refreshes[channel.id] = self.bot.scheduler.call_later(
+            LEADERBOARD_REFRESH_DELAY, self._refresh_leaderboard, channel
         )
 
-        if not winners:
-            embed.description = "The leaderboard is currently empty for this server."
-        else:
-            for i, entry in enumerate(winners, 1):
-                winner_display_name = entry['username']
-                
-                host_member = channel.guild.get_member(int(entry['host_id']))
-                host_display_name = host_member.mention if host_member else entry['host_name']
-
-                embed.add_field(
-                    name=f"#{i}. **{winner_display_name}**",
-                    value=(f"• Game: `{entry['game_name']}`\n"
-                           f"• Hosted by: {host_display_name}\n"
-                           f"• When: {entry['timestamp']}"),
-                    inline=False
-                )
+    async def flush_leaderboard_display(self, channel: discord.TextChannel):
+        """
+        Refreshes the leaderboard message in a channel now, replacing any
+        scheduled refresh. Use before reset_leaderboard, which would otherwise
+        empty the board before a scheduled refresh renders it.
+        """
+        handle = self._pending_refreshes.pop(channel.id, None)
+        if handle is not None:
+            handle.cancel()
+        if channel.guild:
+            await self._refresh_leaderboard(channel)
 
-        try:
-            if last_message_id:
-                try:
-                    message = await channel.fetch_message(last_message_id)
-                    await message.edit(embed=embed)
-                except discord.NotFound:
-                    print("Old leaderboard message not found, sending a new one.")
-                    new_msg = await channel.send(embed=embed)
-                    self.set_last_leaderboard_message(channel.id, new_msg.id)
-            else:
+    async def _refresh_leaderboard(self, channel):
+        """
+        Edits the channel's leaderboard message, or sends one if it has none.
+        Nothing is sent if the message already shows this content. Returns
+        True if a request was made.
+        """
+        # Requests arriving from here on schedule the next refresh
+        self._pending_refreshes.pop(channel.id, None)
+        lock = self._refresh_locks.setdefault(channel.id, asyncio.Lock())
+        async with lock:
+            winners = list(await self.get_guild_winners(channel.guild.id))
+            embed = self._build_leaderboard_embed(channel.guild, winners)
+            content_hash = self._content_hash(embed)
+
+            try:
+                message = self._leaderboard_message(channel)
+                if message is not None:
+                    if content_hash == self._rendered_hashes.get(str(channel.id)):
+                        return False
+                    try:
+                        await message.edit(embed=embed)
+                        self.set_last_leaderboard_message(channel.id, message.id, content_hash)
+                        return True
+                    except discord.NotFound:
+                        print("Old leaderboard message not found, sending a new one.")
                 new_msg = await channel.send(embed=embed)
-                self.set_last_leaderboard_message(channel.id, new_msg.id)
-        except Exception as e:
-            print(f"Error updating leaderboard display: {e}")
-    
+                self.set_last_leaderboard_message(channel.id, new_msg.id, content_hash)
+                return True
+            except Exception as e:
+                print(f"Error updating leaderboard display: {e}")
+                return False
+
+    @staticmethod
+    def _content_hash(embed):
+        return hashlib.blake2b(json.dumps(embed.to_dict(), sort_keys=True).encode("utf-8"), digest_size=16).hexdigest()
+
+    def _leaderboard_message(self, channel):
+        """The channel's leaderboard as a PartialMessage (no REST call), or None."""
+        message = self._leaderboard_messages.get(channel.id)
+        if message is None:
+            message_id = self.get_last_leaderboard_message(channel.id)
+            if not message_id:
+                return None
+            message = self._leaderboard_messages[channel.id] = channel.get_partial_message(int(message_id))
+        return message
+
     @commands.Cog.listener()
     async def on_ready(self):
+        if self._warmed_up:
+            return
+        self._warmed_up = True
         print("Leaderboard cog is ready.")
-        await asyncio.sleep(1) # Wait for bot to fully connect to guilds
-        # Iterate through all guilds the bot is in and update their leaderboards
-        for guild in self.bot.guilds:
+        try:
+            channel_id = int(LEADERBOARD_CHANNEL_ID)
+        except (ValueError, TypeError):
+            print("Warning: LEADERBOARD_CHANNEL_ID is not a valid integer; skipping the leaderboard warm-up.")
+            return
+
+        # Refresh every guild's leaderboard concurrently, a few at a time
+        started = time.perf_counter()
+        semaphore = asyncio.Semaphore(LEADERBOARD_WARMUP_CONCURRENCY)
+        channels = [channel for channel in (guild.get_channel(channel_id) for guild in self.bot.guilds) if channel]
+        results = await asyncio.gather(*(self._warm_up(channel, semaphore) for channel in channels))
+        print(
+            f"Leaderboard warm-up: {sum(results)} of {len(channels)} leaderboards updated "
+            f"in {time.perf_counter() - started:.2f}s."
+        )
+
+    async def _warm_up(self, channel, semaphore):
+        async with semaphore:
             try:
-                leaderboard_channel = guild.get_channel(int(LEADERBOARD_CHANNEL_ID))
-                if leaderboard_channel:
-                    await self.update_leaderboard_display(leaderboard_channel)
-            except (ValueError, TypeError):
-                print(f"Warning: LEADERBOARD_CHANNEL_ID is not a valid integer for guild {guild.name}.")
+                return await self._refresh_leaderboard(channel)
             except Exception as e:
-                print(f"Error updating leaderboard for guild {guild.name}: {e}")
+                print(f"Error updating leaderboard for guild {channel.guild.name}: {e}")
+                return False
 
 async def setup(bot):
     await bot.add_cog(Leaderboard(bot))
\ No newline at end of file
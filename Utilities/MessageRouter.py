@@ -0,0 +1,84 @@
+import asyncio
+from discord.ext import commands
+from Utilities.AnswerMatcher import normalize_answer
+
+
+class AnswerRoute:
+    """A single pending answer wait: the round's matcher and the future it resolves."""
+    __slots__ = ("check", "future")
+
+    def __init__(self, check, future):
+        self.check = check
+        self.future = future
+
+
+def _expire(future):
+    if not future.done():
+        future.set_exception(asyncio.TimeoutError())
+
+
+class MessageRouter(commands.Cog):
+    """
+    Routes chat messages to the game round waiting in that channel.
+
+    With bot.wait_for every pending round's check runs against every message in
+    every guild. Here rounds are indexed by channel id, so a message costs one
+    dict lookup, its content goes through normalize_answer once, and only the
+    matchers of the rounds in that channel run. Round timeouts are entries in
+    the bot-wide Scheduler rather than one event-loop timer per round.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.scheduler = bot.scheduler
+        # channel_id -> list of AnswerRoute (usually one; two games may share a channel)
+        self.routes = {}
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        print("MessageRouter cog is ready.")
+
+    async def wait_for_answer(self, channel_id, check, timeout):
+        """
+        Waits for the first message in `channel_id` for which
+        check(message, content) is true, where content is the message text after
+        normalize_answer. Bot messages are never passed to check.
+        Raises asyncio.TimeoutError like bot.wait_for.
+        """
+        route = AnswerRoute(check, asyncio.get_running_loop().create_future())
+        self.routes.setdefault(channel_id, []).append(route)
+        timer = self.scheduler.call_later(timeout, _expire, route.future)
+        try:
+            return await route.future
+        finally:
+            timer.cancel()
+            routes = self.routes.get(channel_id)
+            if routes is not None:
+                routes.remove(route)
+                if not routes:
+                    del self.routes[channel_id]
+
+    @commands.Cog.listener()
+    async def on_message(self, message):
+        if message.author.bot:
+            return
+
+        routes = self.routes.get(message.channel.id)
+        if not routes:
+            return
+
+        content = normalize_answer(message.content)
+        for route in tuple(routes):
+            if route.future.done():
+                continue
+            try:
+                matched = route.check(message, content)
+            except Exception as e:
+                route.future.set_exception(e)
+                continue
+            if matched:
+                route.future.set_result(message)
+
+
+async def setup(bot):
+    await bot.add_cog(MessageRouter(bot))
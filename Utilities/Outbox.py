@@ -0,0 +1,158 @@
+import asyncio
+import os
+from collections import deque
+import discord
+from dotenv import load_dotenv
+load_dotenv()
+
+# Embeds queued for a channel within OUTBOX_WINDOW seconds of each other are
+# sent together as one message.
+OUTBOX_WINDOW = float(os.getenv('OUTBOX_WINDOW', 0.25))
+# Retries of a send that hit a 429 before it is dropped
+OUTBOX_MAX_RETRIES = int(os.getenv('OUTBOX_MAX_RETRIES', 3))
+
+# Discord limits per message
+MAX_EMBEDS = 10
+MAX_EMBED_CHARS = 6000
+
+
+class OutboundMessage:
+    """One message being assembled: optional leading text plus up to MAX_EMBEDS embeds."""
+    __slots__ = ("content", "embeds", "size", "future")
+
+    def __init__(self, future):
+        self.content = None
+        self.embeds = []
+        self.size = 0
+        self.future = future
+
+    def accepts(self, content, embed):
+        # Text can only lead a message, so it never joins one already holding parts
+        if content is not None and (self.content is not None or self.embeds):
+            return False
+        if embed is not None:
+            return len(self.embeds) < MAX_EMBEDS and self.size + len(embed) <= MAX_EMBED_CHARS
+        return True
+
+    def add(self, content, embed):
+        if content is not None:
+            self.content = content
+        if embed is not None:
+            self.embeds.append(embed)
+            self.size += len(embed)
+
+
+class ChannelQueue:
+    __slots__ = ("messages", "last", "task")
+
+    def __init__(self):
+        self.messages = deque()
+        self.last = None
+        self.task = None
+
+
+class Outbox:
+    """
+    Per-channel outbound queue for game announcements.
+
+    Parts queued for a channel within a short window are merged into as few
+    messages as Discord allows (one text, up to ten embeds), so a round's
+    "Correct!", "Milestone!" and the next question cost one REST call instead
+    of three. Messages leave each channel in the order they were queued, and
+    a 429 is retried after the delay Discord asked for.
+    """
+
+    def __init__(self, window=OUTBOX_WINDOW, max_retries=OUTBOX_MAX_RETRIES):
+        self.window = window
+        self.max_retries = max_retries
+        self._queues = {}
+
+    def queue(self, channel, content=None, embed=None):
+        """
+        Queues text and/or an embed for channel without waiting. Returns a
+        future resolving to the sent discord.Message, or None if sending failed.
+        """
+        queue = self._queues.get(channel.id)
+        if queue is None:
+            queue = self._queues[channel.id] = ChannelQueue()
+
+        message = queue.messages[-1] if queue.messages else None
+        if message is None or not message.accepts(content, embed):
+            message = OutboundMessage(asyncio.get_running_loop().create_future())
+            queue.messages.append(message)
+            queue.last = message
+        message.add(content, embed)
+
+        if queue.task is None:
+            queue.task = asyncio.ensure_future(self._drain(channel, queue))
+        return message.future
+
+    async def send(self, channel, content=None, embed=None):
+        """Queues a part and waits until the message carrying it has been sent."""
+        return await asyncio.shield(self.queue(channel, content=content, embed=embed))
+
+    async def flush(self, channel):
+        """Waits until everything queued so far for channel has been sent."""
+        queue = self._queues.get(channel.id)
+        if queue is not None and queue.last is not None and not queue.last.future.done():
+            await asyncio.shield(queue.last.future)
+
+    def close(self):
+        for queue in self._queues.values():
+            if queue.task is not None:
+                queue.task.cancel()
+
+    async def _drain(self, channel, queue):
+        try:
+            # Give the rest of the round a moment to queue its parts
+            await asyncio.sleep(self.window)
+            while queue.messages:
+                message = queue.messages.popleft()
+                sent = await self._deliver(channel, message)
+                if not message.future.done():
+                    message.future.set_result(sent)
+        finally:
+            for message in queue.messages:
+                if not message.future.done():
+                    message.future.set_result(None)
+            queue.messages.clear()
+            queue.task = None
+            if self._queues.get(channel.id) is queue:
+                del self._queues[channel.id]
+
+    async def _deliver(self, channel, message):
+        kwargs = {}
+        if message.content is not None:
+            kwargs["content"] = message.content
+        if message.embeds:
+            kwargs["embeds"] = message.embeds
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await channel.send(**kwargs)
+            except discord.RateLimited as e:
+                delay = e.retry_after
+            except discord.HTTPException as e:
+                if e.status != 429:
+                    print(f"Error sending to channel {channel.id}: {e}")
+                    return None
+                delay = self._retry_after(e)
+
+            if attempt == self.max_retries:
+                break
+            print(f"Rate limited in channel {channel.id}; retrying in {delay:.2f}s.")
+            await asyncio.sleep(delay)
+
+        print(f"Giving up on a message to channel {channel.id} after {self.max_retries} retries.")
+        return None
+
+    @staticmethod
+    def _retry_after(error):
+        # discord.py exposes the raw response; Discord sends the wait in these headers
+        headers = getattr(error.response, "headers", None) or {}
+        for header in ("Retry-After", "X-RateLimit-Reset-After"):
+            try:
+                return float(headers[header])
+            except (KeyError, TypeError, ValueError):
+                continue
+        return 1.0
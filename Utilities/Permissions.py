@@ -0,0 +1,65 @@
+# Roles allowed to host games in servers that have not run /setup
+DEFAULT_ROLE_NAMES = frozenset({"Game Master", "Moderator"})
+
+
+class GuildRoles:
+    """The role IDs that may host games in one guild."""
+    __slots__ = ("role_ids", "configured")
+
+    def __init__(self, role_ids, configured):
+        self.role_ids = role_ids
+        # False when the guild has not run /setup and DEFAULT_ROLE_NAMES apply
+        self.configured = configured
+
+
+class PermissionResolver:
+    """
+    Decides who may start and stop games. Each guild's allowed roles are
+    resolved once into a frozenset of role IDs and kept until /setup or a
+    role change invalidates them, so a permission check is a few ID lookups
+    on the member with no I/O. If the settings cannot be read, the check
+    falls back to DEFAULT_ROLE_NAMES and the guild is read again next time.
+    """
+
+    def __init__(self, db, default_role_names=DEFAULT_ROLE_NAMES):
+        self.db = db
+        self.default_role_names = frozenset(default_role_names)
+        # guild_id -> GuildRoles
+        self._guilds = {}
+
+    async def roles(self, guild):
+        """Returns the guild's GuildRoles, reading its settings on first use."""
+        roles = self._guilds.get(guild.id)
+        if roles is None:
+            settings = await self.db.get_server_settings(guild.id)
+            if settings is None:
+                # Database error: answer this check only, so it is not remembered
+                print(f"Could not read server settings for guild {guild.id}; using the default roles.")
+                return self._resolve(guild, {})
+            # Another check may have resolved the guild while we were waiting
+            roles = self._guilds.setdefault(guild.id, self._resolve(guild, settings))
+        return roles
+
+    async def is_configured(self, guild):
+        """True if the guild has run /setup."""
+        return (await self.roles(guild)).configured
+
+    async def can_host(self, member):
+        """True if member holds one of the guild's allowed roles."""
+        role_ids = (await self.roles(member.guild)).role_ids
+        # get_role is a binary search over the member's role IDs; no Role list is built
+        return any(member.get_role(role_id) is not None for role_id in role_ids)
+
+    def invalidate(self, guild_id):
+        self._guilds.pop(guild_id, None)
+
+    def _resolve(self, guild, settings):
+        # Empty settings: the guild has not run /setup
+        if not settings:
+            names = self.default_role_names
+        elif settings.get('allowed_role_ids'):
+            return GuildRoles(frozenset(int(role_id) for role_id in settings['allowed_role_ids']), True)
+        else:
+            # Settings saved before /setup stored role IDs
+            names = frozenset(settings.get('allowed_roles', ()))
+        return GuildRoles(frozenset(role.id for role in guild.roles if role.name in names), bool(settings))
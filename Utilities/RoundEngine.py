@@ -0,0 +1,74 @@
+import asyncio
+
+
+class RoundEngine:
+    """
+    Runs a game as a loop of rounds instead of a chain of recursive coroutines.
+    Each iteration picks an item, posts its prompt, waits for a matching answer
+    through the MessageRouter and hands the result to the game's hooks. Nothing
+    from a finished round is kept, so memory per game stays constant however
+    many rounds are played.
+
+    Hooks supplied by the game:
+      pick_item()                        -> next item, or None when none are left
+      render_prompt(item)                -> discord.Embed announcing the round
+      match_answer(item, message, text)  -> True if the message wins the round
+      on_win(item, message)              -> coroutine; return False to end the game
+      on_timeout(item)                   -> coroutine; return False to end the game
+      is_running()                       -> False once the game has been stopped
+
+    With an Outbox, prompts go through it so they merge with whatever the
+    previous round's hooks queued.
+    """
+
+    # Reasons returned by run()
+    EXHAUSTED = "exhausted"
+    STOPPED = "stopped"
+    ENDED = "ended"
+
+    def __init__(self, router, channel, *, pick_item, render_prompt, match_answer,
+                 on_win, on_timeout, is_running, timeout=30, outbox=None):
+        self.router = router
+        self.channel = channel
+        self.pick_item = pick_item
+        self.render_prompt = render_prompt
+        self.match_answer = match_answer
+        self.on_win = on_win
+        self.on_timeout = on_timeout
+        self.is_running = is_running
+        self.timeout = timeout
+        self.outbox = outbox
+
+    async def run(self):
+        """Plays rounds until the game is stopped, a hook ends it or items run out."""
+        while self.is_running():
+            item = self.pick_item()
+            if item is None:
+                return self.EXHAUSTED
+
+            if self.outbox is not None:
+                await self.outbox.send(self.channel, embed=self.render_prompt(item))
+            else:
+                await self.channel.send(embed=self.render_prompt(item))
+            winner = await self._wait_for_winner(item)
+
+            if not self.is_running():
+                return self.STOPPED
+            if winner is not None:
+                keep_going = await self.on_win(item, winner)
+            else:
+                keep_going = await self.on_timeout(item)
+            if keep_going is False:
+                return self.ENDED
+        return self.STOPPED
+
+    async def _wait_for_winner(self, item):
+        """Returns the winning message, or None if the round timed out."""
+        try:
+            return await self.router.wait_for_answer(
+                self.channel.id,
+                lambda message, content: self.match_answer(item, message, content),
+                timeout=self.timeout
+            )
+        except asyncio.TimeoutError:
+            return None
@@ -0,0 +1,129 @@
+import asyncio
+import heapq
+import itertools
+
+
+class TimerHandle:
+    """
+    A callback registered with the Scheduler. cancel() only flags the entry;
+    it stays in the heap and is dropped when it reaches the top, so cancelling
+    is O(1) however many timers are pending.
+    """
+    __slots__ = ("when", "callback", "args", "cancelled", "_scheduler")
+
+    def __init__(self, when, callback, args, scheduler):
+        self.when = when
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+        self._scheduler = scheduler
+
+    def cancel(self):
+        # Cancelling a timer that already fired (or was cancelled) is a no-op
+        if self._scheduler is not None:
+            self.cancelled = True
+            self._scheduler._on_cancel()
+            self._scheduler = None
+
+
+class Scheduler:
+    """
+    Bot-wide timer service for round timeouts, hints and game deadlines.
+
+    All deadlines live in one min-heap, and a single event-loop timer is armed
+    for the earliest one, so ten thousand pending rounds cost ten thousand
+    small heap entries rather than as many loop timers and tasks. Callbacks
+    run on the event loop; a callback that returns a coroutine is run as a
+    task, so game code can schedule `async def` hooks directly.
+    """
+
+    # Cancelled entries are purged once there are at least this many...
+    COMPACT_MIN = 64
+    # ...and they make up more than this share of the heap
+    COMPACT_RATIO = 0.5
+
+    def __init__(self):
+        self._heap = []  # (when, seq, TimerHandle); seq keeps equal deadlines FIFO
+        self._seq = itertools.count()
+        self._cancelled = 0
+        self._loop = None
+        self._wakeup = None
+        self._wakeup_at = None
+        self._tasks = set()
+
+    def __len__(self):
+        """Number of pending (not cancelled) timers."""
+        return len(self._heap) - self._cancelled
+
+    def call_later(self, delay, callback, *args):
+        """Runs callback(*args) after `delay` seconds. Returns a TimerHandle."""
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        return self.call_at(self._loop.time() + delay, callback, *args)
+
+    def call_at(self, when, callback, *args):
+        """Runs callback(*args) at loop time `when`. Returns a TimerHandle."""
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        handle = TimerHandle(when, callback, args, self)
+        heapq.heappush(self._heap, (when, next(self._seq), handle))
+        if self._wakeup_at is None or when < self._wakeup_at:
+            self._arm(when)
+        return handle
+
+    def close(self):
+        """Drops every pending timer and cancels callbacks still running."""
+        if self._wakeup is not None:
+            self._wakeup.cancel()
+        self._wakeup = self._wakeup_at = None
+        for _, _, handle in self._heap:
+            handle._scheduler = None
+        self._heap.clear()
+        self._cancelled = 0
+        for task in tuple(self._tasks):
+            task.cancel()
+
+    def _arm(self, when):
+        if self._wakeup is not None:
+            self._wakeup.cancel()
+        self._wakeup_at = when
+        self._wakeup = self._loop.call_at(when, self._fire)
+
+    def _fire(self):
+        self._wakeup = self._wakeup_at = None
+        now = self._loop.time()
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            _, _, handle = heapq.heappop(heap)
+            if handle.cancelled:
+                self._cancelled -= 1
+                continue
+            handle._scheduler = None
+            self._invoke(handle)
+        if heap:
+            self._arm(heap[0][0])
+
+    def _invoke(self, handle):
+        try:
+            result = handle.callback(*handle.args)
+        except Exception as e:
+            print(f"Scheduled callback {handle.callback!r} failed: {e}")
+            return
+        if asyncio.iscoroutine(result):
+            task = self._loop.create_task(self._run_coroutine(result))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_coroutine(self, coro):
+        try:
+            await coro
+        except Exception as e:
+            print(f"Scheduled coroutine {coro!r} failed: {e}")
+
+    def _on_cancel(self):
+        self._cancelled += 1
+        if self._cancelled >= self.COMPACT_MIN and self._cancelled > len(self._heap) * self.COMPACT_RATIO:
+            # In place: _fire may be iterating this very list when a callback cancels
+            self._heap[:] = [entry for entry in self._heap if not entry[2].cancelled]
+            heapq.heapify(self._heap)
+            self._cancelled = 0
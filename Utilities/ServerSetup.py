@@ -3,7 +3,6 @@ from discord.ext import commands
 from discord import app_commands
 import os
 from dotenv import load_dotenv
-from database import DatabaseManager
 
 load_dotenv()
 TOKEN = os.getenv('DISCORD_TOKEN')
@@ -11,7 +10,8 @@ TOKEN = os.getenv('DISCORD_TOKEN')
 class Setup(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.db = DatabaseManager()
+        self.db = bot.db
+        self.permissions = bot.permissions
 
     @app_commands.command(name="setup", description="Configure the bot for this server.")
     @app_commands.checks.has_permissions(administrator=True)
@@ -21,10 +21,12 @@ class Setup(commands.Cog):
         guild_id = interaction.guild.id
         
         # The database call is now safe because the interaction is deferred
-        self.db.update_server_settings(
+        await self.db.update_server_settings(
             guild_id=guild_id,
-            allowed_roles=[game_master_role.name]
+            allowed_roles=[game_master_role.name],
+            allowed_role_ids=[game_master_role.id]
         )
+        self.permissions.invalidate(guild_id)
 
         # Send the final response as a follow-up message
         await interaction.followup.send(
@@ -32,6 +34,61 @@ class Setup(commands.Cog):
             "youre good to go! 🎉",
         )
 
+    @app_commands.command(name="cachestats", description="Show the server settings cache hit rate.")
+    @app_commands.checks.has_permissions(administrator=True)
+    async def cachestats(self, interaction: discord.Interaction):
+        stats = self.db.settings_cache.stats()
+        await interaction.response.send_message(
+            f"🗄️ Settings cache: `{stats['hits']}` hits, `{stats['misses']}` misses "
+            f"({stats['hit_rate']:.1%} hit rate), `{stats['size']}/{stats['maxsize']}` entries.",
+            ephemeral=True
+        )
+
+    @app_commands.command(name="sessionstats", description="Show running games and their memory use.")
+    @app_commands.checks.has_permissions(administrator=True)
+    async def sessionstats(self, interaction: discord.Interaction):
+        report = self.bot.sessions.memory_report()
+        if not report:
+            return await interaction.response.send_message("ℹ️ No games are running.", ephemeral=True)
+
+        lines = [
+            f"`{game}`: {entry['sessions']} running, ~{entry['avg_bytes']} bytes each ({entry['total_bytes']} total)"
+            for game, entry in sorted(report.items())
+        ]
+        await interaction.response.send_message("🎮 Running games:\n" + "\n".join(lines), ephemeral=True)
+
+    @app_commands.command(name="reloadcontent", description="Re-read the question files without restarting the bot.")
+    @app_commands.checks.has_permissions(administrator=True)
+    async def reloadcontent(self, interaction: discord.Interaction):
+        await interaction.response.defer(ephemeral=True)
+        replaced = await self.bot.content.reload()
+        if not replaced:
+            return await interaction.followup.send("⚠️ No question files could be reloaded. Check the bot logs.", ephemeral=True)
+
+        lines = [f"`{name}`: {count} items" for name, count in sorted(replaced.items())]
+        await interaction.followup.send(
+            "🔄 Reloaded question banks. Running games switch over at their next reshuffle.\n" + "\n".join(lines),
+            ephemeral=True
+        )
+
+    # Allowed roles are cached as IDs; a role change can alter which IDs match
+    @commands.Cog.listener()
+    async def on_guild_role_create(self, role):
+        self.permissions.invalidate(role.guild.id)
+
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role):
+        self.permissions.invalidate(role.guild.id)
+
+    @commands.Cog.listener()
+    async def on_guild_role_update(self, before, after):
+        if before.name != after.name:
+            self.permissions.invalidate(after.guild.id)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        self.permissions.invalidate(guild.id)
+
     @setup.error
     async def setup_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError):
         # Check if the interaction has already been responded to
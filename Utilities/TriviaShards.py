@@ -0,0 +1,71 @@
+"""
+Category shards of the trivia bank.
+
+Every question in Data/trivia_questions.json carries a "category"; the
+shards are that bank split by category into Data/trivia/<category>.json,
+which ContentStore serves as the datasets "trivia:<category>" behind
+/starttrivia's category option. Rebuild them after editing the bank with:
+
+    python -m Utilities.TriviaShards
+
+Shards whose content did not change are left untouched, so the content
+watcher only reloads the categories that were edited. Shards of categories
+that no longer exist in the bank are removed.
+"""
+import json
+import os
+import re
+import sys
+from Utilities.ContentStore import DATASETS, TRIVIA_SHARD_DIR
+
+# Category names become file names and dataset names
+CATEGORY_NAME = re.compile(r"^[a-z0-9_-]+$")
+
+
+def split(items):
+    """Returns {category: [records]} for the records that have a valid category."""
+    shards = {}
+    for item in items:
+        category = str(item.get("category", "")).strip().lower()
+        if not CATEGORY_NAME.match(category):
+            print(f"Skipping a question without a usable category: {item.get('question')!r}")
+            continue
+        shards.setdefault(category, []).append(item)
+    return shards
+
+
+def write_shards(source_path=DATASETS["trivia"][0], directory=TRIVIA_SHARD_DIR):
+    """Splits source_path into directory. Returns {category: number of questions}."""
+    with open(source_path, "r", encoding="utf-8") as f:
+        shards = split(json.load(f))
+
+    os.makedirs(directory, exist_ok=True)
+    for category, items in shards.items():
+        path = os.path.join(directory, f"{category}.json")
+        content = json.dumps(items, indent=2, ensure_ascii=False)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                if f.read() == content:
+                    continue
+        except FileNotFoundError:
+            pass
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    for name in os.listdir(directory):
+        stem, extension = os.path.splitext(name)
+        if extension == ".json" and stem not in shards:
+            os.remove(os.path.join(directory, name))
+    return {category: len(items) for category, items in shards.items()}
+
+
+def main(argv):
+    counts = write_shards(*argv[:2])
+    for category, count in sorted(counts.items()):
+        print(f"{category}: {count} questions")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
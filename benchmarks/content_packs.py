@@ -0,0 +1,85 @@
+"""
+Startup time and memory of a large question bank loaded from JSON versus a
+compiled content pack:
+
+    python -m benchmarks.content_packs [questions]
+
+A synthetic bank is written to a temporary directory and packed. Each load
+then runs in a fresh interpreter so its peak RSS is measured on its own.
+"""
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from Utilities.ContentPack import build, open_pack
+from Utilities.ContentStore import parse_answers
+
+DRAWS = 1000
+
+
+def write_bank(path, count):
+    random.seed(0)
+    words = ["alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel", "india", "juliet"]
+    bank = [
+        {
+            "question": f"Question {i}: " + " ".join(random.choices(words, k=12)) + "?",
+            "answer": " ".join(random.choices(words, k=2)) + f" {i}",
+            "category": random.choice(words),
+            "difficulty": random.choice(("easy", "medium", "hard")),
+        }
+        for i in range(count)
+    ]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(bank, f)
+
+
+def peak_rss_kib():
+    """The process's peak resident set (Linux). ru_maxrss would include the parent's, inherited across exec."""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1])
+    return 0
+
+
+def measure(mode, path):
+    """Runs in the child interpreter: loads the bank, draws DRAWS records and reports."""
+    baseline = peak_rss_kib()
+    started = time.perf_counter()
+    if mode == "json":
+        with open(path, encoding="utf-8") as f:
+            bank = parse_answers(json.load(f))
+    else:
+        bank = open_pack(path)
+    loaded = time.perf_counter() - started
+
+    step = max(1, len(bank) // DRAWS)
+    started = time.perf_counter()
+    for index in range(0, step * DRAWS, step):
+        bank[index % len(bank)]
+    drawn = (time.perf_counter() - started) / DRAWS
+    peak = (peak_rss_kib() - baseline) / 1024
+    print(f"{mode:4}  load {loaded * 1000:9.1f} ms  draw {drawn * 1e6:7.1f} us  peak RSS +{peak:.0f} MiB")
+
+
+def main(argv):
+    if argv and argv[0] == "--measure":
+        return measure(argv[1], argv[2])
+
+    count = int(argv[0]) if argv else 100_000
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bank.json")
+        write_bank(path, count)
+        with open(path, encoding="utf-8") as f:
+            build(parse_answers(json.load(f)), path)
+        print(f"{count} questions", flush=True)
+        for mode in ("json", "pack"):
+            subprocess.run([sys.executable, "-m", "benchmarks.content_packs", "--measure", mode, path], check=True)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
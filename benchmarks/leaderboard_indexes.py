@@ -0,0 +1,109 @@
+"""
+Query plan and latency of the guild leaderboard read before and after the
+migration 2 indexes, on a scratch SQLite database:
+
+    python -m benchmarks.leaderboard_indexes [rows] [guilds]
+
+With DATABASE_URL set, the same comparison also runs on Postgres against a
+temporary copy of global_winners, so the real table is never touched.
+"""
+import datetime
+import os
+import random
+import sqlite3
+import sys
+import time
+
+from database import SQLITE_MIGRATIONS
+
+QUERY = """
+    SELECT user_id, username, game_name, host_id, host_name, timestamp
+    FROM global_winners
+    WHERE guild_id = {0}
+    ORDER BY timestamp DESC LIMIT 10;
+"""
+GAMES = ("Trivia", "Scramble", "Emoji Decode", "Lyrics")
+RUNS = 200
+
+
+def winners(rows, guilds):
+    start = datetime.datetime(2024, 1, 1)
+    for i in range(rows):
+        yield (str(i), f"user{i}", random.choice(GAMES), "1", "host",
+               (start + datetime.timedelta(seconds=i)).isoformat(), str(random.randrange(guilds)))
+
+
+def timed(run):
+    started = time.perf_counter()
+    for _ in range(RUNS):
+        run()
+    return (time.perf_counter() - started) / RUNS * 1000
+
+
+def sqlite_report(rows, guilds):
+    conn = sqlite3.connect(":memory:")
+    for version, _, statements in SQLITE_MIGRATIONS:
+        if version != 2:
+            for statement in statements:
+                conn.execute(statement)
+    conn.executemany(
+        "INSERT INTO global_winners (user_id, username, game_name, host_id, host_name, timestamp, guild_id) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?);", winners(rows, guilds)
+    )
+    query = QUERY.format("?")
+
+    def report(label):
+        plan = " | ".join(row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + query, ("1",)))
+        ms = timed(lambda: conn.execute(query, ("1",)).fetchall())
+        print(f"sqlite {label:6} {ms:8.3f} ms/query  {plan}")
+
+    report("before")
+    for statement in SQLITE_MIGRATIONS[1][2]:
+        conn.execute(statement)
+    conn.execute("ANALYZE;")
+    report("after")
+
+
+def postgres_report(rows, guilds):
+    import psycopg2
+    from psycopg2.extras import execute_values
+
+    conn = psycopg2.connect(os.environ["DATABASE_URL"])
+    try:
+        with conn.cursor() as cursor:
+            # A temporary table shadows global_winners for this session only
+            cursor.execute("CREATE TEMP TABLE global_winners (LIKE public.global_winners INCLUDING DEFAULTS);")
+            execute_values(cursor, "INSERT INTO global_winners "
+                           "(user_id, username, game_name, host_id, host_name, timestamp, guild_id) VALUES %s;",
+                           list(winners(rows, guilds)))
+            cursor.execute("ANALYZE global_winners;")
+            query = QUERY.format("%s")
+
+            def report(label):
+                cursor.execute("EXPLAIN (ANALYZE, BUFFERS) " + query, ("1",))
+                plan = "\n    ".join(row[0] for row in cursor.fetchall())
+                print(f"postgres {label}:\n    {plan}")
+
+            report("before")
+            # Temporary tables cannot be indexed CONCURRENTLY; the index is the same
+            cursor.execute("CREATE INDEX ON global_winners (guild_id, timestamp DESC) "
+                           "INCLUDE (user_id, username, game_name, host_id, host_name);")
+            cursor.execute("ANALYZE global_winners;")
+            report("after")
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+def main(argv):
+    rows = int(argv[0]) if argv else 200_000
+    guilds = int(argv[1]) if len(argv) > 1 else 50
+    random.seed(0)
+    print(f"{rows} winners across {guilds} guilds")
+    sqlite_report(rows, guilds)
+    if os.getenv("DATABASE_URL"):
+        postgres_report(rows, guilds)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
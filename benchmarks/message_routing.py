@@ -0,0 +1,75 @@
+"""
+Cost of dispatching chat messages to pending game rounds, with every round's
+check run against every message (as bot.wait_for does) versus MessageRouter's
+per-channel index:
+
+    python -m benchmarks.message_routing [rounds] [messages]
+
+Each round waits in its own channel for an answer nobody gives, so every
+message is a miss, the common case in busy servers.
+"""
+import asyncio
+import random
+import sys
+import time
+import types
+
+from Utilities.AnswerMatcher import AnswerMatcher, normalize_answer
+from Utilities.MessageRouter import MessageRouter
+from Utilities.Scheduler import Scheduler
+
+GUESSES = ("paris", "the beatles", "mount everest", "lol", "gg", "what is this", "north america")
+
+
+def make_messages(channels, count):
+    author = types.SimpleNamespace(bot=False)
+    return [
+        types.SimpleNamespace(author=author, channel=types.SimpleNamespace(id=random.randrange(channels)),
+                              content=random.choice(GUESSES))
+        for _ in range(count)
+    ]
+
+
+def wait_for_style(matchers, messages):
+    """Every pending check sees every message and normalises it itself."""
+    started = time.perf_counter()
+    for message in messages:
+        for channel_id, matcher in matchers:
+            if message.channel.id == channel_id and matcher.matches(normalize_answer(message.content)):
+                break
+    return time.perf_counter() - started
+
+
+async def routed(matchers, messages):
+    router = MessageRouter(types.SimpleNamespace(scheduler=Scheduler()))
+    waits = [
+        asyncio.ensure_future(router.wait_for_answer(channel_id, lambda m, content, matcher=matcher: matcher.matches(content), 3600))
+        for channel_id, matcher in matchers
+    ]
+    await asyncio.sleep(0)
+    started = time.perf_counter()
+    for message in messages:
+        await router.on_message(message)
+    elapsed = time.perf_counter() - started
+    for wait in waits:
+        wait.cancel()
+    await asyncio.gather(*waits, return_exceptions=True)
+    return elapsed
+
+
+def main(argv):
+    rounds = int(argv[0]) if argv else 1000
+    count = int(argv[1]) if len(argv) > 1 else 5000
+    random.seed(0)
+    matchers = [(channel_id, AnswerMatcher(f"answer number {channel_id}")) for channel_id in range(rounds)]
+    messages = make_messages(rounds, count)
+
+    before = wait_for_style(matchers, messages)
+    after = asyncio.run(routed(matchers, messages))
+    print(f"{rounds} pending rounds, {count} messages")
+    print(f"every check per message  {before / count * 1e6:10.1f} us/message")
+    print(f"MessageRouter            {after / count * 1e6:10.1f} us/message")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,74 @@
+"""
+Cost of arming and cancelling round deadlines with one asyncio.wait_for per
+round versus entries in the shared Scheduler:
+
+    python -m benchmarks.round_timers [rounds]
+
+Every round is answered before its deadline, so each timer is armed once and
+cancelled once, which is what nearly every round timer does.
+"""
+import asyncio
+import sys
+import time
+import tracemalloc
+
+from Utilities.Scheduler import Scheduler
+
+DEADLINE = 30
+
+
+async def with_wait_for(rounds, trace):
+    loop = asyncio.get_running_loop()
+    futures = [loop.create_future() for _ in range(rounds)]
+    if trace:
+        tracemalloc.start()
+    started = time.perf_counter()
+    waits = [asyncio.ensure_future(asyncio.wait_for(future, DEADLINE)) for future in futures]
+    # Let every wait_for arm its timer
+    await asyncio.sleep(0)
+    armed = time.perf_counter() - started
+    memory = tracemalloc.get_traced_memory()[0] if trace else None
+    tracemalloc.stop()
+    loop_timers = len(loop._scheduled)
+
+    started = time.perf_counter()
+    for future in futures:
+        future.set_result(None)
+    await asyncio.gather(*waits)
+    return armed, time.perf_counter() - started, memory, loop_timers
+
+
+async def with_scheduler(rounds, trace):
+    loop = asyncio.get_running_loop()
+    scheduler = Scheduler()
+    futures = [loop.create_future() for _ in range(rounds)]
+    if trace:
+        tracemalloc.start()
+    started = time.perf_counter()
+    handles = [scheduler.call_later(DEADLINE, future.cancel) for future in futures]
+    armed = time.perf_counter() - started
+    memory = tracemalloc.get_traced_memory()[0] if trace else None
+    tracemalloc.stop()
+    loop_timers = len(loop._scheduled)
+
+    started = time.perf_counter()
+    for handle in handles:
+        handle.cancel()
+    cancelled = time.perf_counter() - started
+    scheduler.close()
+    return armed, cancelled, memory, loop_timers
+
+
+def main(argv):
+    rounds = int(argv[0]) if argv else 10_000
+    print(f"{rounds} pending rounds")
+    for label, run in (("asyncio.wait_for", with_wait_for), ("Scheduler", with_scheduler)):
+        armed, cancelled, _, loop_timers = asyncio.run(run(rounds, trace=False))
+        # Memory is measured in a separate run: tracing slows allocation down
+        memory = asyncio.run(run(rounds, trace=True))[2]
+        print(f"{label:17} arm {armed * 1000:7.2f} ms  cancel {cancelled * 1000:7.2f} ms  "
+              f"traced {memory / 1024:8.0f} KiB  loop timers {loop_timers}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
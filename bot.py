@@ -1,10 +1,21 @@
 import os
+import sys
+import time
+import signal
+import subprocess
 import asyncio
 import discord
 import random
 import json
 from discord.ext import commands
 from dotenv import load_dotenv
+from database import AsyncDatabaseManager, create_database_manager
+from Utilities.GameSession import SessionRegistry
+from Utilities.Scheduler import Scheduler
+from Utilities.ContentStore import ContentStore
+from Utilities.Outbox import Outbox
+from Utilities.Permissions import PermissionResolver
+from Utilities.GameStateStore import create_game_state_store
 
 
 # --- NEW: tiny web server for Render ---
@@ -27,29 +38,93 @@ load_dotenv()
 TOKEN = os.getenv('DISCORD_TOKEN')
 GUILD = os.getenv('DISCORD_GUILD')
 
-intents = discord.Intents.default()
-intents.message_content = True
-intents.members = True
-intents.dm_messages = True
-intents.presences = True
-intents.guilds = True
-intents.message_content = True
-intents.guild_messages = True
+# Sharding. Unset SHARD_COUNT runs one plain gateway connection; "auto" uses
+# the shard count Discord recommends; a number fixes it. With CLUSTER_COUNT > 1
+# this file becomes a supervisor that starts CLUSTER_COUNT bot processes, each
+# owning a contiguous range of the SHARD_COUNT shards, and restarts any that
+# exit. Games only ever touch their own guild, and leaderboards and settings
+# live in the database, so the processes share nothing else.
+SHARD_COUNT = os.getenv('SHARD_COUNT', '').strip().lower()
+CLUSTER_COUNT = int(os.getenv('CLUSTER_COUNT', 1))
+# Set by the supervisor for each bot process it starts
+CLUSTER_ID = os.getenv('CLUSTER_ID')
+# Seconds between the supervisor's checks on its bot processes
+CLUSTER_POLL_INTERVAL = float(os.getenv('CLUSTER_POLL_INTERVAL', 5))
+# A cluster that exits is restarted after CLUSTER_RESTART_DELAY seconds,
+# doubling with each consecutive failure up to CLUSTER_RESTART_MAX_DELAY. One
+# that ran for CLUSTER_STABLE_AFTER seconds starts again from the first delay.
+# A cluster that still fails after CLUSTER_MAX_RESTARTS restarts in a row
+# stops the supervisor, so the platform's own restart policy and alerts apply.
+CLUSTER_RESTART_DELAY = float(os.getenv('CLUSTER_RESTART_DELAY', 5))
+CLUSTER_RESTART_MAX_DELAY = float(os.getenv('CLUSTER_RESTART_MAX_DELAY', 300))
+CLUSTER_STABLE_AFTER = float(os.getenv('CLUSTER_STABLE_AFTER', 600))
+CLUSTER_MAX_RESTARTS = int(os.getenv('CLUSTER_MAX_RESTARTS', 10))
+
+
+def cluster_shard_ids(cluster_id, shard_count, cluster_count):
+    """The contiguous range of shards owned by one cluster."""
+    return list(range(cluster_id * shard_count // cluster_count, (cluster_id + 1) * shard_count // cluster_count))
+
+
+def create_bot(**options):
+    if not SHARD_COUNT:
+        return commands.Bot(**options)
+    if SHARD_COUNT == "auto":
+        return commands.AutoShardedBot(**options)
+
+    shard_count = int(SHARD_COUNT)
+    if CLUSTER_ID is None:
+        return commands.AutoShardedBot(shard_count=shard_count, **options)
+    shard_ids = cluster_shard_ids(int(CLUSTER_ID), shard_count, CLUSTER_COUNT)
+    print(f"Cluster {CLUSTER_ID} runs shards {shard_ids[0]}-{shard_ids[-1]} of {shard_count}.")
+    return commands.AutoShardedBot(shard_count=shard_count, shard_ids=shard_ids, **options)
+
+def build_bot():
+    """The bot and its shared services. Only processes that connect to Discord build one."""
+    intents = discord.Intents.default()
+    intents.message_content = True
+    intents.members = True
+    intents.dm_messages = True
+    intents.presences = True
+    intents.guilds = True
+    intents.message_content = True
+    intents.guild_messages = True
+
+    bot = create_bot(command_prefix="!", intents=intents, case_insensitive=True)
+    # One database service for the whole bot; cogs use bot.db instead of their own
+    bot.db = AsyncDatabaseManager()
+    # Checkpoints of running games, so they resume after a restart
+    bot.game_state = create_game_state_store(bot.db)
+    # Every running game, across all game cogs
+    bot.sessions = SessionRegistry(bot.game_state)
+    # Round timeouts, hints and game deadlines for every game
+    bot.scheduler = Scheduler()
+    # Question banks, loaded once and shared by every game
+    bot.content = ContentStore()
+    # Merges each channel's game announcements into as few messages as possible
+    bot.outbox = Outbox()
+    # Who may host games, resolved to role IDs once per guild
+    bot.permissions = PermissionResolver(bot.db)
+
+    @bot.event
+    async def on_ready():
+        guild = discord.utils.get(bot.guilds, name=GUILD)
+        # Slash commands are global; one cluster registering them is enough
+        if CLUSTER_ID in (None, "0"):
+            await bot.tree.sync()
+        if guild:
+            print(
+                f'{bot.user} is connected to the following guild:\n'
+                f'{guild.name}(id: {guild.id})')
+        print(f"Bot is Working as {bot.user}")
+
+    return bot
+
+
+async def load_cogs(bot):
+    # The router must be loaded before the games that wait on it
+    await bot.load_extension("Utilities.MessageRouter")
 
-bot = commands.Bot(command_prefix="!", intents=intents, case_insensitive=True)
-
-
-@bot.event
-async def on_ready():
-    guild = discord.utils.get(bot.guilds, name=GUILD)
-    await bot.tree.sync()
-    print(
-        f'{bot.user} is connected to the following guild:\n'
-        f'{guild.name}(id: {guild.id})')
-    print(f"Bot is Working as {bot.user}")
-
-
-async def load_cogs():
     await bot.load_extension("cogs.games.GUESS_THE_NUMBER")
     await bot.load_extension("cogs.games.TRIVIA")
     await bot.load_extension("cogs.games.R-P-S")
@@ -62,11 +137,105 @@ async def load_cogs():
 
 
 async def main():
-    await load_cogs()
-    await bot.start(TOKEN)
+    bot = build_bot()
+    # Clusters skip migrations: the supervisor ran them before starting any.
+    # Concurrent migrators would deadlock on CREATE INDEX CONCURRENTLY, which
+    # waits out the snapshots of sessions queued for the migration lock.
+    if CLUSTER_ID is None:
+        # A no-op when the schema is already current
+        await bot.db.migrate()
+    await bot.content.preload()
+    bot.content.start_watching()
+    try:
+        async with bot:
+            await load_cogs(bot)
+            await bot.start(TOKEN)
+    finally:
+        bot.scheduler.close()
+        bot.content.close()
+        bot.outbox.close()
+        await bot.game_state.close()
+        # Flush buffered stat writes and close the connection pool
+        await bot.db.close()
+
+
+def restart_delay(failures):
+    """Seconds to wait before restarting a cluster that has failed `failures` times in a row."""
+    return min(CLUSTER_RESTART_DELAY * 2 ** (failures - 1), CLUSTER_RESTART_MAX_DELAY)
+
+
+def migrate():
+    """Applies pending schema migrations from the supervisor, before any cluster starts."""
+    manager = create_database_manager()
+    try:
+        manager.migrate()
+    finally:
+        manager.close()
+
+
+def supervise():
+    """
+    Runs CLUSTER_COUNT bot processes and restarts any that exit, backing off
+    while a cluster keeps failing. Exits if one still fails after
+    CLUSTER_MAX_RESTARTS restarts in a row.
+    """
+    def spawn(cluster_id):
+        started[cluster_id] = time.monotonic()
+        return subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__)],
+            env={**os.environ, "CLUSTER_ID": str(cluster_id)}
+        )
+
+    # Render and most process managers stop us with SIGTERM
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    started = {}
+    # cluster_id -> consecutive failures, and when an exited cluster may start again
+    failures = {cluster_id: 0 for cluster_id in range(CLUSTER_COUNT)}
+    restart_at = {}
+    clusters = {cluster_id: spawn(cluster_id) for cluster_id in range(CLUSTER_COUNT)}
+    print(f"Started {CLUSTER_COUNT} clusters for {SHARD_COUNT} shards.")
+    try:
+        while True:
+            time.sleep(CLUSTER_POLL_INTERVAL)
+            now = time.monotonic()
+            for cluster_id, process in clusters.items():
+                if cluster_id in restart_at:
+                    if now >= restart_at[cluster_id]:
+                        del restart_at[cluster_id]
+                        clusters[cluster_id] = spawn(cluster_id)
+                    continue
+                if process.poll() is None:
+                    continue
+
+                if now - started[cluster_id] >= CLUSTER_STABLE_AFTER:
+                    failures[cluster_id] = 0
+                failures[cluster_id] += 1
+                if failures[cluster_id] > CLUSTER_MAX_RESTARTS:
+                    sys.exit(f"Cluster {cluster_id} still failing after {CLUSTER_MAX_RESTARTS} restarts; stopping.")
+                delay = restart_delay(failures[cluster_id])
+                print(f"Cluster {cluster_id} exited with code {process.returncode}; restarting it in {delay:g}s.")
+                restart_at[cluster_id] = now + delay
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in clusters.values():
+            if process.poll() is None:
+                process.terminate()
+        for process in clusters.values():
+            process.wait()
 
 
 if __name__ == "__main__":
-    # Start the Flask server in a background thread
-    threading.Thread(target=run_flask).start()
-    asyncio.run(main())
+    if CLUSTER_ID is not None:
+        # A cluster started by the supervisor, which serves the web endpoint
+        asyncio.run(main())
+    else:
+        # Start the Flask server in a background thread
+        threading.Thread(target=run_flask, daemon=CLUSTER_COUNT > 1).start()
+        if CLUSTER_COUNT > 1:
+            if not SHARD_COUNT.isdigit() or int(SHARD_COUNT) < CLUSTER_COUNT:
+                sys.exit("CLUSTER_COUNT > 1 needs SHARD_COUNT set to a number of shards at least as large.")
+            migrate()
+            supervise()
+        else:
+            asyncio.run(main())
@@ -1,44 +1,53 @@
 import discord
 import asyncio
-import json
-import random
 import os
 from discord.ext import commands
 from discord import app_commands
 
 
 from dotenv import load_dotenv
+from Utilities.Deck import Deck
+from Utilities.GameStateStore import resumable
 load_dotenv()
 LEADERBOARD_CHANNEL_ID = int(os.getenv('LEADERBOARD_CHANNEL_ID'))
 PRIVATE_CHANNEL_ID = int(os.getenv('PRIVATE_CHANNEL_ID'))
 
-ALLOWED_ROLES = ["Game Master", "Moderator"]
-CATEGORY_FILES = {
-    "india": "Data/lyrics_India.json",
-    "pakistan": "Data/lyrics_Pakistan.json",
-    "nigeria": "Data/lyrics_Nigeria.json",
-    "global": "Data/lyrics_global.json"
+# Category -> ContentStore dataset
+CATEGORY_DATASETS = {
+    "india": "lyrics_india",
+    "pakistan": "lyrics_pakistan",
+    "nigeria": "lyrics_nigeria",
+    "global": "lyrics_global"
 }
 
-def normalize(text):
-    return ''.join(filter(str.isalnum, text.lower()))
-
 class Lyrics(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.active_lyrics = {}
+        self.sessions = bot.sessions
+        self.permissions = bot.permissions
+        self.content = bot.content
+        self.outbox = bot.outbox
         self.leaderboard_cog = None
+        self.router = None
 
     @commands.Cog.listener()
     async def on_ready(self):
         print("Lyrics cog is ready.")
         await self.bot.wait_until_ready()
+        self.router = self.bot.get_cog('MessageRouter')
         self.leaderboard_cog = self.bot.get_cog('Leaderboard')
         if self.leaderboard_cog:
             print("Leaderboard cog found and linked to Lyrics cog.")
         else:
             print("WARNING: Leaderboard cog not found. Leaderboard functions will not work for Lyrics.")
 
+        # Games that were running when the bot last stopped; their winners are already in the leaderboard
+        async for state, channel, host in resumable(self.bot, "lyrics"):
+            session = self.sessions.restore(state, host)
+            if session is not None:
+                await self.outbox.send(channel, content="♻️ The bot restarted, so the lyrics game picks up where it left off.")
+                session.task = self.bot.loop.create_task(self.run_lyrics_game(session, channel, session.options["dataset"]))
+
     @app_commands.command(name="lyrics", description="Start a looping lyrics game (guess the song from lyric)")
     @app_commands.describe(category="Pick a lyric category")
     @app_commands.choices(category=[
@@ -48,55 +57,52 @@ class Lyrics(commands.Cog):
         app_commands.Choice(name="Global", value="global")
     ])
     async def lyrics(self, interaction: discord.Interaction, category: app_commands.Choice[str]):
-        if not any(role.name in ALLOWED_ROLES for role in interaction.user.roles):
+        if not await self.permissions.can_host(interaction.user):
             return await interaction.response.send_message("❌ You don't have permission.", ephemeral=True)
 
-        if interaction.channel.id in self.active_lyrics:
+        if self.sessions.get("lyrics", interaction.channel.id):
             return await interaction.response.send_message("❗ Lyrics game is already running in this channel.", ephemeral=True)
 
-        self.active_lyrics[interaction.channel.id] = {"running": True, "stop_event": asyncio.Event()}
+        session = self.sessions.create(
+            "lyrics", interaction.channel.id,
+            guild_id=interaction.guild.id, channel_id=interaction.channel.id, host=interaction.user,
+            options={"dataset": CATEGORY_DATASETS[category.value]}
+        )
+        self.sessions.checkpoint(session)
 
         await interaction.response.send_message(f"🎵 Starting Lyrics game in category: **{category.name}**")
-        self.bot.loop.create_task(self.run_lyrics_game(interaction.channel, interaction.user, CATEGORY_FILES[category.value]))
-
-    async def run_lyrics_game(self, channel, host, file_path):
-        lyrics_data = []
-        try:
-            with open(file_path, "r") as f:
-                lyrics_data = json.load(f)
-        except FileNotFoundError:
-            await channel.send(f"⚠️ Error: Lyrics file not found at `{file_path}`. Please ensure it exists.")
-            self.active_lyrics.pop(channel.id, None)
-            return
-        except json.JSONDecodeError:
-            await channel.send(f"⚠️ Error: Lyrics file at `{file_path}` is corrupted or empty. Please check its format.")
-            self.active_lyrics.pop(channel.id, None)
-            return
-        except Exception as e:
-            await channel.send(f"⚠️ Failed to load lyrics due to an unexpected error: `{e}`. Please try again later.")
-            self.active_lyrics.pop(channel.id, None)
-            return
-        
-        if not lyrics_data:
-            await channel.send("❌ No lyrics found in the selected category file. Please add some lyrics to play.")
-            self.active_lyrics.pop(channel.id, None)
+        session.task = self.bot.loop.create_task(self.run_lyrics_game(session, interaction.channel, session.options["dataset"]))
+
+    async def run_lyrics_game(self, session, channel, dataset):
+        host = session.host
+
+        # Loaded once and shared; a missing or corrupted file loads as an empty bank
+        if not await self.content.load(dataset):
+            await channel.send(
+                f"❌ No lyrics could be loaded from `{self.content.path(dataset)}`. "
+                "Please make sure the file exists and has some lyrics to play."
+            )
+            self.sessions.end(session)
             return
 
-        used_lines = set()
-        game_state = self.active_lyrics.get(channel.id)
+        if self.leaderboard_cog:
+            # Warm the guild's board so the per-answer checks never wait on the database
+            await self.leaderboard_cog.get_guild_winners(channel.guild.id)
+
+        session.deck = Deck(self.content.source(dataset))
 
-        while game_state and game_state["running"] and not game_state["stop_event"].is_set():
-            if self.leaderboard_cog and self.leaderboard_cog.is_leaderboard_full():
+        while session.running:
+            if self.leaderboard_cog and self.leaderboard_cog.is_leaderboard_full(channel.guild.id):
                 break
 
-            if len(used_lines) >= len(lyrics_data):
-                await channel.send("🎉 All lyric lines in this category have been used! Resetting for new rounds.")
-                used_lines.clear()
+            if session.deck.exhausted:
+                self.outbox.queue(channel, content="🎉 All lyric lines in this category have been used! Resetting for new rounds.")
 
-            line_obj = random.choice(lyrics_data)
-            while line_obj["line"] in used_lines and len(used_lines) < len(lyrics_data):
-                line_obj = random.choice(lyrics_data)
-            used_lines.add(line_obj["line"])
+            line_obj = session.deck.draw()
+            if line_obj is None:
+                await self.outbox.send(channel, content="❌ No lyric lines available in this category!")
+                self.sessions.end(session)
+                return
 
             answer = line_obj["answer"].lower()
             lyric_line = line_obj["line"]
@@ -106,24 +112,23 @@ class Lyrics(commands.Cog):
                 description=f"*{lyric_line}*\n\n⏱️ You have 30 seconds to answer!",
                 color=discord.Color.purple()
             )
-            await channel.send(embed=embed)
+            await self.outbox.send(channel, embed=embed)
 
-            def check(m):
-                return m.channel == channel and not m.author.bot and normalize(m.content) == normalize(answer)
+            matcher = line_obj["matcher"]
 
             try:
-                msg = await self.bot.wait_for("message", timeout=30.0, check=check)
+                msg = await self.router.wait_for_answer(channel.id, lambda m, content: matcher.matches(content), timeout=30.0)
 
                 user_id = str(msg.author.id)
 
-                if self.leaderboard_cog and user_id in [entry["user_id"] for entry in self.leaderboard_cog.get_recent_winners()]:
+                if self.leaderboard_cog and self.leaderboard_cog.is_recent_winner(channel.guild.id, user_id):
                     await msg.add_reaction("✋")
-                    await channel.send(f"{msg.author.mention}, you're already on the leaderboard! Let others have a chance.")
+                    self.outbox.queue(channel, content=f"{msg.author.mention}, you're already on the leaderboard! Let others have a chance.")
                     await asyncio.sleep(1)
                     continue
 
                 await msg.add_reaction("🎉")
-                await channel.send(embed=discord.Embed(
+                self.outbox.queue(channel, embed=discord.Embed(
                     title="✅ Correct!",
                     description=(
                         f"{msg.author.mention} guessed it! The song was **{answer.title()}**."
@@ -133,49 +138,48 @@ class Lyrics(commands.Cog):
 
                 if self.leaderboard_cog:
                     added = self.leaderboard_cog.add_recent_winner(
-                        user_id=user_id, username=msg.author.name,
+                        guild_id=channel.guild.id, user_id=user_id, username=msg.author.name,
                         game_name="Lyrics", host_id=host.id, host_name=host.name
                     )
                     if added:
+                        await self.outbox.flush(channel)
                         await self.leaderboard_cog.update_leaderboard_display(channel) 
 
                         lb_channel = self.bot.get_channel(LEADERBOARD_CHANNEL_ID)
                         if lb_channel:
                             await self.leaderboard_cog.update_leaderboard_display(lb_channel)
                         else:
-                            await channel.send(f"⚠️ Leaderboard channel (ID: {LEADERBOARD_CHANNEL_ID}) not found for automatic update.")
+                            self.outbox.queue(channel, content=f"⚠️ Leaderboard channel (ID: {LEADERBOARD_CHANNEL_ID}) not found for automatic update.")
 
-                        if self.leaderboard_cog.is_leaderboard_full():
-                            await self.end_game(channel, host)
-                            return 
+                        if self.leaderboard_cog.is_leaderboard_full(channel.guild.id):
+                            await self.end_game(session, channel)
+                            return
                     else:
-                        await channel.send(f"ℹ️ {msg.author.mention} is already on the leaderboard!")
+                        self.outbox.queue(channel, content=f"ℹ️ {msg.author.mention} is already on the leaderboard!")
                 else:
-                    await channel.send("⚠️ Leaderboard system is not available.")
+                    self.outbox.queue(channel, content="⚠️ Leaderboard system is not available.")
                 
                 await asyncio.sleep(2)
 
             except asyncio.TimeoutError:
-                if game_state and game_state["running"] and not game_state["stop_event"].is_set():
-                    await channel.send(embed=discord.Embed(
+                if session.running:
+                    self.outbox.queue(channel, embed=discord.Embed(
                         title="⌛ Time's Up!",
                         description=f"Nobody guessed it. The answer was **{answer.title()}**.",
                         color=discord.Color.red()
                     ))
                 await asyncio.sleep(1)
 
-            game_state = self.active_lyrics.get(channel.id)
-
-        if game_state and game_state["running"] and self.leaderboard_cog and self.leaderboard_cog.is_leaderboard_full():
-            await self.end_game(channel, host)
-        elif game_state and game_state["stop_event"].is_set():
-            await channel.send("ℹ️ Lyrics game session ended.")
+        if session.running and self.leaderboard_cog and self.leaderboard_cog.is_leaderboard_full(channel.guild.id):
+            await self.end_game(session, channel)
         
-        self.active_lyrics.pop(channel.id, None)
+        self.sessions.end(session)
 
-    async def end_game(self, channel, host):
+    async def end_game(self, session, channel):
+        host = session.host
         if not self.leaderboard_cog:
             await channel.send("⚠️ Leaderboard system is not available, cannot finalize game.")
+            self.sessions.end(session)
             return
 
         await channel.send(embed=discord.Embed(
@@ -184,11 +188,11 @@ class Lyrics(commands.Cog):
             color=discord.Color.gold()
         ))
         
-        await self.leaderboard_cog.display_leaderboard_command(channel)
+        await self.leaderboard_cog.send_leaderboard(channel)
         
         lb_channel = self.bot.get_channel(LEADERBOARD_CHANNEL_ID)
         if lb_channel:
-            await self.leaderboard_cog.update_leaderboard_display(lb_channel)
+            await self.leaderboard_cog.flush_leaderboard_display(lb_channel)
         else:
             await channel.send(f"⚠️ Dedicated leaderboard channel (ID: {LEADERBOARD_CHANNEL_ID}) not found for final display.")
 
@@ -200,24 +204,26 @@ class Lyrics(commands.Cog):
                 private_channel, self.bot, lambda m: m.author == host and m.channel == private_channel
             )
             if role_name:
-                await self.leaderboard_cog._giverole_logic(private_channel, role_name)
+                await self.leaderboard_cog._giverole_logic(private_channel, role_name, guild_id=channel.guild.id)
             else:
                 await private_channel.send("❌ Role assignment process cancelled or failed for winners.")
 
-        self.leaderboard_cog.reset_leaderboard()
-        self.active_lyrics.pop(channel.id, None)
+        self.leaderboard_cog.reset_leaderboard(channel.guild.id)
+        self.sessions.end(session)
 
     @app_commands.command(name="stoplyrics", description="Stop the ongoing lyrics game")
     async def stoplyrics(self, interaction: discord.Interaction):
-        if not any(role.name in ALLOWED_ROLES for role in interaction.user.roles):
+        if not await self.permissions.can_host(interaction.user):
             return await interaction.response.send_message("❌ You don’t have permission.", ephemeral=True)
 
-        if interaction.channel.id in self.active_lyrics:
-            self.active_lyrics[interaction.channel.id]["stop_event"].set()
-            self.active_lyrics.pop(interaction.channel.id, None)
+        session = self.sessions.get("lyrics", interaction.channel.id)
+        if session:
+            self.sessions.end(session)
             
             await interaction.response.send_message("🛑 Lyrics game stopped.")
             await interaction.channel.send("⚠️ Lyrics game forcefully stopped.")
+            # Ending the session cancels the game task, so the end-of-game notice is sent from here
+            await interaction.channel.send("ℹ️ Lyrics game session ended.")
         else:
             await interaction.response.send_message("❗ No lyrics game running in this channel.", ephemeral=True)
 
@@ -4,17 +4,18 @@ import os
 from discord.ext import commands
 from discord import app_commands
 from dotenv import load_dotenv
+from Utilities.AnswerMatcher import normalize_answer
 
 load_dotenv()
 
-ALLOWED_ROLES = ["Game Master", "Moderator"]
-
 CHOICES = [
     app_commands.Choice(name="🪨 Rock", value="rock"),
     app_commands.Choice(name="📄 Paper", value="paper"),
     app_commands.Choice(name="✂️ Scissors", value="scissors")
 ]
 
+VALID_GUESSES = frozenset({"rock", "paper", "scissors", "scissor"})
+
 BEATS = {
     "rock": "paper",
     "paper": "scissors",
@@ -24,11 +25,14 @@ BEATS = {
 class RPS(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.active_rps = {}
+        self.sessions = bot.sessions
+        self.permissions = bot.permissions
+        self.router = None
 
     @commands.Cog.listener()
     async def on_ready(self):
         print("RPS cog is ready.")
+        self.router = self.bot.get_cog('MessageRouter')
 
     @app_commands.command(name="startrps", description="Start Rock Paper Scissors with a chosen answer")
     @app_commands.describe(correct_choice="Pick your secret choice (players will try to guess the counter)")
@@ -40,10 +44,10 @@ class RPS(commands.Cog):
     ):
         guild_id = interaction.guild.id
         
-        if not any(role.name in ALLOWED_ROLES for role in interaction.user.roles):
+        if not await self.permissions.can_host(interaction.user):
             return await interaction.response.send_message("❌ You don't have permission to start RPS.", ephemeral=True)
 
-        if guild_id in self.active_rps:
+        if self.sessions.get("rps", guild_id):
             return await interaction.response.send_message("❗ RPS is already running in this server.", ephemeral=True)
 
         host_choice = correct_choice.value.lower()
@@ -51,13 +55,12 @@ class RPS(commands.Cog):
             host_choice = "scissors"
 
         correct_answer_for_players = BEATS[host_choice] 
-        self.active_rps[guild_id] = {
-            "running": True,
-            "stop_event": asyncio.Event(),
-            "answer": correct_answer_for_players,
-            "host": interaction.user,
-            "channel_id": interaction.channel.id
-        }
+        session = self.sessions.create(
+            "rps", guild_id, guild_id=guild_id, channel_id=interaction.channel.id,
+            host=interaction.user, answer=correct_answer_for_players
+        )
+        if session is None:
+            return await interaction.response.send_message("❗ RPS is already running in this server.", ephemeral=True)
 
         await interaction.response.send_message(embed=discord.Embed(
             title="🎮 Rock Paper Scissors Started!",
@@ -66,37 +69,30 @@ class RPS(commands.Cog):
             color=discord.Color.blurple()
         ))
 
-        self.bot.loop.create_task(self.wait_for_guess(interaction.channel))
-
-    async def wait_for_guess(self, channel):
-        guild_id = channel.guild.id
-        data = self.active_rps.get(guild_id)
-        if not data or not data["running"]:
-            return
+        session.task = self.bot.loop.create_task(self.wait_for_guess(session, interaction.channel))
 
-        correct_guess = data["answer"]
-        stop_event = data["stop_event"]
-        host = data["host"]
+    async def wait_for_guess(self, session, channel):
+        correct_guess = session.answer
 
         timeout_seconds = 60
 
         winner_found = False
 
-        while not stop_event.is_set():
+        while session.running:
             try:
-                msg = await self.bot.wait_for(
-                    "message",
-                    timeout=timeout_seconds,
-                    check=lambda m: m.channel.id == data["channel_id"] and not m.author.bot and m.content.lower().strip() in ["rock", "paper", "scissors", "scissor"]
+                msg = await self.router.wait_for_answer(
+                    session.channel_id,
+                    lambda m, content: content in VALID_GUESSES,
+                    timeout=timeout_seconds
                 )
                 
-                guess = msg.content.lower().strip()
+                guess = normalize_answer(msg.content)
                 if guess == "scissor":
                     guess = "scissors"
 
                 if guess == correct_guess:
                     winner_found = True
-                    user_id = str(msg.author.id)
+                    session.winner_id = str(msg.author.id)
 
                     await msg.add_reaction("🎉")
                     await channel.send(embed=discord.Embed(
@@ -111,25 +107,25 @@ class RPS(commands.Cog):
             except asyncio.TimeoutError:
                 break
 
-        if not winner_found and self.active_rps.get(guild_id, {}).get("running", False):
+        if not winner_found and session.running:
             await channel.send(embed=discord.Embed(
                 title="⌛ Game Timed Out",
                 description=f"No one guessed correctly. The correct answer was **{correct_guess.capitalize()}**.",
                 color=discord.Color.red()
             ))
         
-        self.active_rps.pop(guild_id, None)
+        self.sessions.end(session)
 
     @app_commands.command(name="stoprps", description="Force stop the Rock Paper Scissors game")
     async def stoprps(self, interaction: discord.Interaction):
         guild_id = interaction.guild.id
         
-        if not any(role.name in ALLOWED_ROLES for role in interaction.user.roles):
+        if not await self.permissions.can_host(interaction.user):
             return await interaction.response.send_message("❌ You don't have permission to stop RPS.", ephemeral=True)
 
-        if guild_id in self.active_rps:
-            self.active_rps[guild_id]["stop_event"].set()
-            self.active_rps.pop(guild_id, None)
+        session = self.sessions.get("rps", guild_id)
+        if session:
+            self.sessions.end(session)
 
             await interaction.response.send_message("🛑 RPS game stopped.")
             await interaction.channel.send("⚠️ RPS game forcefully stopped in this channel.")
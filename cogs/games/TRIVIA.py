@@ -1,238 +1,253 @@
 import discord
-import random
-import json
-import asyncio
-import os
 from discord.ext import commands
 from discord import app_commands
 from dotenv import load_dotenv
-from database import DatabaseManager
+from Utilities.Deck import Deck
+from Utilities.RoundEngine import RoundEngine
+from Utilities.GameStateStore import resumable
 
 load_dotenv()
 
+DIFFICULTIES = [
+    app_commands.Choice(name="Easy", value="easy"),
+    app_commands.Choice(name="Medium", value="medium"),
+    app_commands.Choice(name="Hard", value="hard")
+]
+
 class Trivia(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.active_trivia = {}
-        self.trivia_questions = self.load_questions()
-        self.user_wins = {}
-        self.used_questions = {}
+        self.sessions = bot.sessions
+        self.content = bot.content
+        self.outbox = bot.outbox
         self.leaderboard_cog = None
-        self.db = DatabaseManager()
-        self.unanswered_count = {}
+        self.router = None
+        self.db = bot.db
+        self.permissions = bot.permissions
 
     @commands.Cog.listener()
     async def on_ready(self):
         print("Trivia cog is ready.")
         await self.bot.wait_until_ready()
+        self.router = self.bot.get_cog('MessageRouter')
         self.leaderboard_cog = self.bot.get_cog('Leaderboard')
         if self.leaderboard_cog:
             print("Leaderboard cog found and linked to Trivia cog.")
         else:
             print("WARNING: Leaderboard cog not found. Leaderboard functions will not work.")
 
-    def load_questions(self):
-        try:
-            with open("Data/trivia_questions.json", "r") as f:
-                return json.load(f)
-        except FileNotFoundError:
-            print("Error: Data/trivia_questions.json not found!")
-            return []
-        except json.JSONDecodeError:
-            print("Error: Data/trivia_questions.json is corrupted or empty.")
-            return []
-
-    def get_random_question(self, guild_id):
-        if guild_id not in self.used_questions:
-            self.used_questions[guild_id] = set()
-            
-        used_questions_set = self.used_questions[guild_id]
-
-        if len(used_questions_set) >= len(self.trivia_questions) or not self.trivia_questions:
-            used_questions_set.clear()
-            if not self.trivia_questions:
-                return None
+        # Games that were running when the bot last stopped
+        async for state, channel, host in resumable(self.bot, "trivia"):
+            await self.resume_trivia(state, channel, host)
 
-        available = [q for q in self.trivia_questions if q["question"] not in used_questions_set]
-        if not available:
-            used_questions_set.clear()
-            available = self.trivia_questions[:]
-        
-        question = random.choice(available)
-        used_questions_set.add(question["question"])
-        return question
+    def get_random_question(self, session):
+        # Each question comes up once per pass; the deck reshuffles when it runs out
+        return session.deck.draw()
 
     @app_commands.command(name="starttrivia", description="Start a trivia game")
-    async def trivia(self, interaction: discord.Interaction):
+    @app_commands.describe(
+        category="Play a single category (default: all questions)",
+        difficulty="Only ask questions of this difficulty"
+    )
+    @app_commands.choices(difficulty=DIFFICULTIES)
+    async def trivia(
+        self,
+        interaction: discord.Interaction,
+        category: str = None,
+        difficulty: app_commands.Choice[str] = None
+    ):
         guild_id = interaction.guild.id
         
-        settings = self.db.get_server_settings(guild_id)
-        if not settings:
+        if not await self.permissions.is_configured(interaction.guild):
             return await interaction.response.send_message("❌ This server is not set up. Please run `/setup` first!", ephemeral=True)
-            
-        allowed_roles = settings.get('allowed_roles', [])
-        
-        user_roles = [role.name for role in interaction.user.roles]
-        if not any(role in user_roles for role in allowed_roles):
+        if not await self.permissions.can_host(interaction.user):
             return await interaction.response.send_message("❌ You don't have permission to start trivia.", ephemeral=True)
 
-        if guild_id in self.active_trivia:
+        if self.sessions.get("trivia", guild_id):
             return await interaction.response.send_message("❗ Trivia is already running in this server. Use `/stoptrivia` to end the current game.", ephemeral=True)
         
-        if not self.trivia_questions:
-            return await interaction.response.send_message("❌ No trivia questions loaded. Please check `Data/trivia_questions.json`.", ephemeral=True)
+        # The whole bank by default, or one category shard loaded on first use
+        dataset = f"trivia:{category.lower()}" if category else "trivia"
+        if dataset not in self.content:
+            return await interaction.response.send_message(f"❌ Unknown trivia category `{category}`.", ephemeral=True)
+
+        # Held until the game ends so an unused category can be unloaded
+        if not await self.content.acquire(dataset):
+            self.content.release(dataset)
+            return await interaction.response.send_message(f"❌ No trivia questions loaded. Please check `{self.content.path(dataset)}`.", ephemeral=True)
+
+        if difficulty and not self.content.select(dataset, "difficulty", difficulty.value):
+            self.content.release(dataset)
+            return await interaction.response.send_message(f"❌ There are no **{difficulty.name}** questions in this category.", ephemeral=True)
+
+        session = self.sessions.create(
+            "trivia", guild_id, guild_id=guild_id, channel_id=interaction.channel.id, host=interaction.user,
+            options={"dataset": dataset, "difficulty": difficulty.value if difficulty else None}
+        )
+        if session is None:
+            self.content.release(dataset)
+            return await interaction.response.send_message("❗ Trivia is already running in this server. Use `/stoptrivia` to end the current game.", ephemeral=True)
 
-        self.active_trivia[guild_id] = {"running": True, "stop_event": asyncio.Event(), "channel_id": interaction.channel.id}
-        self.user_wins[guild_id] = {}
-        self.unanswered_count[guild_id] = 0
-        await interaction.response.send_message("🧠 Starting Trivia...")
-        
-        self.bot.loop.create_task(self.ask_question(interaction.channel, interaction.user))
+        details = " · ".join(part for part in (category and category.title(), difficulty and difficulty.name) if part)
+        await interaction.response.send_message(f"🧠 Starting Trivia{f' ({details})' if details else ''}...")
+        self.start_game(session, interaction.channel)
 
-    async def ask_question(self, channel, host):
-        guild_id = channel.guild.id
+    def start_game(self, session, channel):
+        """Builds the session's deck and starts its game loop. The dataset must be acquired."""
+        dataset, difficulty = session.options["dataset"], session.options["difficulty"]
+        if difficulty:
+            session.deck = Deck(self.content.source(dataset, "difficulty", difficulty))
+        else:
+            session.deck = Deck(self.content.source(dataset))
 
-        if not self.active_trivia.get(guild_id, {}).get("running", False):
-            return
+        self.sessions.checkpoint(session)
+        session.task = self.bot.loop.create_task(self.run_trivia(session, channel))
+        # However the game ends, its category is released
+        session.task.add_done_callback(lambda _: self.content.release(dataset))
 
-        question_data = self.get_random_question(guild_id)
-        if not question_data:
-            await channel.send("❌ No more unique trivia questions available!")
-            del self.active_trivia[guild_id]
-            self.user_wins.pop(guild_id, None)
+    async def resume_trivia(self, state, channel, host):
+        """Restarts a game checkpointed by an earlier process, keeping its win counts."""
+        dataset = state["options"]["dataset"]
+        available = dataset in self.content and await self.content.acquire(dataset)
+        if not available:
+            if dataset in self.content:
+                self.content.release(dataset)
+            print(f"Not resuming trivia in guild {state['guild_id']}: '{dataset}' is not available.")
+            self.bot.game_state.forget("trivia", state["key"])
             return
 
-        correct_answer = question_data["answer"].strip().lower()
+        session = self.sessions.restore(state, host)
+        if session is None:
+            self.content.release(dataset)
+            return
+        await self.outbox.send(channel, content="♻️ The bot restarted, so trivia picks up where it left off. Win counts were kept!")
+        self.start_game(session, channel)
+
+    @trivia.autocomplete("category")
+    async def trivia_category_autocomplete(self, interaction: discord.Interaction, current: str):
+        current = current.lower()
+        return [
+            app_commands.Choice(name=name.title(), value=name)
+            for name in self.content.categories("trivia") if current in name
+        ][:25]
+
+    async def run_trivia(self, session, channel):
+        engine = RoundEngine(
+            self.router, channel,
+            pick_item=lambda: self.get_random_question(session),
+            render_prompt=self.render_question,
+            match_answer=lambda question, m, content: (
+                question["matcher"].matches(content) and
+                session.wins.get(str(m.author.id), 0) < 5
+            ),
+            on_win=lambda question, msg: self.on_correct_answer(session, channel, question, msg),
+            on_timeout=lambda question: self.on_unanswered(session, channel, question),
+            is_running=lambda: session.running,
+            timeout=30,
+            outbox=self.outbox
+        )
+        if await engine.run() == RoundEngine.EXHAUSTED:
+            await self.outbox.send(channel, content="❌ No more unique trivia questions available!")
+            self.sessions.end(session)
 
-        embed = discord.Embed(
+    def render_question(self, question_data):
+        return discord.Embed(
             title="🧠 Trivia Time!",
             description=f"**{question_data['question']}**\n\n⏱️ You have 30 seconds to answer!",
             color=discord.Color.blurple()
         )
-        await channel.send(embed=embed)
 
-        stop_event = self.active_trivia[guild_id]["stop_event"]
-        start_time = asyncio.get_event_loop().time()
+    async def on_correct_answer(self, session, channel, question_data, msg):
+        guild_id = session.guild_id
+        host = session.host
+        correct_answer = question_data["answer"].strip().lower()
+
+        user_id = str(msg.author.id)
+        session.wins[user_id] = session.wins.get(user_id, 0) + 1
+        win_count = session.wins[user_id]
 
-        valid_winner_found = False
-        
-        while not stop_event.is_set():
-            remaining_time = 30 - (asyncio.get_event_loop().time() - start_time)
-            if remaining_time <= 0:
-                break
-
-            try:
-                msg = await self.bot.wait_for(
-                    "message",
-                    timeout=remaining_time,
-                    check=lambda m: (m.channel == channel and 
-                                     not m.author.bot and 
-                                     m.content.strip().lower() == correct_answer and
-                                     self.user_wins.get(guild_id, {}).get(str(m.author.id), 0) < 5)
+        self.db.record_user_stats(user_id=user_id, guild_id=guild_id, game_name="Trivia", wins=1)
+
+        await msg.add_reaction("🎉")
+
+        self.outbox.queue(channel, embed=discord.Embed(
+            title="🏆 Correct!",
+            description=(
+                f"{msg.author.mention} got it! The answer was **{correct_answer}**.\n"
+                f"🎯 Total Wins: `{win_count}/5`"
+            ),
+            color=discord.Color.green()
+        ))
+
+        session.unanswered = 0
+
+        if win_count == 5:
+            if self.leaderboard_cog:
+                added = await self.leaderboard_cog.record_winner(
+                    user_id=user_id, username=msg.author.name,
+                    game_name="Trivia", host_id=host.id, host_name=host.name,
+                    guild_id=guild_id
                 )
 
-                user_id = str(msg.author.id)
-                current_wins = self.user_wins.get(guild_id, {}).get(user_id, 0)
-                
-                if current_wins >= 5:
-                    continue
-
-                valid_winner_found = True
-                
-                if guild_id not in self.user_wins:
-                    self.user_wins[guild_id] = {}
-                self.user_wins[guild_id][user_id] = current_wins + 1
-                win_count = self.user_wins[guild_id][user_id]
-                
-                self.db.update_user_stats(user_id=user_id, guild_id=guild_id, game_name="Trivia", wins=1)
-
-                await msg.add_reaction("🎉")
-
-                await channel.send(embed=discord.Embed(
-                    title="🏆 Correct!",
-                    description=(
-                        f"{msg.author.mention} got it! The answer was **{correct_answer}**.\n"
-                        f"🎯 Total Wins: `{win_count}/5`"
-                    ),
-                    color=discord.Color.green()
-                ))
-                
-                self.unanswered_count[guild_id] = 0
-
-                if win_count == 5:
-                    if self.leaderboard_cog:
-                        added = self.db.add_winner(
-                            user_id=user_id, username=msg.author.name,
-                            game_name="Trivia", host_id=host.id, host_name=host.name,
-                            guild_id=guild_id
-                        )
-
-                        if added:
-                            await channel.send(embed=discord.Embed(
-                                title="🌟 Milestone!",
-                                description=f"{msg.author.mention} reached **5 wins** and is now on the leaderboard!",
-                                color=discord.Color.blue()
-                            ))
-                            await self.leaderboard_cog.update_leaderboard_display(channel)
-                        else:
-                            await channel.send(f"ℹ️ {msg.author.mention} is already on the leaderboard!")
-                    else:
-                        await channel.send("⚠️ Leaderboard system is not available.")
-                
-                break
-
-            except asyncio.TimeoutError:
-                break
-
-        if not valid_winner_found and self.active_trivia.get(guild_id, {}).get("running", False):
-            await channel.send(embed=discord.Embed(
-                title="⌛ Time's Up!",
-                description=f"No one guessed it. The correct answer was **{correct_answer}**.",
-                color=discord.Color.red()
-            ))
-            self.unanswered_count[guild_id] = self.unanswered_count.get(guild_id, 0) + 1
-            
-        if self.unanswered_count.get(guild_id, 0) >= 3:
-            await channel.send("🚫 **Game stopping!** The last 3 questions went unanswered. Use `/starttrivia` to begin a new game.")
-            self.active_trivia.pop(guild_id, None)
-            self.user_wins.pop(guild_id, None)
-            self.used_questions.pop(guild_id, None)
-            self.unanswered_count.pop(guild_id, None)
-            return
+                if added:
+                    self.outbox.queue(channel, embed=discord.Embed(
+                        title="🌟 Milestone!",
+                        description=f"{msg.author.mention} reached **5 wins** and is now on the leaderboard!",
+                        color=discord.Color.blue()
+                    ))
+                    await self.outbox.flush(channel)
+                    await self.leaderboard_cog.update_leaderboard_display(channel)
+                else:
+                    self.outbox.queue(channel, content=f"ℹ️ {msg.author.mention} is already on the leaderboard!")
+            else:
+                self.outbox.queue(channel, content="⚠️ Leaderboard system is not available.")
+        self.sessions.checkpoint(session)
+        return True
+
+    async def on_unanswered(self, session, channel, question_data):
+        correct_answer = question_data["answer"].strip().lower()
+
+        self.outbox.queue(channel, embed=discord.Embed(
+            title="⌛ Time's Up!",
+            description=f"No one guessed it. The correct answer was **{correct_answer}**.",
+            color=discord.Color.red()
+        ))
+        session.unanswered += 1
 
-        if self.active_trivia.get(guild_id, {}).get("running", False):
-            await self.ask_question(channel, host)
+        if session.unanswered >= 3:
+            self.outbox.queue(channel, content="🚫 **Game stopping!** The last 3 questions went unanswered. Use `/starttrivia` to begin a new game.")
+            self.sessions.end(session)
+            return False
+        self.sessions.checkpoint(session)
+        return True
 
     @app_commands.command(name="stoptrivia", description="Stop the ongoing trivia game")
     async def stoptrivia(self, interaction: discord.Interaction):
         guild_id = interaction.guild.id
 
-        settings = self.db.get_server_settings(guild_id)
-        if not settings:
+        if not await self.permissions.is_configured(interaction.guild):
             return await interaction.response.send_message("❌ This server is not set up. Please run `/setup` first!", ephemeral=True)
-        
-        allowed_roles = settings.get('allowed_roles', [])
-        user_roles = [role.name for role in interaction.user.roles]
-        if not any(role in user_roles for role in allowed_roles):
+        if not await self.permissions.can_host(interaction.user):
             return await interaction.response.send_message("❌ You don’t have permission to stop trivia.", ephemeral=True)
 
-        if guild_id in self.active_trivia:
-            self.active_trivia[guild_id]["stop_event"].set()
+        session = self.sessions.get("trivia", guild_id)
+        if session:
+            session.stop_event.set()
             
             await interaction.response.send_message("🛑 Trivia game stopped.")
             await interaction.channel.send("⚠️ Trivia game forcefully stopped in this channel. Here are the final results:")
             
             if self.leaderboard_cog:
-                await self.leaderboard_cog.display_leaderboard_command(interaction.channel)
+                await self.leaderboard_cog.send_leaderboard(interaction.channel)
             else:
                 await interaction.channel.send("⚠️ Leaderboard system is not available.")
             
-            self.active_trivia.pop(guild_id, None)
-            self.user_wins.pop(guild_id, None)
-            self.used_questions.pop(guild_id, None)
-            self.unanswered_count.pop(guild_id, None)
+            self.sessions.end(session)
             
-            self.db.clear_leaderboard_for_guild(guild_id)
+            if self.leaderboard_cog:
+                await self.leaderboard_cog.clear_winners(guild_id)
+            else:
+                await self.db.clear_leaderboard_for_guild(guild_id)
             
         else:
             await interaction.response.send_message("❗ No trivia running in this channel.", ephemeral=True)
@@ -241,17 +256,15 @@ class Trivia(commands.Cog):
     async def resettriviawins(self, interaction: discord.Interaction):
         guild_id = interaction.guild.id
 
-        settings = self.db.get_server_settings(guild_id)
-        if not settings:
+        if not await self.permissions.is_configured(interaction.guild):
             return await interaction.response.send_message("❌ This server is not set up. Please run `/setup` first!", ephemeral=True)
-            
-        allowed_roles = settings.get('allowed_roles', [])
-        user_roles = [role.name for role in interaction.user.roles]
-        if not any(role in user_roles for role in allowed_roles):
+        if not await self.permissions.can_host(interaction.user):
             return await interaction.response.send_message("❌ You don't have permission to reset win counts.", ephemeral=True)
 
-        if guild_id in self.user_wins and self.user_wins[guild_id]:
-            self.user_wins[guild_id].clear()
+        session = self.sessions.get("trivia", guild_id)
+        if session and session.wins:
+            session.wins.clear()
+            self.sessions.checkpoint(session)
             await interaction.response.send_message(
                 f"✅ All users' trivia 5-win counts for this server have been reset to `0`.",
                 ephemeral=True
@@ -1,137 +1,125 @@
 import discord
 import asyncio
-import random
-import json
 import os
 from discord.ext import commands
 from discord import app_commands
 
 
 from dotenv import load_dotenv
+from Utilities.Deck import Deck
+from Utilities.GameStateStore import resumable
 load_dotenv()
 LEADERBOARD_CHANNEL_ID = int(os.getenv('LEADERBOARD_CHANNEL_ID'))
 PRIVATE_CHANNEL_ID = int(os.getenv('PRIVATE_CHANNEL_ID'))
 
-ALLOWED_ROLES = ["Game Master", "Moderator"]
-
 class EmojiDecode(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.active_emoji = {}
+        self.sessions = bot.sessions
+        self.permissions = bot.permissions
+        self.content = bot.content
+        self.outbox = bot.outbox
+        self.scheduler = bot.scheduler
         self.leaderboard_cog = None
+        self.router = None
 
     @commands.Cog.listener()
     async def on_ready(self):
         print("EmojiDecode cog is ready.")
         await self.bot.wait_until_ready()
+        self.router = self.bot.get_cog('MessageRouter')
         self.leaderboard_cog = self.bot.get_cog('Leaderboard')
         if self.leaderboard_cog:
             print("Leaderboard cog found and linked to EmojiDecode cog.")
         else:
             print("WARNING: Leaderboard cog not found. Leaderboard functions will not work for Emoji Decode.")
 
-    def load_clues(self):
-        try:
-            with open("Data/emoji_clues.json", "r", encoding="utf-8") as f:
-                return json.load(f)
-        except FileNotFoundError:
-            print("Error: emoji_clues.json not found.")
-            return []
-        except json.JSONDecodeError:
-            print("Error: emoji_clues.json is corrupted or empty.")
-            return []
-        except Exception as e:
-            print(f"An unexpected error occurred while loading emoji_clues.json: {e}")
-            return []
+        # Games that were running when the bot last stopped; their winners are already in the leaderboard
+        async for state, channel, host in resumable(self.bot, "emoji"):
+            session = self.sessions.restore(state, host)
+            if session is not None:
+                await self.outbox.send(channel, content="♻️ The bot restarted, so Emoji Decode picks up where it left off.")
+                session.task = self.bot.loop.create_task(self.game_loop(session, channel))
 
     @app_commands.command(name="emoji", description="Guess the word based on emoji clues!")
     async def emoji(self, interaction: discord.Interaction):
-        if not any(role.name in ALLOWED_ROLES for role in interaction.user.roles):
+        if not await self.permissions.can_host(interaction.user):
             await interaction.response.send_message("❌ You don't have permission to use this command.", ephemeral=True)
             return
 
-        if interaction.channel.id in self.active_emoji:
+        if self.sessions.get("emoji", interaction.channel.id):
             await interaction.response.send_message("❗ An emoji game is already running in this channel.", ephemeral=True)
             return
 
-        clues = self.load_clues()
-        if not clues:
+        if not await self.content.load("emoji"):
             await interaction.response.send_message("❌ No emoji clues found or loaded. Please check the `emoji_clues.json` file.", ephemeral=True)
             return
 
-        self.active_emoji[interaction.channel.id] = {
-            "running": True,
-            "stop_event": asyncio.Event(),
-            "host": interaction.user,
-            "clues": clues,
-            "hint_task": None
-        }
+        session = self.sessions.create(
+            "emoji", interaction.channel.id,
+            guild_id=interaction.guild.id, channel_id=interaction.channel.id,
+            host=interaction.user
+        )
+        self.sessions.checkpoint(session)
         await interaction.response.send_message("🔤 Starting Emoji Decode game!")
         
-        self.bot.loop.create_task(self.game_loop(interaction.channel))
+        session.task = self.bot.loop.create_task(self.game_loop(session, interaction.channel))
 
-    async def game_loop(self, channel):
-        game_state = self.active_emoji.get(channel.id)
-        if not game_state:
-            return
+    async def game_loop(self, session, channel):
+        host = session.host
+        session.deck = Deck(self.content.source("emoji"))
 
-        host = game_state["host"]
-        clues = game_state["clues"]
-        used_clues = set()
+        if self.leaderboard_cog:
+            # Warm the guild's board so the per-answer checks never wait on the database
+            await self.leaderboard_cog.get_guild_winners(channel.guild.id)
 
-        while game_state["running"] and not game_state["stop_event"].is_set():
-            if self.leaderboard_cog and self.leaderboard_cog.is_leaderboard_full():
+        while session.running:
+            if self.leaderboard_cog and self.leaderboard_cog.is_leaderboard_full(channel.guild.id):
                 break
 
-            if len(used_clues) >= len(clues):
-                await channel.send("🎉 All emoji clues have been used! Resetting for new rounds.")
-                used_clues.clear()
+            if session.deck.exhausted:
+                self.outbox.queue(channel, content="🎉 All emoji clues have been used! Resetting for new rounds.")
 
-            clue = random.choice(clues)
-            while clue["emoji"] in used_clues and len(used_clues) < len(clues):
-                clue = random.choice(clues)
-            used_clues.add(clue["emoji"])
+            clue = session.deck.draw()
+            if clue is None:
+                await self.outbox.send(channel, content="❌ No emoji clues available!")
+                self.sessions.end(session)
+                return
 
-            emoji_clue, answer = clue["emoji"], clue["answer"].strip().lower()
+            emoji_clue, answer, matcher = clue["emoji"], clue["answer"].strip().lower(), clue["matcher"]
 
             embed = discord.Embed(
                 title="🧩 Emoji Decode!",
                 description=f"**Emoji Clue:**\n{emoji_clue}\n\nYou have 60 seconds to guess!",
                 color=discord.Color.orange()
             )
-            await channel.send(embed=embed)
-
-            game_state["hint_task"] = self.bot.loop.create_task(self.send_hints(channel, answer))
+            await self.outbox.send(channel, embed=embed)
 
-            def check(m):
-                return (
-                    m.channel == channel and
-                    not m.author.bot and
-                    m.content.strip().lower() == answer
-                )
+            session.timers = self.schedule_hints(session, channel, answer)
 
             try:
-                msg = await self.bot.wait_for("message", timeout=60.0, check=check)
+                msg = await self.router.wait_for_answer(channel.id, lambda m, content: matcher.matches(content), timeout=60.0)
 
-                if game_state["stop_event"].is_set():
+                if not session.running:
                     break
 
                 user_id = str(msg.author.id)
 
                 if self.leaderboard_cog:
-                    if any(str(w['user_id']) == user_id for w in self.leaderboard_cog.get_recent_winners()):
+                    if self.leaderboard_cog.is_recent_winner(channel.guild.id, user_id):
                         await msg.add_reaction("✋")
-                        await channel.send(f"Hey {msg.author.mention}, you've recently won a game and are already on the leaderboard! Let others have a chance! 🥳")
+                        self.outbox.queue(channel, content=f"Hey {msg.author.mention}, you've recently won a game and are already on the leaderboard! Let others have a chance! 🥳")
                         await asyncio.sleep(1)
                         continue
                 else:
-                    await channel.send("⚠️ Leaderboard system is not available.")
+                    self.outbox.queue(channel, content="⚠️ Leaderboard system is not available.")
                     break
 
                 await msg.add_reaction("🎉")
 
                 if self.leaderboard_cog:
                     self.leaderboard_cog.add_recent_winner(
+                        guild_id=channel.guild.id,
                         user_id=user_id,
                         username=msg.author.name,
                         game_name="Emoji Decode",
@@ -144,82 +132,67 @@ class EmojiDecode(commands.Cog):
                         description=f"{msg.author.mention} guessed it right! The answer was **{answer.title()}**.",
                         color=discord.Color.green()
                     )
-                    await channel.send(embed=win_embed)
+                    self.outbox.queue(channel, embed=win_embed)
 
+                    await self.outbox.flush(channel)
                     await self.leaderboard_cog.update_leaderboard_display(channel)
                     
-                    if self.leaderboard_cog.is_leaderboard_full():
-                        await self.handle_leaderboard_full(channel, host)
+                    if self.leaderboard_cog.is_leaderboard_full(channel.guild.id):
+                        await self.handle_leaderboard_full(session, channel)
                         break
                 else:
-                    await channel.send("⚠️ Leaderboard system is not available.")
+                    self.outbox.queue(channel, content="⚠️ Leaderboard system is not available.")
                 
                 await asyncio.sleep(3)
 
             except asyncio.TimeoutError:
-                if game_state["stop_event"].is_set():
+                if not session.running:
                     break
                 timeout_embed = discord.Embed(
                     title="⌛ Time's Up!",
                     description=f"No one guessed it. The correct answer was **{answer.title()}**.",
                     color=discord.Color.red()
                 )
-                await channel.send(embed=timeout_embed)
+                self.outbox.queue(channel, embed=timeout_embed)
                 await asyncio.sleep(2)
 
             finally:
-                if game_state["hint_task"] and not game_state["hint_task"].done():
-                    game_state["hint_task"].cancel()
-                game_state["hint_task"] = None
-
-            game_state = self.active_emoji.get(channel.id)
+                for timer in session.timers:
+                    timer.cancel()
+                session.timers.clear()
 
-        if game_state and game_state["running"] and self.leaderboard_cog and self.leaderboard_cog.is_leaderboard_full():
-            await self.handle_leaderboard_full(channel, host)
-        elif game_state and game_state["stop_event"].is_set():
-            await channel.send("ℹ️ Emoji Decode game session ended.")
+        if session.running and self.leaderboard_cog and self.leaderboard_cog.is_leaderboard_full(channel.guild.id):
+            await self.handle_leaderboard_full(session, channel)
         
-        if channel.id in self.active_emoji:
-            if self.active_emoji[channel.id]["hint_task"] and not self.active_emoji[channel.id]["hint_task"].done():
-                self.active_emoji[channel.id]["hint_task"].cancel()
-            del self.active_emoji[channel.id]
-
-    async def send_hints(self, channel, answer):
-        try:
-            await asyncio.sleep(20)
-            game_state = self.active_emoji.get(channel.id)
-            if not game_state or game_state["stop_event"].is_set():
-                return
+        self.sessions.end(session)
+
+    def schedule_hints(self, session, channel, answer):
+        """Schedules this round's two hints, 20 and 35 seconds in."""
+        hint1 = f"The answer starts with: **{answer[0]}...**"
+        if len(answer) > 1:
+            hint2 = f"The answer starts with: **{answer[:2]}...**"
+        else:
+            hint2 = f"The answer has {len(answer)} letter(s)."
 
-            hint1 = f"The answer starts with: **{answer[0]}...**"
-            hint_embed1 = discord.Embed(
+        return [
+            self.scheduler.call_later(20, self.send_hint, session, channel, discord.Embed(
                 title="💡 Hint Time!",
                 description=hint1,
                 color=discord.Color.yellow()
-            )
-            await channel.send(embed=hint_embed1)
-
-            await asyncio.sleep(15)
-            game_state = self.active_emoji.get(channel.id)
-            if not game_state or game_state["stop_event"].is_set():
-                return
-
-            if len(answer) > 1:
-                hint2 = f"The answer starts with: **{answer[:2]}...**"
-            else:
-                hint2 = f"The answer has {len(answer)} letter(s)."
-            
-            hint_embed2 = discord.Embed(
+            )),
+            self.scheduler.call_later(35, self.send_hint, session, channel, discord.Embed(
                 title="💡 Second Hint!",
                 description=hint2,
                 color=discord.Color.light_grey()
-            )
-            await channel.send(embed=hint_embed2)
+            )),
+        ]
 
-        except asyncio.CancelledError:
-            pass
+    async def send_hint(self, session, channel, embed):
+        if session.running:
+            await self.outbox.send(channel, embed=embed)
 
-    async def handle_leaderboard_full(self, channel, host):
+    async def handle_leaderboard_full(self, session, channel):
+        host = session.host
         if not self.leaderboard_cog:
             await channel.send("⚠️ Leaderboard system is not available, cannot finalize leaderboard actions.")
             return
@@ -234,7 +207,7 @@ class EmojiDecode(commands.Cog):
         private_channel = self.bot.get_channel(PRIVATE_CHANNEL_ID)
 
         if leaderboard_channel:
-            await self.leaderboard_cog.update_leaderboard_display(leaderboard_channel)
+            await self.leaderboard_cog.flush_leaderboard_display(leaderboard_channel)
             await leaderboard_channel.send(
                 "**Congratulations to all the winners!**\n"
                 "🔄 **The leaderboard has been reset for the next set of champions!**"
@@ -248,32 +221,29 @@ class EmojiDecode(commands.Cog):
                 private_channel, self.bot, lambda m: m.author == host and m.channel == private_channel
             )
             if role_name:
-                await self.leaderboard_cog._giverole_logic(private_channel, role_name)
+                await self.leaderboard_cog._giverole_logic(private_channel, role_name, guild_id=channel.guild.id)
             else:
                 await private_channel.send("⚠️ Role assignment for Emoji Decode winners was skipped due to no role name provided or timeout.")
         else:
             print(f"Error: Private channel with ID {PRIVATE_CHANNEL_ID} not found for role assignment.")
             await channel.send("⚠️ Could not find the private channel for role assignments.")
 
-        self.leaderboard_cog.reset_leaderboard()
+        self.leaderboard_cog.reset_leaderboard(channel.guild.id)
 
     @app_commands.command(name="stopemoji", description="Stop the ongoing Emoji Decode game")
     async def stopemoji(self, interaction: discord.Interaction):
-        if not any(role.name in ALLOWED_ROLES for role in interaction.user.roles):
+        if not await self.permissions.can_host(interaction.user):
             return await interaction.response.send_message("❌ You don’t have permission.", ephemeral=True)
 
-        if interaction.channel.id in self.active_emoji:
-            game_state = self.active_emoji[interaction.channel.id]
-            game_state["stop_event"].set()
-            
-            # Cancel the hint task if it's still running
-            if game_state["hint_task"] and not game_state["hint_task"].done():
-                game_state["hint_task"].cancel()
-            
-            del self.active_emoji[interaction.channel.id]
+        session = self.sessions.get("emoji", interaction.channel.id)
+        if session:
+            # Also cancels any hints still pending
+            self.sessions.end(session)
             
             await interaction.response.send_message("🛑 Emoji Decode game stopped.")
             await interaction.channel.send("⚠️ Emoji Decode game forcefully stopped.")
+            # Ending the session cancels the game task, so the end-of-game notice is sent from here
+            await interaction.channel.send("ℹ️ Emoji Decode game session ended.")
         else:
             await interaction.response.send_message("❗ No Emoji Decode game running in this channel.", ephemeral=True)
 
@@ -1,240 +1,211 @@
 import discord
 import random
-import json
-import asyncio
-import os
 from discord.ext import commands
 from discord import app_commands
 from dotenv import load_dotenv
-from database import DatabaseManager
+from Utilities.Deck import Deck
+from Utilities.RoundEngine import RoundEngine
+from Utilities.GameStateStore import resumable
 
 load_dotenv()
 
 class Scramble(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.active_scramble = {}
-        self.scramble_words = self.load_words()
-        self.user_wins = {}
-        self.used_words = {}
+        self.sessions = bot.sessions
+        self.content = bot.content
+        self.outbox = bot.outbox
         self.leaderboard_cog = None
-        self.db = DatabaseManager()
-        self.unanswered_count = {}
+        self.router = None
+        self.db = bot.db
+        self.permissions = bot.permissions
 
     @commands.Cog.listener()
     async def on_ready(self):
         print("Scramble cog is ready.")
         await self.bot.wait_until_ready()
+        self.router = self.bot.get_cog('MessageRouter')
         self.leaderboard_cog = self.bot.get_cog('Leaderboard')
         if self.leaderboard_cog:
             print("Leaderboard cog found and linked to Scramble cog.")
         else:
             print("WARNING: Leaderboard cog not found. Leaderboard functions will not work for Scramble.")
 
-    def load_words(self):
-        try:
-            with open("Data/scramble_words.json", "r") as f:
-                return json.load(f)
-        except FileNotFoundError:
-            print("Error: Data/scramble_words.json not found!")
-            return []
-        except json.JSONDecodeError:
-            print("Error: Data/scramble_words.json is corrupted or empty.")
-            return []
-
-    def get_random_word(self, guild_id):
-        if guild_id not in self.used_words:
-            self.used_words[guild_id] = set()
-
-        used_words_set = self.used_words[guild_id]
-
-        if len(used_words_set) >= len(self.scramble_words) or not self.scramble_words:
-            used_words_set.clear()
-            if not self.scramble_words:
-                return None, None
-
-        available = [w for w in self.scramble_words if w not in used_words_set]
-        if not available:
-            used_words_set.clear()
-            available = self.scramble_words[:]
-
-        word = random.choice(available)
+        # Games that were running when the bot last stopped
+        async for state, channel, host in resumable(self.bot, "scramble"):
+            await self.resume_scramble(state, channel, host)
+
+    def get_random_word(self, session):
+        # Each word comes up once per pass; the deck reshuffles when it runs out
+        entry = session.deck.draw()
+        if entry is None:
+            return None, None
+
+        word = entry["word"]
         scrambled = ''.join(random.sample(word, len(word)))
         while scrambled == word:
             scrambled = ''.join(random.sample(word, len(word)))
-
-        used_words_set.add(word)
-        return word, scrambled
+        return entry, scrambled
 
     @app_commands.command(name="scramble", description="Start a scramble word game")
     async def scramble(self, interaction: discord.Interaction):
         guild_id = interaction.guild.id
         
-        settings = self.db.get_server_settings(guild_id)
-        if not settings:
+        if not await self.permissions.is_configured(interaction.guild):
             return await interaction.response.send_message("❌ This server is not set up. Please run `/setup` first!", ephemeral=True)
-            
-        allowed_roles = settings.get('allowed_roles', [])
-        
-        user_roles = [role.name for role in interaction.user.roles]
-        if not any(role in user_roles for role in allowed_roles):
+        if not await self.permissions.can_host(interaction.user):
             return await interaction.response.send_message("❌ You don't have permission to start scramble.", ephemeral=True)
 
-        if guild_id in self.active_scramble:
+        if self.sessions.get("scramble", guild_id):
             return await interaction.response.send_message("❗ Scramble is already running in this server. Use `/stopscramble` to end the current game.", ephemeral=True)
 
-        if not self.scramble_words:
+        if not await self.content.load("scramble"):
             return await interaction.response.send_message("❌ No scramble words loaded. Please check `Data/scramble_words.json`.", ephemeral=True)
 
-        self.active_scramble[guild_id] = {"running": True, "stop_event": asyncio.Event(), "channel_id": interaction.channel.id}
-        self.user_wins[guild_id] = {}
-        self.unanswered_count[guild_id] = 0
+        session = self.sessions.create(
+            "scramble", guild_id, guild_id=guild_id, channel_id=interaction.channel.id, host=interaction.user
+        )
+        if session is None:
+            return await interaction.response.send_message("❗ Scramble is already running in this server. Use `/stopscramble` to end the current game.", ephemeral=True)
         await interaction.response.send_message("🔤 Starting Scramble...")
-
-        self.bot.loop.create_task(self.ask_word(interaction.channel, interaction.user))
-
-    async def ask_word(self, channel, host):
-        guild_id = channel.guild.id
-        
-        if not self.active_scramble.get(guild_id, {}).get("running", False):
+        self.start_game(session, interaction.channel)
+
+    def start_game(self, session, channel):
+        session.deck = Deck(self.content.source("scramble"))
+        self.sessions.checkpoint(session)
+        session.task = self.bot.loop.create_task(self.run_scramble(session, channel))
+
+    async def resume_scramble(self, state, channel, host):
+        """Restarts a game checkpointed by an earlier process, keeping its win counts."""
+        if not await self.content.load("scramble"):
+            print(f"Not resuming scramble in guild {state['guild_id']}: no scramble words are loaded.")
+            self.bot.game_state.forget("scramble", state["key"])
             return
 
-        word, scrambled = self.get_random_word(guild_id)
-        if not word:
-            await channel.send("❌ No more unique scramble words available!")
-            del self.active_scramble[guild_id]
-            self.user_wins.pop(guild_id, None)
-            self.used_words.pop(guild_id, None)
+        session = self.sessions.restore(state, host)
+        if session is None:
             return
+        await self.outbox.send(channel, content="♻️ The bot restarted, so scramble picks up where it left off. Win counts were kept!")
+        self.start_game(session, channel)
+
+    def _pick_word(self, session):
+        entry, scrambled = self.get_random_word(session)
+        return (entry, scrambled) if entry else None
+
+    async def run_scramble(self, session, channel):
+        engine = RoundEngine(
+            self.router, channel,
+            pick_item=lambda: self._pick_word(session),
+            render_prompt=self.render_word,
+            match_answer=lambda item, m, content: (
+                item[0]["matcher"].matches(content) and
+                session.wins.get(str(m.author.id), 0) < 5
+            ),
+            on_win=lambda item, msg: self.on_correct_answer(session, channel, item[0]["word"], msg),
+            on_timeout=lambda item: self.on_unanswered(session, channel, item[0]["word"]),
+            is_running=lambda: session.running,
+            timeout=30,
+            outbox=self.outbox
+        )
+        if await engine.run() == RoundEngine.EXHAUSTED:
+            await self.outbox.send(channel, content="❌ No more unique scramble words available!")
+            self.sessions.end(session)
 
-        embed = discord.Embed(
+    def render_word(self, item):
+        scrambled = item[1]
+        return discord.Embed(
             title="🔤 Unscramble This Word!",
             description=f"`{scrambled}`\n\n⏱️ You have 30 seconds to answer!",
             color=discord.Color.orange()
         )
-        await channel.send(embed=embed)
-
-        stop_event = self.active_scramble[guild_id]["stop_event"]
-        start_time = asyncio.get_event_loop().time()
-
-        valid_winner_found = False
-
-        while not stop_event.is_set():
-            remaining_time = 30 - (asyncio.get_event_loop().time() - start_time)
-            if remaining_time <= 0:
-                break
-
-            try:
-                msg = await self.bot.wait_for(
-                    "message",
-                    timeout=remaining_time,
-                    check=lambda m: (m.channel == channel and 
-                                     not m.author.bot and 
-                                     m.content.strip().lower() == word.lower() and
-                                     self.user_wins.get(guild_id, {}).get(str(m.author.id), 0) < 5)
-                )
 
-                user_id = str(msg.author.id)
-                current_wins = self.user_wins.get(guild_id, {}).get(user_id, 0)
-
-                if current_wins >= 5:
-                    continue
-
-                valid_winner_found = True
-                
-                if guild_id not in self.user_wins:
-                    self.user_wins[guild_id] = {}
-                self.user_wins[guild_id][user_id] = current_wins + 1
-                win_count = self.user_wins[guild_id][user_id]
-                
-                self.db.update_user_stats(user_id=user_id, guild_id=guild_id, game_name="Scramble", wins=1)
-
-                await msg.add_reaction("🎉")
-
-                await channel.send(embed=discord.Embed(
-                    title="🏆 Correct!",
-                    description=(
-                        f"{msg.author.mention} unscrambled it! The word was **{word}**.\n"
-                        f"🎯 Total Wins: `{win_count}/5`"
-                    ),
-                    color=discord.Color.green()
-                ))
-
-                self.unanswered_count[guild_id] = 0
-
-                if win_count == 5:
-                    if self.leaderboard_cog:
-                        added = self.db.add_winner(
-                            user_id=user_id, username=msg.author.name,
-                            game_name="Scramble", host_id=host.id, host_name=host.name,
-                            guild_id=guild_id
-                        )
-                        if added:
-                            await channel.send(embed=discord.Embed(
-                                title="🌟 Milestone!",
-                                description=f"{msg.author.mention} reached **5 wins** and is now on the leaderboard!",
-                                color=discord.Color.blue()
-                            ))
-                            await self.leaderboard_cog.update_leaderboard_display(channel)
-                        else:
-                            await channel.send(f"ℹ️ {msg.author.mention} is already on the leaderboard!")
-                    else:
-                        await channel.send("⚠️ Leaderboard system is not available.")
-                
-                break
-
-            except asyncio.TimeoutError:
-                break
-
-        if not valid_winner_found and self.active_scramble.get(guild_id, {}).get("running", False):
-            await channel.send(embed=discord.Embed(
-                title="⌛ Time's Up!",
-                description=f"No one guessed it. The correct word was **{word}**.",
-                color=discord.Color.red()
-            ))
-            self.unanswered_count[guild_id] = self.unanswered_count.get(guild_id, 0) + 1
-
-        if self.unanswered_count.get(guild_id, 0) >= 3:
-            await channel.send("🚫 **Game stopping!** The last 3 words went unanswered. Use `/scramble` to begin a new game.")
-            self.active_scramble.pop(guild_id, None)
-            self.user_wins.pop(guild_id, None)
-            self.used_words.pop(guild_id, None)
-            self.unanswered_count.pop(guild_id, None)
-            return
+    async def on_correct_answer(self, session, channel, word, msg):
+        guild_id = session.guild_id
+        host = session.host
 
-        if self.active_scramble.get(guild_id, {}).get("running", False):
-            await self.ask_word(channel, host)
+        user_id = str(msg.author.id)
+        session.wins[user_id] = session.wins.get(user_id, 0) + 1
+        win_count = session.wins[user_id]
+
+        self.db.record_user_stats(user_id=user_id, guild_id=guild_id, game_name="Scramble", wins=1)
+
+        await msg.add_reaction("🎉")
+
+        self.outbox.queue(channel, embed=discord.Embed(
+            title="🏆 Correct!",
+            description=(
+                f"{msg.author.mention} unscrambled it! The word was **{word}**.\n"
+                f"🎯 Total Wins: `{win_count}/5`"
+            ),
+            color=discord.Color.green()
+        ))
+
+        session.unanswered = 0
+
+        if win_count == 5:
+            if self.leaderboard_cog:
+                added = await self.leaderboard_cog.record_winner(
+                    user_id=user_id, username=msg.author.name,
+                    game_name="Scramble", host_id=host.id, host_name=host.name,
+                    guild_id=guild_id
+                )
+                if added:
+                    self.outbox.queue(channel, embed=discord.Embed(
+                        title="🌟 Milestone!",
+                        description=f"{msg.author.mention} reached **5 wins** and is now on the leaderboard!",
+                        color=discord.Color.blue()
+                    ))
+                    await self.outbox.flush(channel)
+                    await self.leaderboard_cog.update_leaderboard_display(channel)
+                else:
+                    self.outbox.queue(channel, content=f"ℹ️ {msg.author.mention} is already on the leaderboard!")
+            else:
+                self.outbox.queue(channel, content="⚠️ Leaderboard system is not available.")
+        self.sessions.checkpoint(session)
+        return True
+
+    async def on_unanswered(self, session, channel, word):
+        self.outbox.queue(channel, embed=discord.Embed(
+            title="⌛ Time's Up!",
+            description=f"No one guessed it. The correct word was **{word}**.",
+            color=discord.Color.red()
+        ))
+        session.unanswered += 1
+
+        if session.unanswered >= 3:
+            self.outbox.queue(channel, content="🚫 **Game stopping!** The last 3 words went unanswered. Use `/scramble` to begin a new game.")
+            self.sessions.end(session)
+            return False
+        self.sessions.checkpoint(session)
+        return True
 
     @app_commands.command(name="stopscramble", description="Stop the ongoing scramble game")
     async def stopscramble(self, interaction: discord.Interaction):
         guild_id = interaction.guild.id
 
-        settings = self.db.get_server_settings(guild_id)
-        if not settings:
+        if not await self.permissions.is_configured(interaction.guild):
             return await interaction.response.send_message("❌ This server is not set up. Please run `/setup` first!", ephemeral=True)
-        
-        allowed_roles = settings.get('allowed_roles', [])
-        user_roles = [role.name for role in interaction.user.roles]
-        if not any(role in user_roles for role in allowed_roles):
+        if not await self.permissions.can_host(interaction.user):
             return await interaction.response.send_message("❌ You don’t have permission to stop scramble.", ephemeral=True)
 
-        if guild_id in self.active_scramble:
-            self.active_scramble[guild_id]["stop_event"].set()
+        session = self.sessions.get("scramble", guild_id)
+        if session:
+            session.stop_event.set()
 
             await interaction.response.send_message("🛑 Scramble game stopped.")
             await interaction.channel.send("⚠️ Scramble game forcefully stopped in this channel. Here are the final results:")
             
             if self.leaderboard_cog:
-                await self.leaderboard_cog.display_leaderboard_command(interaction.channel)
+                await self.leaderboard_cog.send_leaderboard(interaction.channel)
             else:
                 await interaction.channel.send("⚠️ Leaderboard system is not available.")
             
-            self.active_scramble.pop(guild_id, None)
-            self.user_wins.pop(guild_id, None)
-            self.used_words.pop(guild_id, None)
-            self.unanswered_count.pop(guild_id, None)
+            self.sessions.end(session)
             
-            self.db.clear_leaderboard_for_guild(guild_id)
+            if self.leaderboard_cog:
+                await self.leaderboard_cog.clear_winners(guild_id)
+            else:
+                await self.db.clear_leaderboard_for_guild(guild_id)
 
         else:
             await interaction.response.send_message("❗ No scramble running in this channel.", ephemeral=True)
@@ -243,17 +214,15 @@ class Scramble(commands.Cog):
     async def resetscramblesec(self, interaction: discord.Interaction):
         guild_id = interaction.guild.id
 
-        settings = self.db.get_server_settings(guild_id)
-        if not settings:
+        if not await self.permissions.is_configured(interaction.guild):
             return await interaction.response.send_message("❌ This server is not set up. Please run `/setup` first!", ephemeral=True)
-            
-        allowed_roles = settings.get('allowed_roles', [])
-        user_roles = [role.name for role in interaction.user.roles]
-        if not any(role in user_roles for role in allowed_roles):
+        if not await self.permissions.can_host(interaction.user):
             return await interaction.response.send_message("❌ You don't have permission to reset win counts.", ephemeral=True)
 
-        if guild_id in self.user_wins and self.user_wins[guild_id]:
-            self.user_wins[guild_id].clear()
+        session = self.sessions.get("scramble", guild_id)
+        if session and session.wins:
+            session.wins.clear()
+            self.sessions.checkpoint(session)
             await interaction.response.send_message(
                 f"✅ All users' scramble 5-win counts for this server have been reset to `0`.",
                 ephemeral=True
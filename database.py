@@ -1,105 +1,389 @@
-import psycopg2
+from psycopg2 import pool
+from psycopg2.extras import execute_values
 import os
 import datetime
 import json
+import asyncio
+import functools
+import threading
+import queue
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from dotenv import load_dotenv
+from Utilities.Cache import TTLCache
 load_dotenv()
 
+# Storage backend: 'postgres' (DATABASE_URL) or 'sqlite' (an embedded file at
+# SQLITE_PATH with one writer connection and SQLITE_READERS reader connections).
+DATABASE_BACKEND = os.getenv('DATABASE_BACKEND', 'postgres').lower()
+SQLITE_PATH = os.getenv('SQLITE_PATH', os.path.join("Data", "funtrix.db"))
+SQLITE_READERS = int(os.getenv('SQLITE_READERS', 4))
+
+# Connection pool settings. The pool is bounded so a burst of games can never
+# open more than DB_POOL_MAX_SIZE connections; callers wait at most
+# DB_POOL_ACQUIRE_TIMEOUT seconds for a free connection before giving up.
+DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', 1))
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', 5))
+DB_POOL_ACQUIRE_TIMEOUT = float(os.getenv('DB_POOL_ACQUIRE_TIMEOUT', 5))
+
+# Write-behind settings for per-answer stat increments. Pending increments are
+# flushed every STATS_FLUSH_INTERVAL seconds, or sooner once
+# STATS_FLUSH_MAX_PENDING distinct (user, guild, game) rows are waiting.
+STATS_FLUSH_INTERVAL = float(os.getenv('STATS_FLUSH_INTERVAL', 5))
+STATS_FLUSH_MAX_PENDING = int(os.getenv('STATS_FLUSH_MAX_PENDING', 500))
+
+# server_settings cache. Permission checks read settings on every game command,
+# so they are served from memory and refreshed after SETTINGS_CACHE_TTL seconds.
+SETTINGS_CACHE_SIZE = int(os.getenv('SETTINGS_CACHE_SIZE', 1024))
+SETTINGS_CACHE_TTL = float(os.getenv('SETTINGS_CACHE_TTL', 300))
+
+# Shared by every AsyncDatabaseManager so a /setup in one cog is seen by all
+server_settings_cache = TTLCache(maxsize=SETTINGS_CACHE_SIZE, ttl=SETTINGS_CACHE_TTL)
+
+# Arbitrary key for pg_advisory_xact_lock so only one process migrates at a time
+MIGRATION_LOCK_ID = 872_341_001
+
+# Numbered schema migrations, applied once each and in order by
+# DatabaseManager.migrate(). Never edit a shipped entry; add a new version
+# for new tables, columns or indexes.
+MIGRATIONS = [
+    (1, "initial schema", [
+        # Table for winners (e.g., Trivia, Scramble, etc.)
+        '''
+        CREATE TABLE IF NOT EXISTS global_winners (
+            id SERIAL PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            username TEXT,
+            game_name TEXT NOT NULL,
+            host_id TEXT,
+            host_name TEXT,
+            timestamp TIMESTAMPTZ NOT NULL,
+            guild_id TEXT NOT NULL
+        );
+        ''',
+        # Table for user stats (e.g., number of wins, streaks, etc.)
+        '''
+        CREATE TABLE IF NOT EXISTS user_stats (
+            id SERIAL PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            guild_id TEXT NOT NULL,
+            game_name TEXT NOT NULL,
+            wins INT DEFAULT 0,
+            losses INT DEFAULT 0,
+            last_played TIMESTAMPTZ,
+            UNIQUE(user_id, guild_id, game_name)
+        );
+        ''',
+        # Table for server settings
+        '''
+        CREATE TABLE IF NOT EXISTS server_settings (
+            guild_id TEXT PRIMARY KEY,
+            allowed_roles TEXT NOT NULL
+        );
+        ''',
+    ]),
+    (2, "leaderboard indexes on global_winners", [
+        # get_recent_winners_for_guild / clear_leaderboard_for_guild without a game
+        # filter. INCLUDE makes the leaderboard read an index-only scan.
+        '''
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_global_winners_guild_ts
+        ON global_winners (guild_id, timestamp DESC)
+        INCLUDE (user_id, username, game_name, host_id, host_name);
+        ''',
+        # The same queries filtered by game_name
+        '''
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_global_winners_guild_game_ts
+        ON global_winners (guild_id, game_name, timestamp DESC)
+        INCLUDE (user_id, username, host_id, host_name);
+        ''',
+    ]),
+    (3, "leaderboard message pointers", [
+        # The leaderboard message the bot edits in each channel; replaces
+        # Data/last_leaderboard_messages.json
+        '''
+        CREATE TABLE IF NOT EXISTS leaderboard_messages (
+            channel_id TEXT PRIMARY KEY,
+            message_id TEXT NOT NULL,
+            updated_at TIMESTAMPTZ NOT NULL
+        );
+        ''',
+    ]),
+    (4, "rendered hash of each leaderboard message", [
+        # Lets a restart skip edits that would not change the message
+        "ALTER TABLE leaderboard_messages ADD COLUMN IF NOT EXISTS content_hash TEXT;",
+    ]),
+    (5, "checkpoints of running games", [
+        # One row per running game (see GameStateStore); state is GameSession.snapshot() as JSON
+        '''
+        CREATE TABLE IF NOT EXISTS game_sessions (
+            game TEXT NOT NULL,
+            session_key TEXT NOT NULL,
+            state TEXT NOT NULL,
+            updated_at TIMESTAMPTZ NOT NULL,
+            PRIMARY KEY (game, session_key)
+        );
+        ''',
+    ]),
+]
+
+# Migrations that cannot run inside a transaction block (CREATE INDEX
+# CONCURRENTLY builds the index without blocking inserts into the table).
+# Each statement commits on its own, so they must be safe to re-run: if one
+# fails, the migration is not recorded and the next migrate() retries it. A
+# failed concurrent build leaves an INVALID index that IF NOT EXISTS would
+# skip; drop it by hand before retrying.
+NON_TRANSACTIONAL_MIGRATIONS = frozenset({2})
+
+# SQLite flavour of MIGRATIONS, kept in step version for version.
+SQLITE_MIGRATIONS = [
+    (1, "initial schema", [
+        '''
+        CREATE TABLE IF NOT EXISTS global_winners (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            username TEXT,
+            game_name TEXT NOT NULL,
+            host_id TEXT,
+            host_name TEXT,
+            timestamp TEXT NOT NULL,
+            guild_id TEXT NOT NULL
+        );
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS user_stats (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            guild_id TEXT NOT NULL,
+            game_name TEXT NOT NULL,
+            wins INTEGER DEFAULT 0,
+            losses INTEGER DEFAULT 0,
+            last_played TEXT,
+            UNIQUE(user_id, guild_id, game_name)
+        );
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS server_settings (
+            guild_id TEXT PRIMARY KEY,
+            allowed_roles TEXT NOT NULL
+        );
+        ''',
+    ]),
+    (2, "leaderboard indexes on global_winners", [
+        '''
+        CREATE INDEX IF NOT EXISTS idx_global_winners_guild_ts
+        ON global_winners (guild_id, timestamp DESC);
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_global_winners_guild_game_ts
+        ON global_winners (guild_id, game_name, timestamp DESC);
+        ''',
+    ]),
+    (3, "leaderboard message pointers", [
+        '''
+        CREATE TABLE IF NOT EXISTS leaderboard_messages (
+            channel_id TEXT PRIMARY KEY,
+            message_id TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        );
+        ''',
+    ]),
+    (4, "rendered hash of each leaderboard message", [
+        "ALTER TABLE leaderboard_messages ADD COLUMN content_hash TEXT;",
+    ]),
+    (5, "checkpoints of running games", [
+        '''
+        CREATE TABLE IF NOT EXISTS game_sessions (
+            game TEXT NOT NULL,
+            session_key TEXT NOT NULL,
+            state TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            PRIMARY KEY (game, session_key)
+        );
+        ''',
+    ]),
+]
+
 class DatabaseManager:
     """
     A production-ready class to manage all database connections and queries
     for a multi-server Discord bot. It uses a PostgreSQL database for scalability.
+
+    Connections are borrowed from a bounded, reusable pool instead of being
+    opened per query. The methods here are blocking; cogs should go through
+    AsyncDatabaseManager so queries never run on the event loop.
     """
 
-    def __init__(self):
-        self._create_tables()
+    def __init__(self, min_size=DB_POOL_MIN_SIZE, max_size=DB_POOL_MAX_SIZE, acquire_timeout=DB_POOL_ACQUIRE_TIMEOUT):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        # psycopg2's pool raises immediately when exhausted, so a semaphore
+        # makes callers queue for a free connection up to acquire_timeout.
+        self._slots = threading.BoundedSemaphore(max_size)
 
-    def _get_connection(self):
+    def _get_pool(self):
         """
-        Establishes and returns a database connection using the DATABASE_URL
+        Lazily creates the connection pool using the DATABASE_URL
         from your .env file.
         """
+        with self._pool_lock:
+            if self._pool is None:
+                # Retrieve the connection URL from the environment variable
+                database_url = os.getenv('DATABASE_URL')
+                if not database_url:
+                    raise ValueError("DATABASE_URL environment variable is not set.")
+
+                self._pool = pool.ThreadedConnectionPool(self.min_size, self.max_size, database_url)
+            return self._pool
+
+    def _get_connection(self):
+        """
+        Borrows a connection from the pool, waiting at most acquire_timeout
+        seconds for one to become free. Returns None on failure.
+        """
         try:
-            # Retrieve the connection URL from the environment variable
-            database_url = os.getenv('DATABASE_URL')
-            if not database_url:
-                raise ValueError("DATABASE_URL environment variable is not set.")
-                
-            return psycopg2.connect(database_url)
+            if not self._slots.acquire(timeout=self.acquire_timeout):
+                raise TimeoutError(f"no free connection after {self.acquire_timeout}s (pool size {self.max_size})")
+            try:
+                return self._get_pool().getconn()
+            except Exception:
+                self._slots.release()
+                raise
         except Exception as e:
             print(f"Error connecting to database: {e}")
             return None
 
-    def _create_tables(self):
+    def _release_connection(self, conn):
+        """Returns a connection to the pool, discarding it if it is broken."""
+        try:
+            self._pool.putconn(conn, close=bool(conn.closed))
+        except Exception as e:
+            print(f"Error returning connection to pool: {e}")
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def _connection(self):
         """
-        Creates the necessary tables if they do not already exist.
-        - global_winners: Stores winners for all games and servers.
-        - user_stats: Stores game-specific stats for each user on each server.
-        - server_settings: Stores settings for each guild (e.g., game master role).
+        Context manager around _get_connection/_release_connection. Yields None
+        if no connection could be acquired and rolls back on errors.
         """
+        conn = self._get_connection()
         try:
-            conn = self._get_connection()
-            if conn is None:
-                print("Failed to create tables due to connection error.")
-                return
-
-            with conn.cursor() as cursor:
-                # Table for winners (e.g., Trivia, Scramble, etc.)
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS global_winners (
-                        id SERIAL PRIMARY KEY,
-                        user_id TEXT NOT NULL,
-                        username TEXT,
-                        game_name TEXT NOT NULL,
-                        host_id TEXT,
-                        host_name TEXT,
-                        timestamp TIMESTAMPTZ NOT NULL,
-                        guild_id TEXT NOT NULL
-                    );
-                ''')
-                
-                # Table for user stats (e.g., number of wins, streaks, etc.)
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS user_stats (
-                        id SERIAL PRIMARY KEY,
-                        user_id TEXT NOT NULL,
-                        guild_id TEXT NOT NULL,
-                        game_name TEXT NOT NULL,
-                        wins INT DEFAULT 0,
-                        losses INT DEFAULT 0,
-                        last_played TIMESTAMPTZ,
-                        UNIQUE(user_id, guild_id, game_name)
-                    );
-                ''')
-                
-                # Table for server settings
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS server_settings (
-                        guild_id TEXT PRIMARY KEY,
-                        allowed_roles TEXT NOT NULL
-                    );
-                ''')
-                
-            conn.commit()
-            conn.close()
-            print("Database tables are ready!")
+            yield conn
+        except Exception:
+            if conn is not None and not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            if conn is not None:
+                self._release_connection(conn)
+
+    def close(self):
+        """Closes every pooled connection."""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+
+    def migrate(self):
+        """
+        Applies any schema migrations that have not been recorded in
+        schema_migrations yet. When the schema is already current this is a
+        single read-only query and no DDL (or DDL lock) is issued. Each
+        migration commits on its own; those in NON_TRANSACTIONAL_MIGRATIONS
+        run outside a transaction block.
+        Returns the list of versions that were applied.
+        """
+        try:
+            with self._connection() as conn:
+                if conn is None:
+                    print("Failed to run migrations due to connection error.")
+                    return []
+
+                with conn.cursor() as cursor:
+                    applied = self._applied_migrations(cursor)
+                    conn.rollback()
+                    if applied is not None and all(version in applied for version, _, _ in MIGRATIONS):
+                        return []
+
+                    # Transactions are opened explicitly below, per migration
+                    conn.autocommit = True
+                    try:
+                        # Serialise concurrent deploys/processes, then re-check under the lock
+                        cursor.execute("SELECT pg_advisory_lock(%s);", (MIGRATION_LOCK_ID,))
+                        try:
+                            newly_applied = self._apply_migrations(cursor)
+                        finally:
+                            cursor.execute("SELECT pg_advisory_unlock(%s);", (MIGRATION_LOCK_ID,))
+                    finally:
+                        conn.autocommit = False
+
+            if newly_applied:
+                print(f"Applied database migrations: {newly_applied}")
+            return newly_applied
         except Exception as e:
-            print(f"Error creating tables: {e}")
+            print(f"Error running migrations: {e}")
+            return []
+
+    def _apply_migrations(self, cursor):
+        """Runs the pending MIGRATIONS on an autocommit connection holding the migration lock."""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INT PRIMARY KEY,
+                description TEXT,
+                applied_at TIMESTAMPTZ NOT NULL
+            );
+        ''')
+        applied = self._applied_migrations(cursor) or set()
+
+        newly_applied = []
+        for version, description, statements in MIGRATIONS:
+            if version in applied:
+                continue
+            transactional = version not in NON_TRANSACTIONAL_MIGRATIONS
+            if transactional:
+                cursor.execute("BEGIN;")
+            try:
+                for statement in statements:
+                    cursor.execute(statement)
+                cursor.execute(
+                    "INSERT INTO schema_migrations (version, description, applied_at) VALUES (%s, %s, %s);",
+                    (version, description, datetime.datetime.now())
+                )
+                if transactional:
+                    cursor.execute("COMMIT;")
+            except Exception:
+                if transactional:
+                    cursor.execute("ROLLBACK;")
+                raise
+            newly_applied.append(version)
+        return newly_applied
+
+    def _applied_migrations(self, cursor):
+        """Returns the set of applied versions, or None if schema_migrations does not exist."""
+        cursor.execute("SELECT to_regclass('schema_migrations');")
+        if cursor.fetchone()[0] is None:
+            return None
+        cursor.execute("SELECT version FROM schema_migrations;")
+        return {row[0] for row in cursor.fetchall()}
 
     def add_winner(self, user_id, username, game_name, host_id, host_name, guild_id):
         """Adds a single winner to the global_winners table."""
         try:
-            conn = self._get_connection()
-            if conn is None: return False
+            with self._connection() as conn:
+                if conn is None: return False
 
-            with conn.cursor() as cursor:
-                cursor.execute('''
-                    INSERT INTO global_winners 
-                    (user_id, username, game_name, host_id, host_name, timestamp, guild_id)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s);
-                ''', (str(user_id), username, game_name, str(host_id), host_name, datetime.datetime.now(), str(guild_id)))
-            conn.commit()
-            conn.close()
+                with conn.cursor() as cursor:
+                    cursor.execute('''
+                        INSERT INTO global_winners
+                        (user_id, username, game_name, host_id, host_name, timestamp, guild_id)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s);
+                    ''', (str(user_id), username, game_name, str(host_id), host_name, datetime.datetime.now(), str(guild_id)))
+                conn.commit()
             return True
         except Exception as e:
             print(f"Database error adding winner: {e}")
@@ -111,27 +395,26 @@ class DatabaseManager:
         Returns a list of dictionaries.
         """
         try:
-            conn = self._get_connection()
-            if conn is None: return []
-
             sql_query = """
                 SELECT user_id, username, game_name, host_id, host_name, timestamp
                 FROM global_winners
                 WHERE guild_id = %s
             """
             params = [str(guild_id)]
-            
+
             if game_name:
                 sql_query += " AND game_name = %s"
                 params.append(game_name)
 
             sql_query += " ORDER BY timestamp DESC LIMIT %s;"
             params.append(limit)
-            
-            with conn.cursor() as cursor:
-                cursor.execute(sql_query, tuple(params))
-                rows = cursor.fetchall()
-            conn.close()
+
+            with self._connection() as conn:
+                if conn is None: return []
+
+                with conn.cursor() as cursor:
+                    cursor.execute(sql_query, tuple(params))
+                    rows = cursor.fetchall()
 
             winners = []
             for row in rows:
@@ -151,64 +434,89 @@ class DatabaseManager:
     def clear_leaderboard_for_guild(self, guild_id, game_name=None):
         """Deletes winner records for a specific guild and an optional game."""
         try:
-            conn = self._get_connection()
-            if conn is None: return False
-
             sql_query = "DELETE FROM global_winners WHERE guild_id = %s"
             params = [str(guild_id)]
-            
+
             if game_name:
                 sql_query += " AND game_name = %s"
                 params.append(game_name)
-            
-            with conn.cursor() as cursor:
-                cursor.execute(sql_query, tuple(params))
-            conn.commit()
-            conn.close()
+
+            with self._connection() as conn:
+                if conn is None: return False
+
+                with conn.cursor() as cursor:
+                    cursor.execute(sql_query, tuple(params))
+                conn.commit()
             return True
         except Exception as e:
             print(f"Database error clearing leaderboard: {e}")
             return False
-            
+
     def update_user_stats(self, user_id, guild_id, game_name, wins=0, losses=0):
         """
         Inserts or updates a user's win/loss stats for a specific game on a specific guild.
         """
         try:
-            conn = self._get_connection()
-            if conn is None: return False
-            
-            with conn.cursor() as cursor:
-                cursor.execute('''
-                    INSERT INTO user_stats (user_id, guild_id, game_name, wins, losses, last_played)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                    ON CONFLICT (user_id, guild_id, game_name) DO UPDATE 
-                    SET 
-                        wins = user_stats.wins + EXCLUDED.wins, 
-                        losses = user_stats.losses + EXCLUDED.losses,
-                        last_played = EXCLUDED.last_played;
-                ''', (str(user_id), str(guild_id), game_name, wins, losses, datetime.datetime.now()))
-            conn.commit()
-            conn.close()
+            with self._connection() as conn:
+                if conn is None: return False
+
+                with conn.cursor() as cursor:
+                    cursor.execute('''
+                        INSERT INTO user_stats (user_id, guild_id, game_name, wins, losses, last_played)
+                        VALUES (%s, %s, %s, %s, %s, %s)
+                        ON CONFLICT (user_id, guild_id, game_name) DO UPDATE
+                        SET
+                            wins = user_stats.wins + EXCLUDED.wins,
+                            losses = user_stats.losses + EXCLUDED.losses,
+                            last_played = EXCLUDED.last_played;
+                    ''', (str(user_id), str(guild_id), game_name, wins, losses, datetime.datetime.now()))
+                conn.commit()
             return True
         except Exception as e:
             print(f"Database error updating stats: {e}")
             return False
 
+    def update_user_stats_batch(self, rows):
+        """
+        Applies many stat increments in a single multi-row upsert.
+        rows is a list of (user_id, guild_id, game_name, wins, losses, last_played)
+        tuples with at most one row per (user_id, guild_id, game_name).
+        """
+        if not rows:
+            return True
+        try:
+            with self._connection() as conn:
+                if conn is None: return False
+
+                with conn.cursor() as cursor:
+                    execute_values(cursor, '''
+                        INSERT INTO user_stats (user_id, guild_id, game_name, wins, losses, last_played)
+                        VALUES %s
+                        ON CONFLICT (user_id, guild_id, game_name) DO UPDATE
+                        SET
+                            wins = user_stats.wins + EXCLUDED.wins,
+                            losses = user_stats.losses + EXCLUDED.losses,
+                            last_played = GREATEST(user_stats.last_played, EXCLUDED.last_played);
+                    ''', [(str(u), str(g), game, w, l, ts) for u, g, game, w, l, ts in rows], page_size=len(rows))
+                conn.commit()
+            return True
+        except Exception as e:
+            print(f"Database error updating stats in batch: {e}")
+            return False
+
     def get_user_stats(self, user_id, guild_id, game_name):
         """Fetches a user's stats for a specific game on a specific guild."""
         try:
-            conn = self._get_connection()
-            if conn is None: return None
+            with self._connection() as conn:
+                if conn is None: return None
 
-            with conn.cursor() as cursor:
-                cursor.execute('''
-                    SELECT wins, losses, last_played FROM user_stats
-                    WHERE user_id = %s AND guild_id = %s AND game_name = %s;
-                ''', (str(user_id), str(guild_id), game_name))
-                
-                result = cursor.fetchone()
-            conn.close()
+                with conn.cursor() as cursor:
+                    cursor.execute('''
+                        SELECT wins, losses, last_played FROM user_stats
+                        WHERE user_id = %s AND guild_id = %s AND game_name = %s;
+                    ''', (str(user_id), str(guild_id), game_name))
+
+                    result = cursor.fetchone()
 
             if result:
                 return {
@@ -221,55 +529,662 @@ class DatabaseManager:
             print(f"Database error fetching stats: {e}")
             return None
 
-    def update_server_settings(self, guild_id, allowed_roles):
+    def update_server_settings(self, guild_id, allowed_roles, allowed_role_ids=None):
         """
         Inserts or updates server-specific settings.
         """
         try:
-            conn = self._get_connection()
-            if conn is None: return False
-            
-            settings_json = json.dumps({'allowed_roles': allowed_roles})
+            settings_json = json.dumps(_server_settings(allowed_roles, allowed_role_ids))
+
+            with self._connection() as conn:
+                if conn is None: return False
+
+                with conn.cursor() as cursor:
+                    cursor.execute('''
+                        INSERT INTO server_settings (guild_id, allowed_roles)
+                        VALUES (%s, %s)
+                        ON CONFLICT (guild_id) DO UPDATE
+                        SET allowed_roles = EXCLUDED.allowed_roles;
+                    ''', (str(guild_id), settings_json))
+                conn.commit()
+            return True
+        except Exception as e:
+            print(f"Database error updating server settings: {e}")
+            return False
+
+    def get_server_settings(self, guild_id):
+        """
+        Fetches server-specific settings: {} if the guild has none, None if
+        the database could not be read.
+        """
+        try:
+            with self._connection() as conn:
+                if conn is None: return None
+
+                with conn.cursor() as cursor:
+                    cursor.execute('''
+                        SELECT allowed_roles FROM server_settings
+                        WHERE guild_id = %s;
+                    ''', (str(guild_id),))
 
-            with conn.cursor() as cursor:
-                cursor.execute('''
+                    result = cursor.fetchone()
+
+            if result:
+                return json.loads(result[0])
+            return {}
+        except Exception as e:
+            print(f"Database error fetching server settings: {e}")
+            return None
+
+    def get_leaderboard_messages(self):
+        """
+        Returns {channel_id: (message_id, content_hash)} for every channel with a
+        leaderboard message. content_hash is None until the message is rendered.
+        """
+        try:
+            with self._connection() as conn:
+                if conn is None: return None
+
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT channel_id, message_id, content_hash FROM leaderboard_messages;")
+                    rows = cursor.fetchall()
+
+            return {channel_id: (int(message_id), content_hash) for channel_id, message_id, content_hash in rows}
+        except Exception as e:
+            print(f"Database error fetching leaderboard messages: {e}")
+            return None
+
+    def set_leaderboard_messages(self, rows):
+        """
+        Stores many leaderboard message pointers in a single multi-row upsert.
+        rows is a list of (channel_id, message_id, content_hash) tuples, one per channel.
+        """
+        if not rows:
+            return True
+        try:
+            now = datetime.datetime.now()
+            with self._connection() as conn:
+                if conn is None: return False
+
+                with conn.cursor() as cursor:
+                    execute_values(cursor, '''
+                        INSERT INTO leaderboard_messages (channel_id, message_id, content_hash, updated_at)
+                        VALUES %s
+                        ON CONFLICT (channel_id) DO UPDATE
+                        SET
+                            message_id = EXCLUDED.message_id,
+                            content_hash = EXCLUDED.content_hash,
+                            updated_at = EXCLUDED.updated_at;
+                    ''', [(str(c), str(m), h, now) for c, m, h in rows], page_size=len(rows))
+                conn.commit()
+            return True
+        except Exception as e:
+            print(f"Database error storing leaderboard messages: {e}")
+            return False
+
+    def get_game_sessions(self, game):
+        """Returns the checkpointed states of every running `game`, as dictionaries."""
+        try:
+            with self._connection() as conn:
+                if conn is None: return None
+
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT state FROM game_sessions WHERE game = %s;", (game,))
+                    rows = cursor.fetchall()
+
+            return [json.loads(row[0]) for row in rows]
+        except Exception as e:
+            print(f"Database error fetching game sessions: {e}")
+            return None
+
+    def save_game_sessions(self, saved, deleted=()):
+        """
+        Applies checkpoint changes in one transaction. saved is a list of
+        (game, key, state) tuples to upsert and deleted a list of (game, key).
+        """
+        if not saved and not deleted:
+            return True
+        try:
+            now = datetime.datetime.now()
+            with self._connection() as conn:
+                if conn is None: return False
+
+                with conn.cursor() as cursor:
+                    if saved:
+                        execute_values(cursor, '''
+                            INSERT INTO game_sessions (game, session_key, state, updated_at)
+                            VALUES %s
+                            ON CONFLICT (game, session_key) DO UPDATE
+                            SET
+                                state = EXCLUDED.state,
+                                updated_at = EXCLUDED.updated_at;
+                        ''', [(g, str(k), json.dumps(state), now) for g, k, state in saved], page_size=len(saved))
+                    if deleted:
+                        execute_values(cursor, '''
+                            DELETE FROM game_sessions
+                            WHERE (game, session_key) IN (VALUES %s);
+                        ''', [(g, str(k)) for g, k in deleted], page_size=len(deleted))
+                conn.commit()
+            return True
+        except Exception as e:
+            print(f"Database error saving game sessions: {e}")
+            return False
+
+
+class SQLiteDatabaseManager:
+    """
+    Embedded SQLite backend with the same API as DatabaseManager, for small
+    deployments that do not want a network round-trip per query.
+
+    The database runs in WAL mode so readers never block the writer. All writes
+    go through one writer connection guarded by a lock; reads borrow one of
+    SQLITE_READERS read-only connections. Each connection keeps its own cache
+    of prepared statements.
+    """
+
+    def __init__(self, path=SQLITE_PATH, readers=SQLITE_READERS, acquire_timeout=DB_POOL_ACQUIRE_TIMEOUT):
+        self.path = path
+        self.acquire_timeout = acquire_timeout
+        # One writer plus the readers; AsyncDatabaseManager sizes its executor from this
+        self.max_size = readers + 1
+        self._writer_conn = self._connect()
+        self._writer_lock = threading.Lock()
+        self._readers = queue.Queue()
+        for _ in range(readers):
+            conn = self._connect()
+            conn.execute("PRAGMA query_only = ON;")
+            self._readers.put(conn)
+
+    def _connect(self):
+        # isolation_level=None: transactions are opened explicitly in _writer()
+        conn = sqlite3.connect(
+            self.path, timeout=self.acquire_timeout, isolation_level=None,
+            check_same_thread=False, cached_statements=256
+        )
+        conn.execute("PRAGMA journal_mode = WAL;")
+        conn.execute("PRAGMA synchronous = NORMAL;")
+        return conn
+
+    @contextmanager
+    def _writer(self):
+        """Yields the writer connection inside an IMMEDIATE transaction."""
+        if not self._writer_lock.acquire(timeout=self.acquire_timeout):
+            raise TimeoutError(f"writer connection busy for {self.acquire_timeout}s")
+        try:
+            self._writer_conn.execute("BEGIN IMMEDIATE;")
+            try:
+                yield self._writer_conn
+            except Exception:
+                self._writer_conn.execute("ROLLBACK;")
+                raise
+            self._writer_conn.execute("COMMIT;")
+        finally:
+            self._writer_lock.release()
+
+    @contextmanager
+    def _reader(self):
+        """Borrows a read-only connection, waiting at most acquire_timeout seconds."""
+        try:
+            conn = self._readers.get(timeout=self.acquire_timeout)
+        except queue.Empty:
+            raise TimeoutError(f"no free reader connection after {self.acquire_timeout}s")
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+
+    def close(self):
+        """Closes the writer and every reader connection."""
+        with self._writer_lock:
+            self._writer_conn.close()
+        while not self._readers.empty():
+            self._readers.get_nowait().close()
+
+    def migrate(self):
+        """
+        Applies pending SQLITE_MIGRATIONS, recording them in schema_migrations.
+        Returns the list of versions that were applied.
+        """
+        try:
+            with self._writer() as conn:
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS schema_migrations (
+                        version INTEGER PRIMARY KEY,
+                        description TEXT,
+                        applied_at TEXT NOT NULL
+                    );
+                ''')
+                applied = {row[0] for row in conn.execute("SELECT version FROM schema_migrations;")}
+
+                newly_applied = []
+                for version, description, statements in SQLITE_MIGRATIONS:
+                    if version in applied:
+                        continue
+                    for statement in statements:
+                        conn.execute(statement)
+                    conn.execute(
+                        "INSERT INTO schema_migrations (version, description, applied_at) VALUES (?, ?, ?);",
+                        (version, description, _now_iso())
+                    )
+                    newly_applied.append(version)
+
+            if newly_applied:
+                print(f"Applied database migrations: {newly_applied}")
+            return newly_applied
+        except Exception as e:
+            print(f"Error running migrations: {e}")
+            return []
+
+    def add_winner(self, user_id, username, game_name, host_id, host_name, guild_id):
+        """Adds a single winner to the global_winners table."""
+        try:
+            with self._writer() as conn:
+                conn.execute('''
+                    INSERT INTO global_winners
+                    (user_id, username, game_name, host_id, host_name, timestamp, guild_id)
+                    VALUES (?, ?, ?, ?, ?, ?, ?);
+                ''', (str(user_id), username, game_name, str(host_id), host_name, _now_iso(), str(guild_id)))
+            return True
+        except Exception as e:
+            print(f"Database error adding winner: {e}")
+            return False
+
+    def get_recent_winners_for_guild(self, guild_id, game_name=None, limit=10):
+        """
+        Fetches the most recent winners for a specific guild and an optional game.
+        Returns a list of dictionaries.
+        """
+        try:
+            sql_query = """
+                SELECT user_id, username, game_name, host_id, host_name, timestamp
+                FROM global_winners
+                WHERE guild_id = ?
+            """
+            params = [str(guild_id)]
+
+            if game_name:
+                sql_query += " AND game_name = ?"
+                params.append(game_name)
+
+            sql_query += " ORDER BY timestamp DESC LIMIT ?;"
+            params.append(limit)
+
+            with self._reader() as conn:
+                rows = conn.execute(sql_query, tuple(params)).fetchall()
+
+            winners = []
+            for row in rows:
+                winners.append({
+                    'user_id': row[0],
+                    'username': row[1],
+                    'game_name': row[2],
+                    'host_id': row[3],
+                    'host_name': row[4],
+                    'timestamp': datetime.datetime.fromisoformat(row[5]).strftime("%b %d, %Y %I:%M %p")
+                })
+            return winners
+        except Exception as e:
+            print(f"Database error fetching winners: {e}")
+            return []
+
+    def clear_leaderboard_for_guild(self, guild_id, game_name=None):
+        """Deletes winner records for a specific guild and an optional game."""
+        try:
+            sql_query = "DELETE FROM global_winners WHERE guild_id = ?"
+            params = [str(guild_id)]
+
+            if game_name:
+                sql_query += " AND game_name = ?"
+                params.append(game_name)
+
+            with self._writer() as conn:
+                conn.execute(sql_query, tuple(params))
+            return True
+        except Exception as e:
+            print(f"Database error clearing leaderboard: {e}")
+            return False
+
+    def update_user_stats(self, user_id, guild_id, game_name, wins=0, losses=0):
+        """
+        Inserts or updates a user's win/loss stats for a specific game on a specific guild.
+        """
+        return self.update_user_stats_batch([(user_id, guild_id, game_name, wins, losses, datetime.datetime.now())])
+
+    def update_user_stats_batch(self, rows):
+        """
+        Applies many stat increments in one transaction.
+        rows is a list of (user_id, guild_id, game_name, wins, losses, last_played) tuples.
+        """
+        if not rows:
+            return True
+        try:
+            with self._writer() as conn:
+                conn.executemany('''
+                    INSERT INTO user_stats (user_id, guild_id, game_name, wins, losses, last_played)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (user_id, guild_id, game_name) DO UPDATE
+                    SET
+                        wins = user_stats.wins + excluded.wins,
+                        losses = user_stats.losses + excluded.losses,
+                        last_played = MAX(user_stats.last_played, excluded.last_played);
+                ''', [(str(u), str(g), game, w, l, ts.isoformat(timespec='microseconds')) for u, g, game, w, l, ts in rows])
+            return True
+        except Exception as e:
+            print(f"Database error updating stats in batch: {e}")
+            return False
+
+    def get_user_stats(self, user_id, guild_id, game_name):
+        """Fetches a user's stats for a specific game on a specific guild."""
+        try:
+            with self._reader() as conn:
+                result = conn.execute('''
+                    SELECT wins, losses, last_played FROM user_stats
+                    WHERE user_id = ? AND guild_id = ? AND game_name = ?;
+                ''', (str(user_id), str(guild_id), game_name)).fetchone()
+
+            if result:
+                return {
+                    'wins': result[0],
+                    'losses': result[1],
+                    'last_played': datetime.datetime.fromisoformat(result[2]).strftime("%b %d, %Y %I:%M %p")
+                }
+            return None
+        except Exception as e:
+            print(f"Database error fetching stats: {e}")
+            return None
+
+    def update_server_settings(self, guild_id, allowed_roles, allowed_role_ids=None):
+        """
+        Inserts or updates server-specific settings.
+        """
+        try:
+            settings_json = json.dumps(_server_settings(allowed_roles, allowed_role_ids))
+
+            with self._writer() as conn:
+                conn.execute('''
                     INSERT INTO server_settings (guild_id, allowed_roles)
-                    VALUES (%s, %s)
-                    ON CONFLICT (guild_id) DO UPDATE 
-                    SET allowed_roles = EXCLUDED.allowed_roles;
+                    VALUES (?, ?)
+                    ON CONFLICT (guild_id) DO UPDATE
+                    SET allowed_roles = excluded.allowed_roles;
                 ''', (str(guild_id), settings_json))
-            conn.commit()
-            conn.close()
             return True
         except Exception as e:
             print(f"Database error updating server settings: {e}")
             return False
-    
+
     def get_server_settings(self, guild_id):
         """
-        Fetches server-specific settings.
+        Fetches server-specific settings: {} if the guild has none, None if
+        the database could not be read.
         """
         try:
-            conn = self._get_connection()
-            if conn is None: return None
-
-            with conn.cursor() as cursor:
-                cursor.execute('''
+            with self._reader() as conn:
+                result = conn.execute('''
                     SELECT allowed_roles FROM server_settings
-                    WHERE guild_id = %s;
-                ''', (str(guild_id),))
-                
-                result = cursor.fetchone()
-            conn.close()
+                    WHERE guild_id = ?;
+                ''', (str(guild_id),)).fetchone()
 
             if result:
                 return json.loads(result[0])
-            return None
+            return {}
         except Exception as e:
             print(f"Database error fetching server settings: {e}")
             return None
-            
+
+    def get_leaderboard_messages(self):
+        """
+        Returns {channel_id: (message_id, content_hash)} for every channel with a
+        leaderboard message. content_hash is None until the message is rendered.
+        """
+        try:
+            with self._reader() as conn:
+                rows = conn.execute("SELECT channel_id, message_id, content_hash FROM leaderboard_messages;").fetchall()
+            return {channel_id: (int(message_id), content_hash) for channel_id, message_id, content_hash in rows}
+        except Exception as e:
+            print(f"Database error fetching leaderboard messages: {e}")
+            return None
+
+    def set_leaderboard_messages(self, rows):
+        """
+        Stores many leaderboard message pointers in one transaction.
+        rows is a list of (channel_id, message_id, content_hash) tuples, one per channel.
+        """
+        if not rows:
+            return True
+        try:
+            now = _now_iso()
+            with self._writer() as conn:
+                conn.executemany('''
+                    INSERT INTO leaderboard_messages (channel_id, message_id, content_hash, updated_at)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT (channel_id) DO UPDATE
+                    SET
+                        message_id = excluded.message_id,
+                        content_hash = excluded.content_hash,
+                        updated_at = excluded.updated_at;
+                ''', [(str(c), str(m), h, now) for c, m, h in rows])
+            return True
+        except Exception as e:
+            print(f"Database error storing leaderboard messages: {e}")
+            return False
+
+    def get_game_sessions(self, game):
+        """Returns the checkpointed states of every running `game`, as dictionaries."""
+        try:
+            with self._reader() as conn:
+                rows = conn.execute("SELECT state FROM game_sessions WHERE game = ?;", (game,)).fetchall()
+            return [json.loads(row[0]) for row in rows]
+        except Exception as e:
+            print(f"Database error fetching game sessions: {e}")
+            return None
+
+    def save_game_sessions(self, saved, deleted=()):
+        """
+        Applies checkpoint changes in one transaction. saved is a list of
+        (game, key, state) tuples to upsert and deleted a list of (game, key).
+        """
+        if not saved and not deleted:
+            return True
+        try:
+            now = _now_iso()
+            with self._writer() as conn:
+                conn.executemany('''
+                    INSERT INTO game_sessions (game, session_key, state, updated_at)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT (game, session_key) DO UPDATE
+                    SET
+                        state = excluded.state,
+                        updated_at = excluded.updated_at;
+                ''', [(g, str(k), json.dumps(state), now) for g, k, state in saved])
+                conn.executemany(
+                    "DELETE FROM game_sessions WHERE game = ? AND session_key = ?;",
+                    [(g, str(k)) for g, k in deleted]
+                )
+            return True
+        except Exception as e:
+            print(f"Database error saving game sessions: {e}")
+            return False
+
+
+def _server_settings(allowed_roles, allowed_role_ids=None):
+    settings = {'allowed_roles': allowed_roles}
+    if allowed_role_ids is not None:
+        # Stored as strings like every other Discord ID in the database
+        settings['allowed_role_ids'] = [str(role_id) for role_id in allowed_role_ids]
+    return settings
+
+
+def _now_iso():
+    # Fixed-width ISO timestamps so SQLite's text ordering matches time ordering
+    return datetime.datetime.now().isoformat(timespec='microseconds')
+
+
+def create_database_manager():
+    """Builds the storage backend selected by DATABASE_BACKEND ('postgres' or 'sqlite')."""
+    if DATABASE_BACKEND == 'sqlite':
+        return SQLiteDatabaseManager()
+    if DATABASE_BACKEND != 'postgres':
+        print(f"Unknown DATABASE_BACKEND '{DATABASE_BACKEND}', falling back to postgres.")
+    return DatabaseManager()
+
+
+class StatsWriteBuffer:
+    """
+    Write-behind buffer for user_stats increments. Wins and losses are merged
+    in memory per (user_id, guild_id, game_name) and written as one multi-row
+    upsert on a timer, when the buffer reaches max_pending rows, or on close().
+    """
+
+    def __init__(self, db, flush_interval=STATS_FLUSH_INTERVAL, max_pending=STATS_FLUSH_MAX_PENDING):
+        self.db = db
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending = {}
+        self._timer_task = None
+        self._flush_task = None
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(self, user_id, guild_id, game_name, wins=0, losses=0):
+        """Queues an increment. Must be called from the event loop."""
+        key = (str(user_id), str(guild_id), game_name)
+        entry = self._pending.get(key)
+        if entry is None:
+            self._pending[key] = [wins, losses, datetime.datetime.now()]
+        else:
+            entry[0] += wins
+            entry[1] += losses
+            entry[2] = datetime.datetime.now()
+
+        if self._timer_task is None or self._timer_task.done():
+            self._timer_task = asyncio.get_running_loop().create_task(self._flush_periodically())
+        if len(self._pending) >= self.max_pending and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.get_running_loop().create_task(self.flush())
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if self._flush_task is None or self._flush_task.done():
+                self._flush_task = asyncio.get_running_loop().create_task(self.flush())
+            # Shielded: close() cancels this loop, but must not cancel a write
+            # whose rows have already been taken out of _pending
+            await asyncio.shield(self._flush_task)
+
+    async def flush(self):
+        """Writes every pending increment in one round-trip."""
+        if not self._pending:
+            return True
+
+        pending, self._pending = self._pending, {}
+        rows = [(u, g, game, w, l, ts) for (u, g, game), (w, l, ts) in pending.items()]
+        written = await self.db._run(self.db.manager.update_user_stats_batch, rows)
+        if not written:
+            # Put the increments back so the next flush retries them
+            for key, (w, l, ts) in pending.items():
+                entry = self._pending.setdefault(key, [0, 0, ts])
+                entry[0] += w
+                entry[1] += l
+                entry[2] = max(entry[2], ts)
+        return written
+
+    async def close(self):
+        """Stops the timer and flushes whatever is still buffered."""
+        if self._timer_task is not None:
+            self._timer_task.cancel()
+            self._timer_task = None
+        if self._flush_task is not None and not self._flush_task.done():
+            await self._flush_task
+        await self.flush()
+
+
+class AsyncDatabaseManager:
+    """
+    Awaitable front-end for DatabaseManager or SQLiteDatabaseManager. Every
+    query is handed to a small thread pool (one worker per pooled connection)
+    so a slow database round-trip never blocks the discord.py event loop.
+    """
+
+    def __init__(self, manager=None, settings_cache=None):
+        self.manager = manager or create_database_manager()
+        self._executor = ThreadPoolExecutor(max_workers=self.manager.max_size, thread_name_prefix="db")
+        self.stats_buffer = StatsWriteBuffer(self)
+        self.settings_cache = settings_cache if settings_cache is not None else server_settings_cache
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def migrate(self):
+        return await self._run(self.manager.migrate)
+
+    async def add_winner(self, user_id, username, game_name, host_id, host_name, guild_id):
+        return await self._run(self.manager.add_winner, user_id, username, game_name, host_id, host_name, guild_id)
+
+    async def get_recent_winners_for_guild(self, guild_id, game_name=None, limit=10):
+        return await self._run(self.manager.get_recent_winners_for_guild, guild_id, game_name=game_name, limit=limit)
+
+    async def clear_leaderboard_for_guild(self, guild_id, game_name=None):
+        return await self._run(self.manager.clear_leaderboard_for_guild, guild_id, game_name=game_name)
+
+    async def update_user_stats(self, user_id, guild_id, game_name, wins=0, losses=0):
+        return await self._run(self.manager.update_user_stats, user_id, guild_id, game_name, wins=wins, losses=losses)
+
+    def record_user_stats(self, user_id, guild_id, game_name, wins=0, losses=0):
+        """Buffers a stat increment; it is written by the next batched flush."""
+        self.stats_buffer.add(user_id, guild_id, game_name, wins=wins, losses=losses)
+
+    async def get_user_stats(self, user_id, guild_id, game_name):
+        await self.stats_buffer.flush()
+        return await self._run(self.manager.get_user_stats, user_id, guild_id, game_name)
+
+    async def update_server_settings(self, guild_id, allowed_roles, allowed_role_ids=None):
+        updated = await self._run(self.manager.update_server_settings, guild_id, allowed_roles, allowed_role_ids)
+        # Write-through so the next permission check sees the new roles
+        if updated:
+            self.settings_cache.set(str(guild_id), _server_settings(allowed_roles, allowed_role_ids))
+        else:
+            self.settings_cache.invalidate(str(guild_id))
+        return updated
+
+    async def get_server_settings(self, guild_id):
+        """
+        Returns the guild's settings from the cache, querying the database on
+        a miss. A guild without settings gets {} and is cached like any other;
+        None means the query failed and is not cached.
+        """
+        settings = self.settings_cache.get(str(guild_id), None)
+        if settings is not None:
+            return settings
+
+        settings = await self._run(self.manager.get_server_settings, guild_id)
+        if settings is not None:
+            self.settings_cache.set(str(guild_id), settings)
+        return settings
+
+    async def get_leaderboard_messages(self):
+        return await self._run(self.manager.get_leaderboard_messages)
+
+    async def set_leaderboard_messages(self, rows):
+        return await self._run(self.manager.set_leaderboard_messages, rows)
+
+    async def get_game_sessions(self, game):
+        return await self._run(self.manager.get_game_sessions, game)
+
+    async def save_game_sessions(self, saved, deleted=()):
+        return await self._run(self.manager.save_game_sessions, saved, deleted)
+
+    async def close(self):
+        """Flushes buffered stats, waits for in-flight queries, then closes the pool."""
+        await self.stats_buffer.close()
+        await asyncio.get_running_loop().run_in_executor(None, functools.partial(self._executor.shutdown, wait=True))
+        self.manager.close()
+
+
 if __name__ == '__main__':
     # This block will be executed if you run the file directly
-    db_manager = DatabaseManager()
-    print("Database manager initialized. Tables are being created/checked.")
\ No newline at end of file
+    db_manager = create_database_manager()
+    print("Database manager initialized. Running schema migrations...")
+    db_manager.migrate()
+    db_manager.close()
+
@@ -0,0 +1,47 @@
+import json
+
+import pytest
+
+from Utilities.AnswerMatcher import AnswerMatcher, normalize_answer
+from Utilities.ContentPack import PackedBank, build
+from Utilities.ContentStore import parse_answers
+
+
+def test_typos_are_accepted():
+    assert AnswerMatcher("Mount Everest").matches(normalize_answer("mount everst"))
+    assert AnswerMatcher("elephant").matches(normalize_answer("elephnt"))
+    assert AnswerMatcher("New Delhi").matches(normalize_answer("NewDelhi"))
+
+
+@pytest.mark.parametrize("answer, guess", [
+    ("north america", "South America"),
+    ("heptagon", "Pentagon"),
+    ("right", "Eight"),
+    ("lime", "Lima"),
+    ("cat", "chat"),
+    ("car", "card"),
+    ("clock", "lock"),
+])
+def test_other_words_are_not_typos(answer, guess):
+    assert not AnswerMatcher(answer).matches(normalize_answer(guess))
+
+
+def test_another_answer_in_the_bank_is_not_a_typo():
+    items = parse_answers([{"answer": "Tiger"}, {"answer": "Tiber"}])
+    assert not items[0]["matcher"].matches("tiber")
+    assert items[0]["matcher"].matches("tigar")
+
+
+@pytest.mark.parametrize("packed", [False, True])
+@pytest.mark.parametrize("path", ["Data/trivia_questions.json", "Data/emoji_clues.json"])
+def test_no_answer_fuzzily_matches_another_in_its_bank(path, packed, tmp_path):
+    with open(path, encoding="utf-8") as f:
+        items = parse_answers(json.load(f))
+    if packed:
+        items = PackedBank(build(items, path, str(tmp_path / "bank.pack")))
+    for item in items:
+        matcher = item["matcher"]
+        for other in items:
+            guess = normalize_answer(other["answer"])
+            if guess.replace(" ", "") not in matcher.accepted:
+                assert not matcher.matches(guess), (item["answer"], other["answer"])
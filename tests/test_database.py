@@ -0,0 +1,167 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from database import MIGRATIONS, SQLITE_MIGRATIONS, AsyncDatabaseManager, DatabaseManager, StatsWriteBuffer
+
+
+class SlowStatsManager:
+    """Stands in for a database manager whose first stats write is slow and fails."""
+    max_size = 2
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.batches = []
+
+    def update_user_stats_batch(self, rows):
+        self.started.set()
+        time.sleep(0.1)
+        if not self.batches:
+            self.batches.append(None)
+            return False
+        self.batches.append(rows)
+        return True
+
+    def close(self):
+        pass
+
+
+def test_close_during_a_timed_flush_keeps_its_rows():
+    manager = SlowStatsManager()
+
+    async def run():
+        db = AsyncDatabaseManager(manager)
+        db.stats_buffer = StatsWriteBuffer(db, flush_interval=0.01)
+        db.stats_buffer.add("1", "5", "Trivia", wins=1)
+        await asyncio.get_running_loop().run_in_executor(None, manager.started.wait)
+        await db.close()
+
+    asyncio.run(run())
+    assert manager.batches[-1] is not None
+    assert [row[:5] for row in manager.batches[-1]] == [("1", "5", "Trivia", 1, 0)]
+
+
+class SlowManager:
+    """Stands in for a database manager whose every query blocks for 50 ms."""
+    max_size = 4
+
+    def get_recent_winners_for_guild(self, guild_id, game_name=None, limit=10):
+        time.sleep(0.05)
+        return []
+
+    def close(self):
+        pass
+
+
+def test_slow_queries_do_not_block_the_event_loop():
+    async def run():
+        db = AsyncDatabaseManager(SlowManager())
+        loop = asyncio.get_running_loop()
+        worst = 0.0
+
+        async def measure():
+            nonlocal worst
+            # Each tick should wake within a few ms of its deadline
+            for _ in range(40):
+                start = loop.time()
+                await asyncio.sleep(0.005)
+                worst = max(worst, loop.time() - start - 0.005)
+
+        ticks = asyncio.ensure_future(measure())
+        await asyncio.sleep(0)
+        await asyncio.gather(*(db.get_recent_winners_for_guild(5) for _ in range(8)))
+        await ticks
+        await db.close()
+        return worst
+
+    # Eight 50 ms queries run on the loop would stall it for 400 ms
+    assert asyncio.run(run()) < 0.04
+
+
+class RecordingConnection:
+    """Records what a Postgres migrate() runs, and whether each statement ran in a transaction."""
+
+    def __init__(self):
+        self.autocommit = False
+        self.executed = []
+        self.in_transaction = False
+        self.closed = False
+
+    def cursor(self):
+        return RecordingCursor(self)
+
+    def rollback(self):
+        pass
+
+
+class RecordingCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self._result = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, statement, params=None):
+        statement = " ".join(statement.split())
+        if statement == "BEGIN;":
+            self.conn.in_transaction = True
+        elif statement in ("COMMIT;", "ROLLBACK;"):
+            self.conn.in_transaction = False
+        else:
+            self.conn.executed.append((statement, self.conn.in_transaction or not self.conn.autocommit))
+        self._result = [(None,)] if "to_regclass" in statement else []
+
+    def fetchone(self):
+        return self._result[0]
+
+    def fetchall(self):
+        return self._result
+
+
+def test_postgres_indexes_are_built_concurrently_outside_a_transaction():
+    conn = RecordingConnection()
+    manager = DatabaseManager()
+    manager._connection = contextmanager(lambda: (yield conn))
+
+    assert manager.migrate() == [version for version, _, _ in MIGRATIONS]
+    concurrent = [(statement, in_transaction) for statement, in_transaction in conn.executed if "CONCURRENTLY" in statement]
+    assert len(concurrent) == 2
+    assert not any(in_transaction for _, in_transaction in concurrent)
+    transactional = {" ".join(statement.split()) for version, _, statements in MIGRATIONS if version != 2 for statement in statements}
+    assert all(in_transaction for statement, in_transaction in conn.executed if statement in transactional)
+    assert len([statement for statement, _ in conn.executed if statement in transactional]) == len(transactional)
+    assert not conn.autocommit
+
+
+LEADERBOARD_QUERIES = {
+    "idx_global_winners_guild_ts": "SELECT user_id, username, game_name, host_id, host_name, timestamp FROM global_winners WHERE guild_id = ? ORDER BY timestamp DESC LIMIT 10;",
+    "idx_global_winners_guild_game_ts": "SELECT user_id, username, game_name, host_id, host_name, timestamp FROM global_winners WHERE guild_id = ? AND game_name = ? ORDER BY timestamp DESC LIMIT 10;",
+}
+
+
+def query_plans(conn):
+    plans = {}
+    for index, query in LEADERBOARD_QUERIES.items():
+        params = ("5", "Trivia")[:query.count("?")]
+        plans[index] = " | ".join(row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + query, params))
+    return plans
+
+
+def test_leaderboard_indexes_replace_the_scan_and_sort():
+    conn = sqlite3.connect(":memory:")
+    for version, _, statements in SQLITE_MIGRATIONS:
+        if version == 2:
+            before = query_plans(conn)
+        for statement in statements:
+            conn.execute(statement)
+    after = query_plans(conn)
+
+    for index in LEADERBOARD_QUERIES:
+        assert "TEMP B-TREE" in before[index], before[index]
+        assert index in after[index] and "TEMP B-TREE" not in after[index], after[index]
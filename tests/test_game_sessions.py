@@ -0,0 +1,98 @@
+import asyncio
+import importlib
+import types
+
+from database import AsyncDatabaseManager, SQLiteDatabaseManager
+from Utilities.GameSession import SessionRegistry
+from Utilities.GameStateStore import DatabaseGameStateStore
+
+
+class AllowAll:
+    async def is_configured(self, guild):
+        return True
+
+    async def can_host(self, member):
+        return True
+
+
+class FakeInteraction:
+    def __init__(self, guild_id, channel_id=7):
+        self.guild = types.SimpleNamespace(id=guild_id)
+        self.user = types.SimpleNamespace(id=9)
+        self.response = self
+        self.sent = []
+        self.channel = types.SimpleNamespace(id=channel_id, send=self.send_message)
+
+    async def send_message(self, content=None, **kwargs):
+        self.sent.append(content)
+
+
+def reset_then_restore(tmp_path, module, cog_class, game, command):
+    cog_module = importlib.import_module(module)
+
+    async def run():
+        db = AsyncDatabaseManager(SQLiteDatabaseManager(path=str(tmp_path / "test.db")))
+        await db.migrate()
+        try:
+            store = DatabaseGameStateStore(db)
+            sessions = SessionRegistry(store)
+            bot = types.SimpleNamespace(
+                db=db, sessions=sessions, content=None, outbox=None, permissions=AllowAll()
+            )
+            cog = getattr(cog_module, cog_class)(bot)
+            session = sessions.create(game, 5, guild_id=5, channel_id=7, host=types.SimpleNamespace(id=9))
+            session.wins["1"] = 3
+            sessions.checkpoint(session)
+            await getattr(cog_module, cog_class).__dict__[command].callback(cog, FakeInteraction(5))
+            await store.close()
+
+            # A new process reads the checkpoints back
+            return await DatabaseGameStateStore(db).restore(game)
+        finally:
+            await db.close()
+
+    return asyncio.run(run())
+
+
+def test_trivia_wins_reset_survives_a_restart(tmp_path):
+    [state] = reset_then_restore(tmp_path, "cogs.games.TRIVIA", "Trivia", "trivia", "resettriviawins")
+    assert state["wins"] == {}
+
+
+def test_scramble_wins_reset_survives_a_restart(tmp_path):
+    [state] = reset_then_restore(tmp_path, "cogs.games.scramble_words", "Scramble", "scramble", "resetscramblesec")
+    assert state["wins"] == {}
+
+
+def stop_running_game(monkeypatch, module, cog_class, game, command):
+    # These cogs read their channel ids from the environment at import
+    monkeypatch.setenv("LEADERBOARD_CHANNEL_ID", "1")
+    monkeypatch.setenv("PRIVATE_CHANNEL_ID", "2")
+    cog_module = importlib.import_module(module)
+
+    async def run():
+        sessions = SessionRegistry()
+        bot = types.SimpleNamespace(
+            sessions=sessions, content=None, outbox=None, scheduler=None, permissions=AllowAll()
+        )
+        cog = getattr(cog_module, cog_class)(bot)
+        session = sessions.create(game, 7, guild_id=5, channel_id=7, host=types.SimpleNamespace(id=9))
+        session.task = asyncio.ensure_future(asyncio.sleep(3600))
+        interaction = FakeInteraction(5)
+        await getattr(cog_module, cog_class).__dict__[command].callback(cog, interaction)
+        await asyncio.sleep(0)
+        return interaction.sent, session.task.cancelled(), sessions.get(game, 7)
+
+    return asyncio.run(run())
+
+
+def test_stopping_lyrics_announces_the_end(monkeypatch):
+    sent, cancelled, session = stop_running_game(monkeypatch, "cogs.games.Lyrics_Guess", "Lyrics", "lyrics", "stoplyrics")
+    assert "ℹ️ Lyrics game session ended." in sent
+    assert cancelled and session is None
+
+
+def test_stopping_emoji_announces_the_end(monkeypatch):
+    sent, cancelled, session = stop_running_game(monkeypatch, "cogs.games.emoji_guess", "EmojiDecode", "emoji", "stopemoji")
+    assert "ℹ️ Emoji Decode game session ended." in sent
+    assert cancelled and session is None
@@ -0,0 +1,71 @@
+import asyncio
+import types
+
+from database import AsyncDatabaseManager, SQLiteDatabaseManager
+from Utilities.Leaderboard import Leaderboard
+
+
+def make_leaderboard(tmp_path):
+    db = AsyncDatabaseManager(SQLiteDatabaseManager(path=str(tmp_path / "test.db")))
+    return Leaderboard(types.SimpleNamespace(db=db)), db
+
+
+def test_record_winner_on_cold_guild_adds_each_winner_once(tmp_path):
+    async def run():
+        leaderboard, db = make_leaderboard(tmp_path)
+        await db.migrate()
+        try:
+            await leaderboard.record_winner("1", "a", "Trivia", "9", "host", guild_id=5)
+            first = [entry["username"] for entry in leaderboard.get_recent_winners(5)]
+            await leaderboard.record_winner("2", "b", "Trivia", "9", "host", guild_id=5)
+            second = [entry["username"] for entry in leaderboard.get_recent_winners(5)]
+            stored = [entry["username"] for entry in await db.get_recent_winners_for_guild(5)]
+        finally:
+            await db.close()
+        return first, second, stored
+
+    first, second, stored = asyncio.run(run())
+    assert first == ["a"]
+    assert second == ["b", "a"]
+    assert stored == ["b", "a"]
+
+
+class FakeChannel:
+    def __init__(self, channel_id, guild):
+        self.id = channel_id
+        self.guild = guild
+        self.sent = []
+
+    async def send(self, content=None, embed=None):
+        self.sent.append(embed)
+        return types.SimpleNamespace(id=len(self.sent))
+
+
+def test_flushed_display_shows_the_board_before_a_reset(tmp_path):
+    scheduled = []
+
+    def call_later(delay, callback, *args):
+        handle = types.SimpleNamespace(cancelled=False)
+        handle.cancel = lambda: setattr(handle, "cancelled", True)
+        scheduled.append(handle)
+        return handle
+
+    async def run():
+        leaderboard, db = make_leaderboard(tmp_path)
+        leaderboard.bot.scheduler = types.SimpleNamespace(call_later=call_later)
+        await db.migrate()
+        guild = types.SimpleNamespace(id=5, name="guild", get_member=lambda member_id: None)
+        channel = FakeChannel(7, guild)
+        try:
+            await leaderboard.record_winner("1", "a", "Trivia", "9", "host", guild_id=5)
+            await leaderboard.update_leaderboard_display(channel)
+            await leaderboard.flush_leaderboard_display(channel)
+            leaderboard.reset_leaderboard(5)
+            await leaderboard.cog_unload()
+        finally:
+            await db.close()
+        return channel.sent
+
+    sent = asyncio.run(run())
+    assert scheduled[0].cancelled
+    assert [field.name for field in sent[0].fields] == ["#1. **a**"]
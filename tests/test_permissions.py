@@ -0,0 +1,42 @@
+import asyncio
+import types
+
+from Utilities.Permissions import PermissionResolver
+
+
+class FakeDatabase:
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = 0
+
+    async def get_server_settings(self, guild_id):
+        self.calls += 1
+        return self.results.pop(0)
+
+
+def make_guild():
+    roles = [types.SimpleNamespace(id=1, name="Moderator"), types.SimpleNamespace(id=2, name="Host")]
+    return types.SimpleNamespace(id=5, roles=roles)
+
+
+def test_failed_settings_lookup_is_not_cached():
+    db = FakeDatabase(None, {"allowed_roles": ["Host"], "allowed_role_ids": ["2"]})
+    resolver = PermissionResolver(db)
+    guild = make_guild()
+
+    first = asyncio.run(resolver.roles(guild))
+    second = asyncio.run(resolver.roles(guild))
+
+    assert (first.role_ids, first.configured) == (frozenset({1}), False)
+    assert (second.role_ids, second.configured) == (frozenset({2}), True)
+    assert db.calls == 2
+
+
+def test_missing_settings_are_cached_as_not_configured():
+    db = FakeDatabase({})
+    resolver = PermissionResolver(db)
+    guild = make_guild()
+
+    assert not asyncio.run(resolver.is_configured(guild))
+    assert not asyncio.run(resolver.is_configured(guild))
+    assert db.calls == 1
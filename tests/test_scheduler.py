@@ -0,0 +1,31 @@
+import asyncio
+
+from Utilities.Scheduler import Scheduler
+
+
+def test_callback_cancelling_enough_timers_to_compact_fires_the_rest_once():
+    async def run():
+        scheduler = Scheduler()
+        fired = []
+        due = []
+
+        def cancel_most():
+            fired.append("canceller")
+            for handle in due[:80]:
+                handle.cancel()
+
+        scheduler.call_later(0, cancel_most)
+        for i in range(100):
+            due.append(scheduler.call_later(0, fired.append, i))
+        later = [scheduler.call_later(60, fired.append, "later") for _ in range(10)]
+
+        await asyncio.sleep(0.05)
+        pending = len(scheduler)
+        for handle in later:
+            handle.cancel()
+        return fired, pending, len(scheduler)
+
+    fired, pending, remaining = asyncio.run(run())
+    assert fired == ["canceller"] + list(range(80, 100))
+    assert pending == 10
+    assert remaining == 0
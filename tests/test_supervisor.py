@@ -0,0 +1,105 @@
+import asyncio
+import types
+
+import pytest
+
+import bot
+from database import SQLiteDatabaseManager
+
+
+class ExitedProcess:
+    returncode = 1
+
+    def poll(self):
+        return self.returncode
+
+    def wait(self):
+        return self.returncode
+
+
+def test_importing_the_entry_point_builds_no_bot():
+    assert not hasattr(bot, "bot")
+
+
+def test_crashing_cluster_is_restarted_with_backoff_then_given_up(monkeypatch):
+    clock = [0.0]
+    spawned = []
+
+    def sleep(seconds):
+        clock[0] += seconds
+
+    def popen(args, env):
+        spawned.append(clock[0])
+        return ExitedProcess()
+
+    monkeypatch.setattr(bot, "CLUSTER_COUNT", 1)
+    monkeypatch.setattr(bot, "CLUSTER_POLL_INTERVAL", 1)
+    monkeypatch.setattr(bot, "CLUSTER_RESTART_DELAY", 2)
+    monkeypatch.setattr(bot, "CLUSTER_RESTART_MAX_DELAY", 10)
+    monkeypatch.setattr(bot, "CLUSTER_MAX_RESTARTS", 4)
+    monkeypatch.setattr(bot.signal, "signal", lambda *args: None)
+    monkeypatch.setattr(bot.time, "sleep", sleep)
+    monkeypatch.setattr(bot.time, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(bot.subprocess, "Popen", popen)
+
+    with pytest.raises(SystemExit):
+        bot.supervise()
+
+    # The first start, then one restart per allowed failure
+    assert len(spawned) == 5
+    gaps = [later - earlier for earlier, later in zip(spawned, spawned[1:])]
+    # Each gap is the poll that saw the exit plus the backoff: 2, 4, 8, then capped at 10
+    assert gaps == [1 + 2, 1 + 4, 1 + 8, 1 + 10]
+
+
+class FakeBot:
+    """Just enough of the bot for main() to start and shut down."""
+
+    def __init__(self):
+        self.migrations = 0
+
+        async def migrate():
+            self.migrations += 1
+
+        async def noop(*args):
+            pass
+
+        self.db = types.SimpleNamespace(migrate=migrate, close=noop)
+        self.content = types.SimpleNamespace(preload=noop, start_watching=lambda: None, close=lambda: None)
+        self.scheduler = types.SimpleNamespace(close=lambda: None)
+        self.outbox = types.SimpleNamespace(close=lambda: None)
+        self.game_state = types.SimpleNamespace(close=noop)
+        self.start = noop
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+@pytest.mark.parametrize("cluster_id, migrations", [(None, 1), ("0", 0)])
+def test_only_a_standalone_process_migrates_in_main(monkeypatch, cluster_id, migrations):
+    fake = FakeBot()
+    monkeypatch.setattr(bot, "CLUSTER_ID", cluster_id)
+    monkeypatch.setattr(bot, "build_bot", lambda: fake)
+
+    async def load_cogs(_):
+        pass
+    monkeypatch.setattr(bot, "load_cogs", load_cogs)
+
+    asyncio.run(bot.main())
+    assert fake.migrations == migrations
+
+
+def test_supervisor_migrates_before_starting_clusters(monkeypatch, tmp_path):
+    path = str(tmp_path / "test.db")
+    monkeypatch.setattr(bot, "create_database_manager", lambda: SQLiteDatabaseManager(path=path))
+
+    bot.migrate()
+
+    manager = SQLiteDatabaseManager(path=path)
+    try:
+        assert manager.migrate() == []
+    finally:
+        manager.close()
@@ -0,0 +1,48 @@
+import asyncio
+import filecmp
+import os
+
+from Utilities.ContentStore import TRIVIA_SHARD_DIR, ContentStore
+from Utilities.TriviaShards import write_shards
+
+CATEGORIES = {"animals", "food", "general", "geography", "science", "space"}
+
+
+def test_shipped_shards_match_the_bank(tmp_path):
+    counts = write_shards(directory=str(tmp_path))
+    assert set(counts) == CATEGORIES
+    shipped = sorted(name for name in os.listdir(TRIVIA_SHARD_DIR) if name.endswith(".json"))
+    assert shipped == sorted(os.listdir(tmp_path))
+    for name in shipped:
+        assert filecmp.cmp(os.path.join(TRIVIA_SHARD_DIR, name), tmp_path / name, shallow=False), name
+
+
+def test_categories_load_from_the_data_directory():
+    store = ContentStore(poll_interval=0)
+    assert set(store.categories("trivia")) == CATEGORIES
+
+    async def run():
+        assert await store.acquire("trivia:space")
+        try:
+            bank = store.get("trivia:space")
+            return [item["answer"] for item in bank], any(item["matcher"].matches("mars") for item in bank)
+        finally:
+            store.release("trivia:space")
+
+    answers, matched = asyncio.run(run())
+    assert "Mars" in answers and matched
+    assert store.get("trivia:space") == ()
+
+
+def test_reload_keeps_the_previous_bank_when_the_file_is_emptied(tmp_path):
+    path = tmp_path / "space.json"
+    path.write_text('[{"question": "Red planet?", "answer": "Mars"}]', encoding="utf-8")
+    store = ContentStore({}, poll_interval=0, shard_dir=str(tmp_path))
+
+    async def run():
+        await store.load("trivia:space")
+        path.write_text("[]", encoding="utf-8")
+        return await store.reload(force=True)
+
+    assert asyncio.run(run()) == {}
+    assert [item["answer"] for item in store.get("trivia:space")] == ["Mars"]